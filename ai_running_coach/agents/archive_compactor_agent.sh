@@ -0,0 +1,46 @@
+#!/bin/bash
+export AGENT_NAME="archive_compactor"
+export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+source "${PROJECT_ROOT}/lib/databus.sh"
+
+COMPACTION_INTERVAL=$(jq -r '.storage.archive_compaction_interval_seconds // 300' "${CONFIG_DIR}/system_config.json" 2>/dev/null || echo 300)
+LAST_COMPACTION=0
+
+log_agent "INFO" "ArchiveCompactorAgent starting..."
+
+initialize() {
+    log_agent "INFO" "Initializing ArchiveCompactorAgent (every ${COMPACTION_INTERVAL}s)"
+}
+
+compact_archive() {
+    local result=$(run_python_helper compact_archive)
+    
+    if [ -n "${result}" ]; then
+        write_knowledge "system" "archive_compactor_state" "{
+            \"last_run\": \"$(date -u +"%Y-%m-%dT%H:%M:%SZ")\",
+            \"result\": ${result}
+        }"
+        log_agent "INFO" "Archive compaction: $(echo "${result}" | jq -c 'del(.dropped_unread)')"
+        echo "${result}" | jq -r '.dropped_unread[]? | "\(.channel) seq \(.seq) (\(.id)), unread by \(.consumers | join(", "))"' | \
+            while read -r dropped; do
+                log_agent "WARN" "Dropped unread message on ${dropped}"
+            done
+    else
+        log_agent "ERROR" "Archive compaction failed"
+    fi
+}
+
+main_loop() {
+    while should_run; do
+        if [ $((EPOCHSECONDS - LAST_COMPACTION)) -ge "${COMPACTION_INTERVAL}" ]; then
+            compact_archive
+            LAST_COMPACTION=${EPOCHSECONDS}
+        fi
+        sleep_interval
+    done
+    
+    log_agent "INFO" "ArchiveCompactorAgent shutting down"
+}
+
+initialize
+main_loop
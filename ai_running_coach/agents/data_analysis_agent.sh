@@ -3,12 +3,49 @@ export AGENT_NAME="data_analysis"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
+# Columnar copy of processed_data/activity_* that the analysis helpers load
+ACTIVITY_STORE="${SHARED_KB_DIR}/activity_store"
+# Per-second records of each activity that came with a FIT/TCX/GPX file
+ACTIVITY_STREAMS="${SHARED_KB_DIR}/activity_streams"
+# Store generation the last periodic analysis ran against
+LAST_ANALYZED_GENERATION=""
+# One row per day joining activities, Garmin sleep, journals and food logs
+DAILY_FEATURES="${SHARED_KB_DIR}/daily_features"
+# Written by the Garmin collector; its mtime tells when sleep data is new.
+# system.garmin_summary_file moves it (relative to PROJECT_ROOT), e.g. to a
+# collector deployed as its own project
+GARMIN_SUMMARY="${GARMIN_SUMMARY:-$(databus_config garmin_summary_file "shared_knowledge_base/garmin_data/daily_summary.json")}"
+[[ "${GARMIN_SUMMARY}" = /* ]] || GARMIN_SUMMARY="${PROJECT_ROOT}/${GARMIN_SUMMARY}"
+LAST_GARMIN_SUMMARY=""
+# Per-athlete medians/MADs new activities and resting HR are scored against
+BASELINES="${SHARED_KB_DIR}/baselines"
+# Processes for the periodic analysis pipeline (0: one per stage, up to the CPU count)
+ANALYSIS_WORKERS="${ANALYSIS_WORKERS:-$(databus_config analysis_workers 0)}"
 
 log_agent "INFO" "DataAnalysisAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing DataAnalysisAgent"
+    watch_channels "incoming" "delegation_commands"
+    
+    if [ ! -f "${ACTIVITY_STORE}/CURRENT" ]; then
+        log_agent "INFO" "Building activity store from the knowledge base"
+        query_knowledge "processed_data" "activity_*" --jsonl | \
+            run_python_helper activity_store rebuild "${ACTIVITY_STORE}" > /dev/null
+    fi
+    if [ ! -f "${DAILY_FEATURES}/features.npz" ]; then
+        log_agent "INFO" "Building daily feature table from the knowledge base"
+        query_knowledge "daily_journals" "*" --jsonl | \
+            run_python_helper daily_features add "${DAILY_FEATURES}" journal > /dev/null
+        query_knowledge "food_logs" "*" --jsonl | \
+            run_python_helper daily_features add "${DAILY_FEATURES}" food > /dev/null
+        run_python_helper daily_features sync "${DAILY_FEATURES}" "${ACTIVITY_STORE}" > /dev/null
+    fi
+    if [ ! -d "${BASELINES}" ]; then
+        log_agent "INFO" "Building athlete baselines from the knowledge base"
+        query_knowledge "processed_data" "activity_*" --jsonl | \
+            run_python_helper baselines update "${BASELINES}" > /dev/null
+    fi
     write_knowledge "system" "data_analysis_state" '{
         "status": "initialized",
         "last_analysis": null
@@ -18,33 +55,75 @@ initialize() {
 process_new_data() {
     # Check for new Garmin data
     local garmin_file="${DATA_BUS_DIR}/incoming/garmin_activity.json"
-    if [ -f "${garmin_file}" ]; then
+    local claimed_file="${DATA_BUS_DIR}/incoming/.garmin_activity.${CONSUMER_ID}.json"
+    
+    # mv is atomic, so only one replica gets each drop
+    if [ -f "${garmin_file}" ] && mv "${garmin_file}" "${claimed_file}" 2>/dev/null; then
         log_agent "INFO" "Processing new Garmin activity"
         
-        local activity_data=$(cat "${garmin_file}")
+        local activity_data=$(cat "${claimed_file}")
         local activity_id=$(echo "${activity_data}" | jq -r '.activityId // "unknown"')
         
-        # Process with Python
-        python3 "${PROJECT_ROOT}/python/process_activity.py" < "${garmin_file}"
+        # Ingest per-second records, if the activity has a file, and derive metrics
+        local metrics=$(run_python_helper process_activity --streams "${ACTIVITY_STREAMS}" < "${claimed_file}")
+        if [ "$(echo "${metrics}" | jq -r '.streams // false' 2>/dev/null)" = "true" ]; then
+            write_knowledge "processed_data" "metrics_${activity_id}" "${metrics}"
+        fi
+        
+        # Score against the athlete's baseline before it learns from this activity
+        publish_anomaly "$(run_python_helper detect_anomalies --baselines "${BASELINES}" < "${claimed_file}")"
         
         # Store processed data
         write_knowledge "processed_data" "activity_${activity_id}" "${activity_data}"
+        run_python_helper activity_store append "${ACTIVITY_STORE}" < "${claimed_file}" > /dev/null
+        run_python_helper daily_features sync "${DAILY_FEATURES}" "${ACTIVITY_STORE}" > /dev/null
+        track_plan_progress
         
-        rm "${garmin_file}"
+        rm "${claimed_file}"
         log_agent "INFO" "Garmin activity processed: ${activity_id}"
     fi
 }
 
+# Fold journal and food log entries into the daily feature table as they are logged
+process_user_logs() {
+    local messages=$(subscribe_channel "delegation_commands")
+    
+    while read -r message; do
+        local msg_type=$(echo "${message}" | jq -r '.type')
+        
+        if [ "${msg_type}" = "journal_logged" ]; then
+            echo "${message}" | jq -c '.data | {key: .date, data: .journal}' | \
+                run_python_helper daily_features add "${DAILY_FEATURES}" journal > /dev/null
+        elif [ "${msg_type}" = "food_logged" ]; then
+            echo "${message}" | jq -c '.data | {key: .date, data: .food_log}' | \
+                run_python_helper daily_features add "${DAILY_FEATURES}" food > /dev/null
+        fi
+        
+        commit_cursor "delegation_commands" "$(echo "${message}" | jq -r '.seq')"
+    done < <(echo "${messages}" | jq -c '.[]')
+}
+
+# Fold last night's sleep and resting HR in whenever the collector rewrites
+# its summary, then score it (a day the baseline already holds is not scored
+# again, so a restart doesn't re-send its alert)
+process_garmin_summary() {
+    [ -f "${GARMIN_SUMMARY}" ] || return 0
+    local modified=$(stat -c %Y "${GARMIN_SUMMARY}")
+    [ "${modified}" != "${LAST_GARMIN_SUMMARY}" ] || return 0
+    
+    run_python_helper daily_features add "${DAILY_FEATURES}" sleep < "${GARMIN_SUMMARY}" > /dev/null || return 0
+    publish_anomaly "$(run_python_helper detect_anomalies --baselines "${BASELINES}" < "${GARMIN_SUMMARY}")"
+    LAST_GARMIN_SUMMARY="${modified}"
+}
+
 analyze_trends() {
     # Perform periodic trend analysis
     log_agent "INFO" "Analyzing performance trends"
     
-    local activities=$(query_knowledge "processed_data" "activity_*")
+    # Run Python analysis over the columnar activity store, unless the pipeline already did
+    local analysis_result=${1:-$(run_python_helper analyze_trends --store "${ACTIVITY_STORE}")}
     
-    if [ "${activities}" != "[]" ]; then
-        # Run Python analysis
-        local analysis_result=$(python3 "${PROJECT_ROOT}/python/analyze_trends.py" <<< "${activities}")
-        
+    if [ "$(echo "${analysis_result}" | jq -r 'has("error")')" = "false" ]; then
         # Store analysis
         write_knowledge "processed_data" "latest_analysis" "${analysis_result}"
         
@@ -59,26 +138,91 @@ analyze_trends() {
 }
 
 detect_anomalies() {
+    if [ -f "${ACTIVITY_STORE}/CURRENT" ]; then
+        # Acute:chronic workload, monotony and strain over the whole history
+        publish_anomaly "${1:-$(run_python_helper detect_anomalies --store "${ACTIVITY_STORE}")}"
+    fi
+}
+
+# Publish a detect_anomalies result on data_alerts if it has an alert
+publish_anomaly() {
+    local analysis=$1
+    local has_alerts=$(echo "${analysis}" | jq -r '.has_alerts // false' 2>/dev/null)
+    
+    if [ "${has_alerts}" = "true" ]; then
+        log_agent "WARN" "Anomalies detected, publishing alert"
+        
+        local priority="normal"
+        [ "$(echo "${analysis}" | jq -r '.severity')" = "high" ] && priority="high"
+        
+        publish_message "data_alerts" "anomaly_detected" "{
+            \"alert_type\": $(echo "${analysis}" | jq '.alert_type'),
+            \"severity\": $(echo "${analysis}" | jq '.severity'),
+            \"details\": $(echo "${analysis}" | jq -c '.details'),
+            \"recommended_action\": $(echo "${analysis}" | jq '.recommended_action')
+        }" "${priority}"
+    fi
+}
+
+track_plan_progress() {
+    # Joins only the activities appended since the last call, unless the plan changed
     local training_plan=$(read_knowledge "training_plans" "current")
-    local recent_activities=$(query_knowledge "processed_data" "activity_*" | jq 'sort_by(.timestamp) | .[-7:]')
+    [ "${training_plan}" != "null" ] && [ -n "${training_plan}" ] || return
     
-    if [ "${recent_activities}" != "[]" ]; then
-        # Check for overtraining indicators
-        local analysis=$(python3 "${PROJECT_ROOT}/python/detect_anomalies.py" <<< "${recent_activities}")
-        
-        local has_alerts=$(echo "${analysis}" | jq -r '.has_alerts // false')
-        
-        if [ "${has_alerts}" = "true" ]; then
-            log_agent "WARN" "Anomalies detected, publishing alert"
-            
-            publish_message "data_alerts" "anomaly_detected" "{
-                \"alert_type\": $(echo "${analysis}" | jq -r '.alert_type'),
-                \"severity\": $(echo "${analysis}" | jq -r '.severity'),
-                \"details\": $(echo "${analysis}" | jq -c '.details'),
-                \"recommended_action\": $(echo "${analysis}" | jq -r '.recommended_action')
-            }"
-        fi
+    local progress=$(echo "${training_plan}" | run_python_helper update_training_progress --store "${ACTIVITY_STORE}")
+    
+    if [ "$(echo "${progress}" | jq -r 'has("error")' 2>/dev/null)" = "false" ]; then
+        write_knowledge "processed_data" "training_progress" "${progress}"
+        
+        publish_message "analysis_summaries" "plan_compliance" "{
+            \"adherence_percent\": $(echo "${progress}" | jq '.adherence_percent'),
+            \"compliance\": $(echo "${progress}" | jq '.compliance'),
+            \"latest\": $(echo "${progress}" | jq -c '.recent_workouts[-1]'),
+            \"timestamp\": \"$(date -u +"%Y-%m-%dT%H:%M:%S.%3NZ")\"
+        }"
+    fi
+}
+
+correlate_streams() {
+    # Cached until the daily feature table changes
+    local result=${1:-$(run_python_helper daily_features correlate "${DAILY_FEATURES}")}
+    
+    if [ "$(echo "${result}" | jq -r '.cached == false and (.insights | length) > 0' 2>/dev/null)" = "true" ]; then
+        write_knowledge "processed_data" "correlations" "${result}"
+        
+        publish_message "analysis_summaries" "correlation_insights" "{
+            \"insights\": $(echo "${result}" | jq -c '.insights'),
+            \"correlations\": $(echo "${result}" | jq -c '.correlations[:20]'),
+            \"timestamp\": \"$(date -u +"%Y-%m-%dT%H:%M:%S.%3NZ")\"
+        }"
+        
+        log_agent "INFO" "Correlation insights published"
+    fi
+}
+
+run_analysis_pipeline() {
+    # Trends, training load and correlations side by side on a process pool,
+    # all reading one memory-mapped copy of the store
+    local result=$(run_python_helper analysis_pipeline "${ACTIVITY_STORE}" --features "${DAILY_FEATURES}" \
+        --stages trends,anomalies,correlations --workers "${ANALYSIS_WORKERS}" < /dev/null)
+    
+    if [ "$(echo "${result}" | jq -r 'has("results")' 2>/dev/null)" != "true" ]; then
+        log_agent "ERROR" "Analysis pipeline failed"
+        return 1
     fi
+    log_agent "INFO" "Analysis pipeline timings: $(echo "${result}" | jq -c '.timings')"
+    
+    analyze_trends "$(echo "${result}" | jq -c '.results.trends')"
+    detect_anomalies "$(echo "${result}" | jq -c '.results.anomalies')"
+    correlate_streams "$(echo "${result}" | jq -c '.results.correlations')"
+}
+
+# True when activities were added since the last periodic analysis
+store_changed() {
+    local generation=""
+    [ -f "${ACTIVITY_STORE}/CURRENT" ] && read -r generation < "${ACTIVITY_STORE}/CURRENT"
+    [ -n "${generation}" ] && [ "${generation}" != "${LAST_ANALYZED_GENERATION}" ] || return 1
+    LAST_ANALYZED_GENERATION="${generation}"
 }
 
 main_loop() {
@@ -86,12 +230,26 @@ main_loop() {
     
     while should_run; do
         process_new_data
+        # Logs and the summary aren't split between replicas (delegation_commands
+        # is read on per-replica cursors): the primary replica's alone
+        if [ -z "${AGENT_INSTANCE}" ]; then
+            process_user_logs
+            process_garmin_summary
+        fi
         
-        # Analyze trends every 5 iterations
+        # Analyze trends every 5 iterations (primary replica only), and only
+        # when there is something new: an idle store costs nothing
         ((counter++))
-        if [ $((counter % 5)) -eq 0 ]; then
-            analyze_trends
-            detect_anomalies
+        if [ -z "${AGENT_INSTANCE}" ] && [ $((counter % 5)) -eq 0 ]; then
+            if store_changed; then
+                run_analysis_pipeline
+            else
+                correlate_streams
+            fi
+        fi
+        # Drop baselines of athletes inactive for months, now and then
+        if [ -z "${AGENT_INSTANCE}" ] && [ $((counter % 500)) -eq 0 ]; then
+            run_python_helper baselines evict "${BASELINES}" > /dev/null
         fi
         
         sleep_interval
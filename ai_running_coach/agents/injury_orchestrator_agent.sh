@@ -3,12 +3,11 @@ export AGENT_NAME="injury_orchestrator"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "InjuryOrchestratorAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing InjuryOrchestratorAgent"
+    watch_channels "delegation_commands"
     write_knowledge "injury" "orchestrator_state" '{
         "status": "initialized",
         "active_injuries": []
@@ -16,9 +15,9 @@ initialize() {
 }
 
 process_delegations() {
-    local messages=$(subscribe_channel "delegation_commands" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "delegation_commands")
     
-    echo "${messages}" | jq -c '.[]' | while read -r message; do
+    while read -r message; do
         local msg_type=$(echo "${message}" | jq -r '.type')
         
         case "${msg_type}" in
@@ -29,7 +28,9 @@ process_delegations() {
                 handle_injury_alert "${message}"
                 ;;
         esac
-    done
+        
+        commit_cursor "delegation_commands" "$(echo "${message}" | jq -r '.seq')"
+    done < <(echo "${messages}" | jq -c '.[]')
 }
 
 handle_injury_delegation() {
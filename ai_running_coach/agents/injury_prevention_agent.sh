@@ -3,22 +3,21 @@ export AGENT_NAME="injury_prevention"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "InjuryPreventionAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing InjuryPreventionAgent"
+    watch_channels "injury_directives"
 }
 
 process_directives() {
-    local messages=$(subscribe_channel "injury_directives" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "injury_directives")
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Processing ${msg_count} injury directive(s)"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_type=$(echo "${message}" | jq -r '.type')
             
             case "${msg_type}" in
@@ -29,7 +28,9 @@ process_directives() {
                     generate_rehab_plan "${message}"
                     ;;
             esac
-        done
+            
+            commit_cursor "injury_directives" "$(echo "${message}" | jq -r '.seq')"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
@@ -56,10 +57,10 @@ assess_injury_risk() {
     
     log_agent "INFO" "Assessing injury risk"
     
-    local training_data=$(query_knowledge "processed_data" "activity_*" | jq 'sort_by(.timestamp) | .[-14:]')
+    local training_data=$(query_knowledge_latest "processed_data" "activity_*" 14)
     
     # Run risk assessment
-    local risk_assessment=$(python3 "${PROJECT_ROOT}/python/assess_injury_risk.py" <<< "${training_data}")
+    local risk_assessment=$(run_python_helper assess_injury_risk <<< "${training_data}")
     
     local risk_level=$(echo "${risk_assessment}" | jq -r '.risk_level')
     
@@ -81,7 +82,7 @@ generate_rehab_plan() {
     log_agent "INFO" "Generating rehab plan for: ${injury_type}"
     
     # Generate rehab using Python
-    local rehab_plan=$(python3 "${PROJECT_ROOT}/python/generate_rehab_plan.py" <<< "{\"injury_type\": \"${injury_type}\"}")
+    local rehab_plan=$(run_python_helper generate_rehab_plan <<< "{\"injury_type\": \"${injury_type}\"}")
     
     write_knowledge "rehab_plans" "${injury_type}_$(date +%Y%m%d)" "${rehab_plan}"
     
@@ -3,21 +3,20 @@ export AGENT_NAME="nutrition_orchestrator"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "NutritionOrchestratorAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing NutritionOrchestratorAgent"
+    watch_channels "delegation_commands"
     write_knowledge "nutrition" "orchestrator_state" '{
         "status": "initialized"
     }'
 }
 
 process_delegations() {
-    local messages=$(subscribe_channel "delegation_commands" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "delegation_commands")
     
-    echo "${messages}" | jq -c '.[]' | while read -r message; do
+    while read -r message; do
         local msg_type=$(echo "${message}" | jq -r '.type')
         
         if [ "${msg_type}" = "nutrition_delegation" ]; then
@@ -25,7 +24,9 @@ process_delegations() {
         elif [ "${msg_type}" = "food_logged" ]; then
             trigger_food_analysis "${message}"
         fi
-    done
+        
+        commit_cursor "delegation_commands" "$(echo "${message}" | jq -r '.seq')"
+    done < <(echo "${messages}" | jq -c '.[]')
 }
 
 handle_nutrition_delegation() {
@@ -3,22 +3,21 @@ export AGENT_NAME="nutritionist"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "NutritionistAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing NutritionistAgent"
+    watch_channels "nutrition_directives"
 }
 
 process_directives() {
-    local messages=$(subscribe_channel "nutrition_directives" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "nutrition_directives")
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Processing ${msg_count} nutrition directive(s)"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_type=$(echo "${message}" | jq -r '.type')
             
             case "${msg_type}" in
@@ -32,7 +31,9 @@ process_directives() {
                     provide_hydration_advice "${message}"
                     ;;
             esac
-        done
+            
+            commit_cursor "nutrition_directives" "$(echo "${message}" | jq -r '.seq')"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
@@ -45,7 +46,7 @@ analyze_food_log() {
     local food_log=$(read_knowledge "food_logs" "${date}")
     
     if [ "${food_log}" != "null" ]; then
-        local analysis=$(python3 "${PROJECT_ROOT}/python/analyze_nutrition.py" <<< "${food_log}")
+        local analysis=$(run_python_helper analyze_nutrition <<< "${food_log}")
         
         publish_message "synthesized_responses" "nutrition_analysis" "{
             \"date\": \"${date}\",
@@ -63,7 +64,7 @@ generate_meal_plan() {
     local user_profile=$(read_knowledge "user_profile" "${user_id}")
     local training_plan=$(read_knowledge "training_plans" "current")
     
-    local meal_plan=$(python3 "${PROJECT_ROOT}/python/generate_meal_plan.py" <<EOF
+    local meal_plan=$(run_python_helper generate_meal_plan <<EOF
 {
     "user_profile": ${user_profile},
     "training_plan": ${training_plan}
@@ -81,7 +82,7 @@ provide_hydration_advice() {
     
     log_agent "INFO" "Providing hydration advice"
     
-    local advice=$(python3 "${PROJECT_ROOT}/python/hydration_calculator.py")
+    local advice=$(run_python_helper hydration_calculator)
     
     publish_message "synthesized_responses" "hydration_advice" "{
         \"advice\": ${advice}
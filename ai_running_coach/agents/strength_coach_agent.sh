@@ -3,22 +3,21 @@ export AGENT_NAME="strength_coach"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "StrengthCoachAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing StrengthCoachAgent"
+    watch_channels "strength_directives"
 }
 
 process_directives() {
-    local messages=$(subscribe_channel "strength_directives" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "strength_directives")
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Processing ${msg_count} strength directive(s)"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_type=$(echo "${message}" | jq -r '.type')
             
             case "${msg_type}" in
@@ -26,7 +25,9 @@ process_directives() {
                     generate_strength_workout "${message}"
                     ;;
             esac
-        done
+            
+            commit_cursor "strength_directives" "$(echo "${message}" | jq -r '.seq')"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
@@ -41,7 +42,7 @@ generate_strength_workout() {
     local user_profile=$(read_knowledge "user_profile" "${user_id}")
     
     # Generate workout using Python
-    local workout=$(python3 "${PROJECT_ROOT}/python/generate_strength_workout.py" <<EOF
+    local workout=$(run_python_helper generate_strength_workout <<EOF
 {
     "user_profile": ${user_profile},
     "training_plan": ${training_plan}
@@ -3,22 +3,23 @@ export AGENT_NAME="training_planner"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "TrainingPlannerAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing TrainingPlannerAgent"
+    watch_channels "training_directives"
 }
 
 process_directives() {
-    local messages=$(subscribe_channel "training_directives" "${LAST_SEEN_TIMESTAMP}")
+    # Replicas share the "training_planner" consumer group, so each directive
+    # is handled by exactly one of them and redelivered if that one dies
+    local messages=$(claim_messages "training_directives" "training_planner" 5)
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Processing ${msg_count} training directive(s)"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_type=$(echo "${message}" | jq -r '.type')
             local msg_id=$(echo "${message}" | jq -r '.id')
             
@@ -34,8 +35,8 @@ process_directives() {
                     ;;
             esac
             
-            archive_message "training_directives" "${msg_id}"
-        done
+            ack_message "training_directives" "training_planner" "${msg_id}"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
@@ -47,7 +48,7 @@ generate_training_plan() {
     log_agent "INFO" "Generating new training plan"
     
     # Generate plan using Python
-    local training_plan=$(python3 "${PROJECT_ROOT}/python/generate_training_plan.py" <<< "${user_profile}")
+    local training_plan=$(run_python_helper generate_training_plan <<< "${user_profile}")
     
     # Store plan
     write_knowledge "training_plans" "current" "${training_plan}"
@@ -70,7 +71,7 @@ adjust_training_plan() {
     log_agent "INFO" "Adjusting training plan, reason: ${reason}"
     
     # Adjust using Python
-    local adjusted_plan=$(python3 "${PROJECT_ROOT}/python/adjust_training_plan.py" <<< "${current_plan}")
+    local adjusted_plan=$(run_python_helper adjust_training_plan <<< "${current_plan}")
     
     write_knowledge "training_plans" "current" "${adjusted_plan}"
     
@@ -89,7 +90,7 @@ reduce_training_load() {
     local current_plan=$(read_knowledge "training_plans" "current")
     
     # Reduce load using Python
-    local reduced_plan=$(python3 "${PROJECT_ROOT}/python/reduce_training_load.py" "${duration_days}" <<< "${current_plan}")
+    local reduced_plan=$(run_python_helper reduce_training_load "${duration_days}" <<< "${current_plan}")
     
     write_knowledge "training_plans" "current" "${reduced_plan}"
     
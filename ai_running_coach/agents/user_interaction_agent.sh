@@ -3,12 +3,13 @@ export AGENT_NAME="user_interaction"
 export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-LAST_SEEN_TIMESTAMP="0"
+DEFAULT_USER_ID="${USER_ID:-$(databus_config default_user_id default_user)}"
 
 log_agent "INFO" "UserInteractionAgent starting..."
 
 initialize() {
     log_agent "INFO" "Initializing UserInteractionAgent"
+    watch_channels "incoming" "synthesized_responses"
     write_knowledge "system" "user_interaction_state" '{
         "status": "initialized",
         "active_conversations": []
@@ -16,40 +17,46 @@ initialize() {
 }
 
 process_user_input() {
-    # Check for new user input file
-    local input_file="${DATA_BUS_DIR}/incoming/user_input.txt"
-    if [ -f "${input_file}" ]; then
+    # Check for new user input files: user_input.<user_id>.txt per athlete,
+    # plain user_input.txt for the default user
+    local input_file
+    for input_file in "${DATA_BUS_DIR}"/incoming/user_input*.txt; do
+        [ -f "${input_file}" ] || continue
+        local name=$(basename "${input_file}" .txt)
+        local user_id="${name#user_input.}"
+        if [ "${name}" = "user_input" ]; then
+            user_id="${DEFAULT_USER_ID}"
+        fi
         local user_message=$(cat "${input_file}")
         rm "${input_file}"
         
-        log_agent "INFO" "Processing user input: ${user_message}"
+        log_agent "INFO" "Processing input from ${user_id}: ${user_message}"
         
         # Parse user intent using Python NLP helper
-        local intent=$(python3 "${PROJECT_ROOT}/python/parse_intent.py" <<< "${user_message}")
+        local intent=$(run_python_helper parse_intent <<< "${user_message}")
         
         # Publish to data bus
         publish_message "user_requests" "user_message" "{
             \"intent\": \"${intent}\",
             \"message\": $(echo "${user_message}" | jq -Rs .),
-            \"user_id\": \"default_user\",
+            \"user_id\": $(echo -n "${user_id}" | jq -Rs .),
             \"timestamp\": \"$(date -u +"%Y-%m-%dT%H:%M:%S.%3NZ")\"
         }"
         
         log_agent "INFO" "User request published with intent: ${intent}"
-    fi
+    done
 }
 
 present_responses() {
-    local messages=$(subscribe_channel "synthesized_responses" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "synthesized_responses")
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Presenting ${msg_count} response(s) to user"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_id=$(echo "${message}" | jq -r '.id')
             local msg_type=$(echo "${message}" | jq -r '.type')
-            local msg_timestamp=$(echo "${message}" | jq -r '.timestamp')
             
             # Format and display response
             local response_file="${DATA_BUS_DIR}/processed/response_${msg_id}.txt"
@@ -57,9 +64,9 @@ present_responses() {
             
             log_agent "INFO" "Response saved to: ${response_file}"
             
-            LAST_SEEN_TIMESTAMP="${msg_timestamp}"
             archive_message "synthesized_responses" "${msg_id}"
-        done
+            commit_cursor "synthesized_responses" "$(echo "${message}" | jq -r '.seq')"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark: list-of-dicts analysis vs the columnar activity store
+Usage: activity_store_benchmark.py [sizes...]     (default: 10000 1000000)
+
+For each history size compares:
+  lists        - the previous analyze_trends/detect_anomalies loops over dicts
+  from_records - one-time conversion of the same list into typed columns
+  store        - analyze_trends/detect_anomalies on an in-memory ActivityStore,
+                 recomputing the exact trend aggregates in full
+  mmap         - load a saved store (memory-mapped) with up-to-date persisted
+                 trend aggregates and analyze, as the agent does
+  append       - appending one new activity, in place in the current
+                 generation
+  rewrite      - writing the whole store as a new generation, which is what
+                 each append used to cost
+  incremental  - analyzing after the append
+  daily_load   - the vectorized per-day acute/chronic load series (backfill)
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+from datetime import date, timedelta
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+from activity_store import ActivityStore, append  # noqa: E402
+from analyze_trends import analyze_trends, load_stats  # noqa: E402
+from training_load import daily_metrics, load_state  # noqa: E402
+from detect_anomalies import detect_anomalies  # noqa: E402
+
+def legacy_analyze_trends(activities):
+    """analyze_trends as it was before the activity store"""
+    data = [act.get('data', act) for act in activities]
+    avg_pace = sum([d.get('pace', 0) for d in data]) / len(data) if data else 0
+    avg_distance = sum([d.get('distance', 0) for d in data]) / len(data) if data else 0
+    avg_hr = sum([d.get('heart_rate', 0) for d in data]) / len(data) if data else 0
+    mid = len(data) // 2
+    first_half_pace = sum([d.get('pace', 0) for d in data[:mid]]) / mid if mid > 0 else 0
+    second_half_pace = sum([d.get('pace', 0) for d in data[mid:]]) / (len(data) - mid) if mid > 0 else 0
+    improving = second_half_pace < first_half_pace if first_half_pace > 0 else False
+    return {
+        'total_activities': len(data),
+        'average_pace_min_per_km': round(avg_pace, 2),
+        'average_distance_km': round(avg_distance, 2),
+        'average_heart_rate': round(avg_hr, 0),
+        'trend': 'improving' if improving else 'stable',
+    }
+
+def legacy_detect_anomalies(activities):
+    """The load and heart rate checks of detect_anomalies before the activity store"""
+    data = [act.get('data', act) for act in activities]
+    distances = [d.get('distance', 0) for d in data]
+    spike = sum(distances[-3:]) / 3 > (sum(distances) / len(distances) * 1.3)
+    heart_rates = [d.get('heart_rate', 0) for d in data if d.get('heart_rate', 0) > 0]
+    return spike, (sum(heart_rates) / len(heart_rates) > 165) if heart_rates else False
+
+def synthetic_history(count, seed=42):
+    """Knowledge base entries as query_knowledge returns them"""
+    rng = random.Random(seed)
+    start = date(2000, 1, 1)
+    return [{
+        'key': f"activity_{i}",
+        'timestamp': "2024-01-01T00:00:00Z",
+        'data': {
+            'activityId': 10_000_000 + i,
+            'date': (start + timedelta(days=i // 2)).isoformat(),
+            'distance': round(rng.uniform(3, 25), 2),
+            'pace': round(rng.uniform(4.0, 6.5), 2),
+            'heart_rate': rng.randint(120, 175),
+            'duration': round(rng.uniform(15, 150), 1),
+            'elevation_gain': rng.randint(0, 600),
+        }
+    } for i in range(count)]
+
+def timed(fn, repeat=3):
+    """Best of <repeat> runs, in milliseconds, plus the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+def bench(count):
+    activities = synthetic_history(count)
+    results = {'activities': count}
+
+    results['lists_ms'], legacy = timed(
+        lambda: (legacy_analyze_trends(activities), legacy_detect_anomalies(activities)))
+    results['from_records_ms'], store = timed(lambda: ActivityStore.from_records(activities), repeat=1)
+    results['store_ms'], current = timed(lambda: (analyze_trends(store), detect_anomalies(store)))
+
+    def analyze_saved(path):
+        saved = ActivityStore.load(path)
+        return analyze_trends(saved, load_stats(path, saved)), detect_anomalies(saved, load_state(path, saved))
+
+    with tempfile.TemporaryDirectory(prefix="activity_store_bench_") as path:
+        store.save(path)
+        analyze_saved(path)  # persist the trend aggregates once
+        results['mmap_ms'], _ = timed(lambda: analyze_saved(path))
+
+        next_day = (date(2000, 1, 1) + timedelta(days=count // 2 + 1)).isoformat()
+        start = time.perf_counter()
+        append(path, [{'activityId': 20_000_000 + count, 'date': next_day,
+                       'distance': 10.0, 'pace': 5.0, 'heart_rate': 150}])
+        results['append_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        start = time.perf_counter()
+        analyze_saved(path)
+        results['incremental_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        results['daily_load_ms'], _ = timed(lambda: daily_metrics(ActivityStore.load(path)))
+        results['disk_bytes'] = sum(f.stat().st_size for f in Path(path).rglob('*.npy'))
+        results['rewrite_ms'], _ = timed(lambda: ActivityStore.load(path).save(path), repeat=1)
+
+    # Same answers as the loops they replace
+    trends = {key: current[0][key] for key in legacy[0]}
+    results['matches_lists'] = trends == legacy[0]
+    results['speedup_store'] = round(results['lists_ms'] / results['store_ms'], 1)
+    results['speedup_mmap'] = round(results['lists_ms'] / results['mmap_ms'], 1)
+    return results
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000]
+    print(json.dumps([bench(count) for count in sizes], indent=2))
+
+if __name__ == "__main__":
+    main()
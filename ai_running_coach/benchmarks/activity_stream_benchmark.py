@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-second activity stream ingestion and derived metrics
+Usage: activity_stream_benchmark.py [hours]     (default: 3, recorded at 1 Hz)
+
+Writes a synthetic run as FIT, TCX and GPX, then for each format times:
+  ingest   - parse the file and save the typed columns (activity_streams.ingest)
+  metrics  - memory-map the saved stream and derive splits, HR zones,
+             grade-adjusted pace and decoupling (process_activity.activity_metrics)
+"""
+
+import sys
+import json
+import math
+import time
+import struct
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+from activity_streams import ActivityStream, FIT_EPOCH, SEMICIRCLES, ingest  # noqa: E402
+from process_activity import activity_metrics  # noqa: E402
+
+START = datetime(2024, 6, 1, 7, 0, tzinfo=timezone.utc)
+
+def synthetic_run(seconds):
+    """One record per second: rolling hills, slowly drifting heart rate"""
+    records, distance = [], 0.0
+    for t in range(seconds):
+        speed = 3.0 + 0.3 * math.sin(t / 300)
+        distance += speed
+        records.append({
+            'time': START + timedelta(seconds=t),
+            'lat': 47.0 + distance / 111_000,
+            'lon': 8.0 + 0.001 * math.sin(distance / 500),
+            'alt': 400 + 30 * math.sin(distance / 800),
+            'hr': int(140 + 10 * t / seconds + 5 * math.sin(t / 120)),
+            'cad': 85 + t % 3,
+            'distance': distance,
+            'speed': speed,
+        })
+    return records
+
+def write_fit(path, records):
+    """Minimal FIT file: a file_id message and one record message per sample"""
+    body = bytearray()
+    # file_id (global 0) on local 1: type enum
+    body += struct.pack('<BBBHB', 0x41, 0, 0, 0, 1) + bytes([0, 1, 0x00])
+    body += struct.pack('<BB', 0x01, 4)
+    # record (global 20) on local 0
+    fields = [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (78, 4, 0x86),
+              (3, 1, 0x02), (4, 1, 0x02), (5, 4, 0x86), (73, 4, 0x86)]
+    body += struct.pack('<BBBHB', 0x40, 0, 0, 20, len(fields))
+    for field in fields:
+        body += bytes(field)
+    record = struct.Struct('<BIiiIBBII')
+    for r in records:
+        body += record.pack(0x00, int(r['time'].timestamp()) - FIT_EPOCH,
+                            int(r['lat'] * SEMICIRCLES), int(r['lon'] * SEMICIRCLES),
+                            int((r['alt'] + 500) * 5), r['hr'], r['cad'],
+                            int(r['distance'] * 100), int(r['speed'] * 1000))
+    header = struct.pack('<BBHI4sH', 14, 0x10, 2100, len(body), b'.FIT', 0)
+    path.write_bytes(header + bytes(body) + b'\0\0')
+
+def write_tcx(path, records):
+    points = ''.join(
+        f"<Trackpoint><Time>{r['time']:%Y-%m-%dT%H:%M:%SZ}</Time>"
+        f"<Position><LatitudeDegrees>{r['lat']:.7f}</LatitudeDegrees>"
+        f"<LongitudeDegrees>{r['lon']:.7f}</LongitudeDegrees></Position>"
+        f"<AltitudeMeters>{r['alt']:.1f}</AltitudeMeters><DistanceMeters>{r['distance']:.1f}</DistanceMeters>"
+        f"<HeartRateBpm><Value>{r['hr']}</Value></HeartRateBpm>"
+        f"<Extensions><ns3:TPX><ns3:Speed>{r['speed']:.3f}</ns3:Speed>"
+        f"<ns3:RunCadence>{r['cad']}</ns3:RunCadence></ns3:TPX></Extensions></Trackpoint>\n"
+        for r in records)
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" '
+        'xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">'
+        '<Activities><Activity Sport="Running"><Lap><AverageHeartRateBpm><Value>150</Value>'
+        f'</AverageHeartRateBpm><Track>\n{points}</Track></Lap></Activity></Activities>'
+        '</TrainingCenterDatabase>\n')
+
+def write_gpx(path, records):
+    points = ''.join(
+        f"<trkpt lat=\"{r['lat']:.7f}\" lon=\"{r['lon']:.7f}\"><ele>{r['alt']:.1f}</ele>"
+        f"<time>{r['time']:%Y-%m-%dT%H:%M:%SZ}</time><extensions><gpxtpx:TrackPointExtension>"
+        f"<gpxtpx:hr>{r['hr']}</gpxtpx:hr><gpxtpx:cad>{r['cad']}</gpxtpx:cad>"
+        f"</gpxtpx:TrackPointExtension></extensions></trkpt>\n"
+        for r in records)
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1" '
+        'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">'
+        f'<trk><trkseg>\n{points}</trkseg></trk></gpx>\n')
+
+def timed(fn, repeat=3):
+    """Best of <repeat> runs, in milliseconds, plus the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    records = synthetic_run(int(hours * 3600))
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="activity_stream_bench_") as tmp:
+        tmp = Path(tmp)
+        for fmt, writer in (('fit', write_fit), ('tcx', write_tcx), ('gpx', write_gpx)):
+            source = tmp / f"run.{fmt}"
+            writer(source, records)
+            streams = tmp / f"streams_{fmt}"
+            ingest_ms, stream = timed(lambda: ingest(source, streams, 'run'))
+            metrics_ms, metrics = timed(lambda: activity_metrics(ActivityStream.load(streams / 'run')))
+            results.append({
+                'format': fmt,
+                'records': len(stream),
+                'file_bytes': source.stat().st_size,
+                'stream_bytes': sum(f.stat().st_size for f in ActivityStream.current(streams / 'run').glob('*.npy')),
+                'ingest_ms': ingest_ms,
+                'metrics_ms': metrics_ms,
+                'distance_km': metrics['distance_km'],
+                'gap_min_per_km': metrics['gap_min_per_km'],
+                'decoupling_percent': metrics['decoupling_percent'],
+            })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the analysis pipeline vs one cold helper process per analysis
+Usage: analysis_pipeline_benchmark.py [activities]     (default: 500000)
+
+Builds a store and daily feature table from a synthetic history and times a
+full recompute (--full) of trends, anomalies, correlations and compliance:
+  cold         - analyze_trends, detect_anomalies, daily_features correlate and
+                 update_training_progress, one python3 process after another
+  sequential   - analysis_pipeline --workers 1
+  pool         - analysis_pipeline --workers 4, one worker per stage
+
+The pool's per-stage timings are printed as well; its gain is bounded by the
+slowest stage and by the CPUs available (by default the pipeline uses no
+more workers than there are CPUs).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import date, timedelta
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PYTHON_DIR = PROJECT_ROOT / "python"
+sys.path.insert(0, str(PYTHON_DIR))
+
+import activity_store  # noqa: E402
+from activity_store import ActivityStore  # noqa: E402
+from daily_features import DailyFeatures  # noqa: E402
+
+START = date(1990, 1, 1)
+
+def synthetic(count, seed=17):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {'activityId': i, 'date': (START + timedelta(days=i // 40)).isoformat(),
+               'distance': round(rng.uniform(3, 20), 2), 'pace': round(rng.uniform(4.5, 6.5), 2),
+               'heart_rate': rng.randint(120, 175), 'duration_minutes': rng.randint(20, 120)}
+
+def plan_for(last_day):
+    start = last_day - timedelta(weeks=8)
+    return {'start_date': start.isoformat(), 'weeks': 10, 'workouts': [
+        {'date': (start + timedelta(days=day)).isoformat(), 'week_number': day // 7 + 1,
+         'type': 'long' if day % 7 == 6 else 'easy', 'distance_km': 16 if day % 7 == 6 else 8, 'pace': 'easy'}
+        for day in range(70) if day % 7 in (0, 2, 4, 6)]}
+
+def helper(name, *args, stdin=None):
+    result = subprocess.run([sys.executable, str(PYTHON_DIR / f"{name}.py"), *args],
+                            input=stdin or b'', capture_output=True, check=True)
+    return json.loads(result.stdout)
+
+def comparable(results):
+    """Results without the fields that differ from run to run"""
+    results = json.loads(json.dumps(results))
+    results['trends'].pop('analysis_date', None)
+    return results
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return round((time.perf_counter() - start) * 1000, 3), result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    results = {'activities': count, 'cpus': os.cpu_count()}
+
+    with tempfile.TemporaryDirectory(prefix="analysis_pipeline_bench_") as tmp:
+        store, features = str(Path(tmp) / "store"), str(Path(tmp) / "features")
+        activity_store.rebuild(store, synthetic(count))
+        table = DailyFeatures()
+        table.sync(ActivityStore.load(store), ActivityStore.origin(store))
+        table.save(features)
+        plan = json.dumps(plan_for(START + timedelta(days=(count - 1) // 40))).encode()
+
+        def cold():
+            return {
+                'trends': helper('analyze_trends', '--store', store, '--full'),
+                'anomalies': helper('detect_anomalies', '--store', store, '--full'),
+                'correlations': helper('daily_features', 'correlate', features, '--full'),
+                'compliance': helper('update_training_progress', '--store', store, '--full', stdin=plan),
+            }
+
+        def pipeline(*args):
+            return helper('analysis_pipeline', store, '--features', features, '--full', *args, stdin=plan)
+
+        results['cold_ms'], separate = timed(cold)
+        results['sequential_ms'], sequential = timed(lambda: pipeline('--workers', '1'))
+        results['pool_ms'], pooled = timed(lambda: pipeline('--workers', '4'))
+        results['pool_workers'] = pooled['workers']
+        results['pool_timings'] = pooled['timings']
+        results['matches'] = comparable(pooled['results']) == comparable(separate)
+        results['sequential_matches'] = comparable(sequential['results']) == comparable(pooled['results'])
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
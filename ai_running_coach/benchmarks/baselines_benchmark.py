@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scoring a new activity against the athlete's baseline
+Usage: baselines_benchmark.py [athletes]     (default: 2000)
+
+For growing history lengths, times scoring one new activity:
+  rescan     - median/MAD of the athlete's whole history per metric, recomputed
+               per call from the activity list, as a from-scratch check would
+  baseline   - baselines.update_activities with score=True: load the
+               athlete's file, score, fold in and save
+
+Then fills a baselines directory with <athletes> athletes and times evict().
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+import baselines  # noqa: E402
+from activity_store import ActivityStore  # noqa: E402
+
+START = date(2020, 1, 1)
+
+def history(user, count, seed=5):
+    rng = random.Random(seed)
+    return [{'activityId': i, 'user_id': user, 'type': rng.choice(['running', 'trail_running']),
+             'date': (START + timedelta(days=i // 2)).isoformat(), 'distance': round(rng.uniform(6, 14), 2),
+             'pace': round(rng.uniform(4.8, 6.0), 2), 'heart_rate': rng.randint(135, 165),
+             'duration_minutes': rng.randint(35, 80)} for i in range(count)]
+
+def rescan(activities, new):
+    store = ActivityStore.from_records(activities)
+    latest = ActivityStore.from_records([new])
+    scores = {}
+    for metric in baselines.METRICS:
+        values = store[metric][store[metric] > 0]
+        median = np.median(values)
+        spread = max(baselines.MAD_SCALE * np.median(np.abs(values - median)), baselines.MIN_SPREAD * median)
+        scores[metric] = float((latest[metric][0] - median) / spread)
+    return scores
+
+def timed(fn, repeat=3):
+    """Best of <repeat> runs, in milliseconds, plus the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+def main():
+    athletes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    results = {'history': []}
+
+    with tempfile.TemporaryDirectory(prefix="baselines_bench_") as tmp:
+        directory = Path(tmp) / "baselines"
+        for count in (100, 1000, 10000, 100000):
+            user = f"athlete_{count}"
+            activities = history(user, count)
+            baselines.update_activities(directory, activities)
+            new = dict(activities[-1], activityId=count, distance=30.0)
+
+            rescan_ms, _ = timed(lambda: rescan(activities, new))
+            baseline_ms, scored = timed(lambda: baselines.update_activities(directory, [new], score=True))
+            results['history'].append({
+                'activities': count,
+                'rescan_ms': rescan_ms,
+                'baseline_ms': baseline_ms,
+                'file_bytes': baselines._path(directory, user).stat().st_size,
+                'distance_z': scored[0]['scores']['distance']['z'],
+            })
+
+        crowd = Path(tmp) / "crowd"
+        for a in range(athletes):
+            baselines.update_activities(crowd, history(f"crowd_{a}", 40, seed=a))
+        results['athletes'] = athletes
+        results['directory_bytes'] = sum(f.stat().st_size for f in crowd.glob('*.json'))
+        today = (START - baselines.EPOCH).days + 20 + baselines.STALE_DAYS + 1
+        results['evict_ms'], results['evicted'] = timed(lambda: baselines.evict(crowd, today=today), repeat=1)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
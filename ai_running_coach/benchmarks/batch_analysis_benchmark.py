@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batched multi-athlete analysis vs one helper call per athlete
+Usage: batch_analysis_benchmark.py [athletes] [activities_per_athlete]    (default: 10000 30)
+
+  batch        - batch_analysis.batch_analyze over every athlete's activities
+                 (parse, one shared table, grouped trends and training load)
+  batch_cli    - the same through batch_analysis.py, JSON Lines in and out
+  per_athlete  - analyze_trends + detect_anomalies called once per athlete
+                 in this process, timed on a sample and scaled up
+  per_process  - the same as separate helper processes, as agents run them
+                 today, timed on a small sample and scaled up
+
+Also checks that the batch results match the per-athlete ones on the sample.
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import date, timedelta
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+from analyze_trends import analyze_trends  # noqa: E402
+from batch_analysis import batch_analyze  # noqa: E402
+from detect_anomalies import detect_anomalies  # noqa: E402
+
+def synthetic_athletes(athletes, per_athlete, seed=7):
+    """Knowledge base entries for every athlete, interleaved by day"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    entries = []
+    for i in range(per_athlete):
+        for a in range(athletes):
+            day = start + timedelta(days=2 * i + rng.randint(0, 1))
+            entries.append({
+                'key': f"activity_{a}_{i}",
+                'timestamp': f"{day.isoformat()}T07:00:00Z",
+                'data': {
+                    'activityId': a * per_athlete + i,
+                    'user_id': f"athlete_{a}",
+                    'date': day.isoformat(),
+                    # Some athletes ramp up sharply towards the end
+                    'distance': round(rng.uniform(4, 16) * (2.5 if a % 7 == 0 and i > per_athlete - 4 else 1), 2),
+                    'pace': round(rng.uniform(4.2, 6.5), 2),
+                    'heart_rate': rng.randint(125, 172),
+                }
+            })
+    return entries
+
+def strip_date(trends):
+    return {key: value for key, value in trends.items() if key != 'analysis_date'}
+
+def main():
+    athletes = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    per_athlete = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    entries = synthetic_athletes(athletes, per_athlete)
+    results = {'athletes': athletes, 'activities': len(entries)}
+
+    start = time.perf_counter()
+    batch = {result['user_id']: result for result in batch_analyze(iter(entries))}
+    results['batch_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.flush()
+        start = time.perf_counter()
+        with open(f.name) as stdin:
+            output = subprocess.run([sys.executable, str(PROJECT_ROOT / "python" / "batch_analysis.py")],
+                                    stdin=stdin, capture_output=True, text=True, check=True).stdout
+        results['batch_cli_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        results['batch_cli_lines'] = len(output.splitlines())
+
+    by_user = {}
+    for entry in entries:
+        by_user.setdefault(entry['data']['user_id'], []).append(entry)
+    sample = sorted(by_user)[:min(athletes, 500)]
+
+    start = time.perf_counter()
+    single = {user: (analyze_trends(by_user[user]), detect_anomalies(by_user[user])) for user in sample}
+    per_athlete_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    results['per_athlete_ms'] = round(per_athlete_ms * athletes, 1)
+
+    process_sample = sample[:10]
+    start = time.perf_counter()
+    for user in process_sample:
+        payload = json.dumps(by_user[user])
+        for helper in ("analyze_trends.py", "detect_anomalies.py"):
+            subprocess.run([sys.executable, str(PROJECT_ROOT / "python" / helper)],
+                           input=payload, capture_output=True, text=True, check=True)
+    per_process_ms = (time.perf_counter() - start) * 1000 / len(process_sample)
+    results['per_process_ms'] = round(per_process_ms * athletes, 1)
+
+    results['matches_per_athlete'] = all(
+        strip_date(batch[user]['trends']) == strip_date(trends) and batch[user]['anomalies'] == anomalies
+        for user, (trends, anomalies) in single.items())
+    results['alerts'] = sum(1 for result in batch.values() if result['anomalies'].get('has_alerts'))
+    results['speedup_vs_per_athlete'] = round(results['per_athlete_ms'] / results['batch_ms'], 1)
+    results['speedup_vs_per_process'] = round(results['per_process_ms'] / results['batch_cli_ms'], 1)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cross-stream correlations from the daily feature table
+Usage: daily_features_benchmark.py [days]     (default: 1825, five years)
+
+Writes a synthetic knowledge base (one activity most days, a Garmin sleep
+summary, journal and food log every day, as entry files) and times:
+  rejoin       - read every entry file, build the table and correlate, as a
+                 from-scratch join would on every analysis
+  add_day      - fold one new journal entry into the saved table
+  correlate    - correlations over the saved table after that change
+  cached       - the same call again with nothing new
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+from datetime import date, timedelta
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+from activity_store import ActivityStore  # noqa: E402
+from daily_features import DailyFeatures, correlate, correlations  # noqa: E402
+
+START = date(2020, 1, 1)
+
+def write_entry(kb, domain, key, data):
+    path = kb / domain / f"{key}.json"
+    path.write_text(json.dumps({'key': key, 'domain': domain, 'timestamp': f"{key}T21:00:00Z", 'data': data}))
+
+def synthetic_kb(kb, days, seed=11):
+    """Pace suffers after short nights and the day after a big dinner"""
+    rng = random.Random(seed)
+    for domain in ('processed_data', 'garmin_data', 'daily_journals', 'food_logs'):
+        (kb / domain).mkdir(parents=True)
+    calories = 2200
+    for i in range(days):
+        day = (START + timedelta(days=i)).isoformat()
+        hours = rng.uniform(5, 9)
+        write_entry(kb, 'garmin_data', day, {
+            'date': day, 'health_metrics': {'sleep': {'duration_hours': round(hours, 1)},
+                                            'resting_hr': rng.randint(44, 56)}})
+        write_entry(kb, 'daily_journals', day, {
+            'timestamp': f"{day}T21:00:00Z", 'energy_level': rng.choice(['low', 'average', 'good']),
+            'sleep_quality': 'poor' if hours < 6 else 'good',
+            'muscle_soreness': [{'location': 'calves', 'level': rng.randint(1, 4)}]})
+        if rng.random() < 0.8:
+            write_entry(kb, 'processed_data', f"activity_{i}", {
+                'activityId': i, 'date': day, 'distance': round(rng.uniform(5, 15), 2),
+                'pace': round(5.0 + (8 - hours) * 0.12 + (calories - 2200) / 4000 + rng.gauss(0, 0.08), 2),
+                'heart_rate': rng.randint(135, 160)})
+        calories = rng.randint(1800, 3200)
+        write_entry(kb, 'food_logs', day, [
+            {'meal_type': 'dinner', 'food_items': [{'name': 'dinner', 'quantity': 1, 'unit': 'plate',
+                                                    'nutrition_info': {'calories': calories}}]}])
+
+def read_entries(kb, domain, pattern='*'):
+    return [json.loads(path.read_text()) for path in sorted((kb / domain).glob(f"{pattern}.json"))]
+
+def timed(fn, repeat=3):
+    """Best of <repeat> runs, in milliseconds, plus the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 1825
+    results = {'days': days}
+
+    with tempfile.TemporaryDirectory(prefix="daily_features_bench_") as tmp:
+        kb = Path(tmp) / "kb"
+        features = Path(tmp) / "features"
+        synthetic_kb(kb, days)
+
+        def rejoin():
+            table = DailyFeatures()
+            table.add('sleep', read_entries(kb, 'garmin_data'))
+            table.add('journal', read_entries(kb, 'daily_journals'))
+            table.add('food', read_entries(kb, 'food_logs'))
+            table.sync(ActivityStore.from_records(read_entries(kb, 'processed_data', 'activity_*')))
+            return table, correlate(table)
+
+        results['rejoin_ms'], (table, result) = timed(rejoin)
+        table.save(features)
+
+        extra = {'key': (START + timedelta(days=days)).isoformat(), 'data': {'energy_level': 'good'}}
+
+        def add_day():
+            table = DailyFeatures.load(features)
+            table.add('journal', [extra])
+            table.save(features)
+
+        results['add_day_ms'], _ = timed(add_day, repeat=1)
+        results['correlate_ms'], _ = timed(lambda: correlations(features), repeat=1)
+        results['cached_ms'], cached = timed(lambda: correlations(features))
+        results['cached'] = cached['cached']
+        results['correlations'] = len(result['correlations'])
+        results['insights'] = result['insights'][:4]
+
+    results['speedup_incremental'] = round(results['rejoin_ms'] / (results['add_day_ms'] + results['correlate_ms']), 1)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
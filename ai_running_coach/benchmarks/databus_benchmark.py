@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Benchmark: data bus and knowledge base backends
+Usage: databus_benchmark.py [--messages N] [--rate MSGS_PER_SEC] [--backlog N]
+                            [--kb-entries N] [--kb-queries N]
+                            [--bus-backends file,log] [--kb-backends file,sqlite]
+                            [--output results.json]
+
+Drives lib/databus.sh from real bash processes, the same way agents do:
+  bus        - one publisher calls publish_message while one consumer loops on
+               subscribe_channel/commit_cursor, woken by watch_channels.
+               A backlog of already-consumed (but never archived) messages can
+               be left on the channel first, as delegation_commands does.
+  gaps       - publishes 3 messages, loses the first (archived by another
+               consumer on the file backend, its segment dropped by retention
+               on the log backend), and checks the consumer's cursor still
+               reaches 3 once it handles the other two.
+  knowledge  - write_knowledge of N entries, then repeated query_knowledge and
+               query_knowledge_latest over them.
+
+Reports messages/sec, p50/p99 publish-to-consume latency, per-operation
+latency and disk usage, and saves everything as JSON (by default under
+benchmarks/results/) so runs can be compared over time.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATABUS_LIB = PROJECT_ROOT / "lib" / "databus.sh"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Publishes <count> messages, optionally sleeping between them; prints elapsed seconds
+PUBLISHER = r'''
+source "${DATABUS_LIB}"
+count=$1; delay=$2; channel=$3; start=${EPOCHREALTIME}
+for ((i = 1; i <= count; i++)); do
+    publish_message "${channel}" "bench" "{\"i\": ${i}, \"sent\": ${EPOCHREALTIME}}" > /dev/null
+    [ "${delay}" = "0" ] || sleep "${delay}"
+done
+echo "${start} ${EPOCHREALTIME}"
+'''
+
+# Consumes until <expected> messages arrived; prints "<seq> <sent> <received>" per message
+CONSUMER = r'''
+source "${DATABUS_LIB}"
+expected=$1; channel=$2; got=0
+watch_channels "${channel}"
+echo "ready" >&2
+while [ "${got}" -lt "${expected}" ]; do
+    seqs=""
+    while read -r seq sent; do
+        echo "${seq} ${sent} ${EPOCHREALTIME}"
+        got=$((got + 1))
+        seqs="${seqs} ${seq}"
+    done < <(subscribe_channel "${channel}" | jq -r '.[] | "\(.seq) \(.data.sent)"')
+    [ -n "${seqs}" ] && commit_cursor "${channel}" "${seqs}"
+    [ "${got}" -lt "${expected}" ] && wait_for_messages
+done
+'''
+
+# Publishes 3 messages, loses seq 1, handles what is left; prints the seqs
+# delivered, then the cursor file (watermark, handled seqs above it)
+CURSOR_GAPS = r'''
+source "${DATABUS_LIB}"
+channel=$1
+first=$(AGENT_NAME=publisher publish_message "${channel}" "bench" '{"i": 1}')
+for i in 2 3; do
+    AGENT_NAME=publisher publish_message "${channel}" "bench" "{\"i\": ${i}}" > /dev/null
+done
+if [ "${DATABUS_BACKEND}" = "log" ]; then
+    rm "${DATA_BUS_DIR}/log/${channel}/0000000000.log"
+else
+    archive_message "${channel}" "${first}"
+fi
+seqs=$(subscribe_channel "${channel}" | jq -r '[.[].seq] | join(" ")')
+echo "${seqs}"
+commit_cursor "${channel}" "${seqs}"
+cat "${DATA_BUS_DIR}/cursors/${channel}/${CONSUMER_ID}"
+'''
+
+# Writes <entries> knowledge entries, then runs <queries> of each query kind;
+# prints "<op> <start> <end>" per operation
+KNOWLEDGE = r'''
+source "${DATABUS_LIB}"
+entries=$1; queries=$2
+for ((i = 1; i <= entries; i++)); do
+    t0=${EPOCHREALTIME}
+    write_knowledge "bench" "entry_${i}" "{\"user_id\": \"athlete_$((i % 10))\", \"distance\": ${i}, \"pace\": 5.5}"
+    echo "write ${t0} ${EPOCHREALTIME}"
+done
+t0=${EPOCHREALTIME}
+flush_knowledge
+echo "flush ${t0} ${EPOCHREALTIME}"
+for ((i = 1; i <= queries; i++)); do
+    t0=${EPOCHREALTIME}
+    query_knowledge "bench" "entry_*" > /dev/null
+    echo "query_all ${t0} ${EPOCHREALTIME}"
+    t0=${EPOCHREALTIME}
+    query_knowledge_latest "bench" "entry_*" 7 > /dev/null
+    echo "query_latest ${t0} ${EPOCHREALTIME}"
+done
+'''
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def latency_summary(seconds):
+    """p50/p99/max in milliseconds"""
+    return {
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3) if seconds else None,
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3) if seconds else None,
+        'max_ms': round(max(seconds) * 1000, 3) if seconds else None,
+    }
+
+def disk_usage(path):
+    """Bytes allocated on disk under path (du, so block overhead per file counts)"""
+    if not path.exists():
+        return 0
+    output = subprocess.run(['du', '-sk', str(path)], capture_output=True, text=True).stdout
+    return int(output.split()[0]) * 1024 if output else 0
+
+def bench_env(root, **overrides):
+    config_dir = root / "config"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    env = dict(
+        os.environ,
+        DATABUS_LIB=str(DATABUS_LIB),
+        DATA_BUS_DIR=str(root / "data_bus"),
+        SHARED_KB_DIR=str(root / "shared_knowledge_base"),
+        LOGS_DIR=str(root / "logs"),
+        PID_DIR=str(root / "pids"),
+        CONFIG_DIR=str(config_dir),
+        AGENT_NAME="benchmark",
+        POLL_INTERVAL="1",
+    )
+    for name in ("logs", "pids", "shared_knowledge_base"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+def run_bash(script, args, env):
+    return subprocess.run(['bash', '-c', script, 'bench'] + [str(a) for a in args],
+                          env=env, capture_output=True, text=True, check=True)
+
+def bench_bus(backend, messages, rate, backlog):
+    root = Path(tempfile.mkdtemp(prefix=f"databus_bench_{backend}_"))
+    try:
+        env = bench_env(root, DATABUS_BACKEND=backend, DATABUS_WAKEUPS="true")
+        channel = "bench"
+        result = {'backend': backend, 'messages': messages, 'target_rate': rate, 'backlog': backlog}
+
+        if backlog:
+            # Already consumed by this consumer but still on the channel
+            start_end = run_bash(PUBLISHER, [backlog, 0, channel], env).stdout.split()
+            run_bash('source "${DATABUS_LIB}"; commit_cursor "$1" "$2"',
+                     [channel, ' '.join(str(seq) for seq in range(1, backlog + 1))],
+                     dict(env, AGENT_NAME="consumer"))
+            elapsed = float(start_end[1]) - float(start_end[0])
+            result['backlog_publish_msgs_per_sec'] = round(backlog / elapsed, 1)
+
+        consumer = subprocess.Popen(['bash', '-c', CONSUMER, 'bench', str(messages), channel],
+                                    env=dict(env, AGENT_NAME="consumer"),
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        consumer.stderr.readline()  # "ready": wakeups are registered
+
+        delay = 0 if not rate else round(1.0 / rate, 6)
+        start, end = (float(t) for t in run_bash(PUBLISHER, [messages, delay, channel], env).stdout.split())
+        received, _ = consumer.communicate(timeout=max(60, messages))
+
+        latencies, last_received = [], start
+        for line in received.splitlines():
+            _, sent, recv = line.split()
+            latencies.append(float(recv) - float(sent))
+            last_received = max(last_received, float(recv))
+
+        result.update({
+            'publish_msgs_per_sec': round(messages / (end - start), 1),
+            'end_to_end_msgs_per_sec': round(len(latencies) / (last_received - start), 1),
+            'consumed': len(latencies),
+            'latency': latency_summary(latencies),
+            'disk_bytes': disk_usage(root / "data_bus"),
+        })
+        return result
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def check_cursor_gaps(backend):
+    """Whether a consumer's cursor moves past a message that is gone"""
+    root = Path(tempfile.mkdtemp(prefix=f"databus_gaps_{backend}_"))
+    try:
+        # One message per log segment, so dropping the first loses only seq 1
+        env = bench_env(root, DATABUS_BACKEND=backend, DATABUS_SEGMENT_BYTES=1, AGENT_NAME="consumer")
+        delivered, cursor, handled = (run_bash(CURSOR_GAPS, ["gaps"], env).stdout.split('\n') + ['', ''])[:3]
+        return {'backend': backend, 'delivered': delivered, 'cursor': cursor, 'handled': handled,
+                'ok': delivered == "2 3" and cursor == "3" and not handled.strip()}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def bench_knowledge(backend, entries, queries, write_behind):
+    root = Path(tempfile.mkdtemp(prefix=f"kb_bench_{backend}_"))
+    try:
+        env = bench_env(root, KB_BACKEND=backend, KB_WRITE_BEHIND=str(write_behind).lower())
+        env['KB_DB'] = str(root / "shared_knowledge_base" / "knowledge.db")
+        if backend == "sqlite":
+            run_bash('source "${DATABUS_LIB}"', [], env)  # creates the schema
+
+        start = time.perf_counter()
+        output = run_bash(KNOWLEDGE, [entries, queries], env).stdout
+        total = time.perf_counter() - start
+
+        durations = {}
+        for line in output.splitlines():
+            op, t0, t1 = line.split()
+            durations.setdefault(op, []).append(float(t1) - float(t0))
+
+        result = {'backend': backend, 'write_behind': write_behind, 'entries': entries,
+                  'queries': queries, 'total_seconds': round(total, 3)}
+        for op, values in durations.items():
+            result[op] = {'ops': len(values), 'ops_per_sec': round(len(values) / sum(values), 1)
+                          if sum(values) else None, **latency_summary(values)}
+        result['disk_bytes'] = disk_usage(root / "shared_knowledge_base")
+        return result
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=0,
+                        help="target publish rate in messages/sec (0 = as fast as possible)")
+    parser.add_argument('--backlog', type=int, default=0,
+                        help="consumed-but-unarchived messages left on the channel first")
+    parser.add_argument('--kb-entries', type=int, default=200)
+    parser.add_argument('--kb-queries', type=int, default=20)
+    parser.add_argument('--bus-backends', default="file,log")
+    parser.add_argument('--kb-backends', default="file,sqlite")
+    parser.add_argument('--write-behind', action='store_true',
+                        help="also run each knowledge backend with write-behind buffering")
+    parser.add_argument('--output', type=Path,
+                        help="results file (default: benchmarks/results/databus_<utc time>.json)")
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'bus': [],
+        'gaps': [],
+        'knowledge': [],
+    }
+
+    for backend in filter(None, args.bus_backends.split(',')):
+        print(f"bus: {backend}", file=sys.stderr)
+        results['bus'].append(bench_bus(backend, args.messages, args.rate, args.backlog))
+        results['gaps'].append(check_cursor_gaps(backend))
+
+    for backend in filter(None, args.kb_backends.split(',')):
+        if backend == "sqlite" and not shutil.which("sqlite3"):
+            print("knowledge: sqlite skipped (sqlite3 not installed)", file=sys.stderr)
+            continue
+        for write_behind in ([False, True] if args.write_behind else [False]):
+            print(f"knowledge: {backend}{' (write-behind)' if write_behind else ''}", file=sys.stderr)
+            results['knowledge'].append(
+                bench_knowledge(backend, args.kb_entries, args.kb_queries, write_behind))
+
+    output = args.output or RESULTS_DIR / f"databus_{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    print(json.dumps(results, indent=2))
+    print(f"Results saved to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
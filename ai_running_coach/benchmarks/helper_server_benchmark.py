@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fork-per-call helpers vs the persistent helper server
+Usage: helper_server_benchmark.py [calls_per_helper]
+
+Compares three ways of running the same helper with the same stdin:
+  fork        - python3 python/<helper>.py          (what agents used to do)
+  client      - python3 -S python/helper_client.py  (what run_python_helper does)
+  socket      - a raw socket request, i.e. the server's own throughput
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PYTHON_DIR = PROJECT_ROOT / "python"
+
+WORKLOADS = {
+    'parse_intent': b"Create a training plan for my 10k race",
+    'analyze_trends': json.dumps([
+        {'data': {'pace': 5.5 - i * 0.01, 'distance': 8 + i % 5, 'heart_rate': 150 + i % 10}}
+        for i in range(200)
+    ]).encode(),
+}
+
+def socket_call(socket_path, helper, payload):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    header = b'0\0' + helper.encode()
+    sock.sendall(str(len(header)).encode() + b'\n' + header + payload)
+    sock.shutdown(socket.SHUT_WR)
+    response = sock.makefile('rb')
+    exit_code = int(response.readline().split()[0])
+    response.read()
+    sock.close()
+    return exit_code
+
+def time_calls(calls, fn):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - start
+    return {'calls': calls, 'seconds': round(elapsed, 3), 'calls_per_sec': round(calls / elapsed, 1)}
+
+def wait_for_socket(path, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(path):
+            return True
+        time.sleep(0.05)
+    return False
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="helper_bench_"), "helper_server.sock")
+    env = dict(os.environ, HELPER_SOCKET=socket_path)
+
+    server = subprocess.Popen(
+        [sys.executable, str(PYTHON_DIR / "helper_server.py"), "--socket", socket_path],
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_socket(socket_path):
+            print("Helper server did not start", file=sys.stderr)
+            sys.exit(1)
+
+        results = {}
+        for helper, payload in WORKLOADS.items():
+            script = str(PYTHON_DIR / f"{helper}.py")
+            client = str(PYTHON_DIR / "helper_client.py")
+
+            results[helper] = {
+                'fork': time_calls(calls, lambda: subprocess.run(
+                    [sys.executable, script], input=payload, capture_output=True, check=True)),
+                'client': time_calls(calls, lambda: subprocess.run(
+                    [sys.executable, "-S", client, helper], input=payload,
+                    capture_output=True, check=True, env=env)),
+                'socket': time_calls(calls, lambda: socket_call(socket_path, helper, payload)),
+            }
+            fork_rate = results[helper]['fork']['calls_per_sec']
+            for mode in ('client', 'socket'):
+                results[helper][mode]['speedup_vs_fork'] = round(
+                    results[helper][mode]['calls_per_sec'] / fork_rate, 2)
+
+        print(json.dumps(results, indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: planned-vs-actual compliance as activities land
+Usage: training_progress_benchmark.py [years] [weeks]     (default: 10 years of history, a 16-week plan)
+
+Builds a store of <years> of near-daily runs ending with a <weeks>-week plan
+of five runs a week, most of them run, then times, for one more activity
+appended to the store:
+  rejoin       - update_training_progress over the whole plan and history,
+                 as a from-scratch join would on every activity
+  incremental  - load_progress against the persisted join, which matches
+                 only the new activity
+  unchanged    - the same with nothing new
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+from datetime import date, timedelta
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+import activity_store  # noqa: E402
+from activity_store import ActivityStore  # noqa: E402
+from update_training_progress import load_progress, progress_report, update_training_progress  # noqa: E402
+
+START = date(2016, 1, 4)
+WEEK = [(0, 'easy', 8), (1, 'tempo', 10), (3, 'easy', 8), (4, 'interval', 9), (6, 'long', 20)]
+
+def run(rng, activities, day, km):
+    activities.append({'activityId': len(activities), 'date': day.isoformat(),
+                       'distance': round(km * rng.uniform(0.8, 1.15), 2), 'pace': round(rng.uniform(4.6, 6.0), 2),
+                       'heart_rate': rng.randint(130, 175), 'duration_minutes': round(km * 5.5)})
+
+def synthetic(years, weeks, seed=3):
+    rng = random.Random(seed)
+    activities, workouts = [], []
+    history = years * 52 - weeks
+    for day in range(history * 7):
+        if rng.random() < 0.8:
+            run(rng, activities, START + timedelta(days=day), rng.uniform(5, 15))
+    start = START + timedelta(weeks=history)
+    for week in range(weeks):
+        for weekday, kind, km in WEEK:
+            day = start + timedelta(weeks=week, days=weekday)
+            workouts.append({'date': day.isoformat(), 'week_number': week + 1, 'type': kind, 'distance_km': km,
+                             'pace': 'easy' if kind in ('easy', 'long') else 'hard'})
+            if rng.random() < 0.85:
+                run(rng, activities, day, km)
+    return {'start_date': start.isoformat(), 'weeks': weeks, 'workouts': workouts}, activities
+
+def timed(fn, repeat=3):
+    """Best of <repeat> runs, in milliseconds, plus the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    plan, activities = synthetic(years, weeks)
+    results = {'workouts': len(plan['workouts']), 'activities': len(activities)}
+
+    with tempfile.TemporaryDirectory(prefix="training_progress_bench_") as tmp:
+        path = Path(tmp) / "store"
+        *history, latest = activities
+        activity_store.rebuild(path, history)
+        load_progress(path, ActivityStore.load(path), plan)
+        activity_store.append(path, [latest])
+
+        def incremental():
+            return progress_report(load_progress(path, ActivityStore.load(path), plan))
+
+        results['rejoin_ms'], full = timed(lambda: update_training_progress(plan, activities))
+        results['incremental_ms'], report = timed(incremental, repeat=1)
+        results['unchanged_ms'], _ = timed(incremental)
+        results['matches'] = report == full
+        results['adherence_percent'] = report['adherence_percent']
+
+    results['speedup'] = round(results['rejoin_ms'] / results['incremental_ms'], 1)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
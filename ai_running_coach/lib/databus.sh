@@ -1,25 +1,116 @@
 #!/bin/bash
 # Data Bus Communication Library - Arch Linux Compatible
 
+# Read a data bus setting from system_config.json (.system.<key>), with a default
+databus_config() {
+    local key=$1
+    local default=$2
+    local config_file="${CONFIG_DIR}/system_config.json"
+    
+    if [ -f "${config_file}" ]; then
+        jq -r --arg key "${key}" --arg default "${default}" \
+            '.system[$key] // $default' "${config_file}" 2>/dev/null || echo "${default}"
+    else
+        echo "${default}"
+    fi
+}
+
+# Channel storage backend (environment overrides system_config.json):
+#   file - one JSON file per message in channels/<channel>/
+#   log  - append-only segment files in log/<channel>/
+DATABUS_BACKEND="${DATABUS_BACKEND:-$(databus_config data_bus_backend file)}"
+DATABUS_SEGMENT_BYTES="${DATABUS_SEGMENT_BYTES:-$(databus_config data_bus_segment_bytes 1048576)}"
+
+# Every message gets a per-channel sequence number. seq/<channel>.idx holds
+# one fixed-width record per message ("<seq> <priority> <location>"), so record
+# N starts at byte (N - 1) * SEQ_RECORD_BYTES and a consumer's cursor (the seq
+# below which it has handled everything, in cursors/<channel>/<consumer>)
+# locates new messages with one seek.
+SEQ_RECORD_BYTES=64
+
+# Message priorities, in delivery order. Unread messages are delivered
+# highest priority first, then by seq.
+DATABUS_PRIORITY_RANKS='{"high": 0, "normal": 1, "low": 2}'
+
+# Backpressure: once the slowest running consumer of a channel is
+# DATABUS_BACKPRESSURE_LIMIT messages behind, normal and low priority
+# publishes wait up to DATABUS_BACKPRESSURE_WAIT seconds for it to catch up.
+# High priority messages are never held back. A limit of 0 disables it.
+DATABUS_BACKPRESSURE_LIMIT="${DATABUS_BACKPRESSURE_LIMIT:-$(databus_config data_bus_backpressure_limit 500)}"
+DATABUS_BACKPRESSURE_WAIT="${DATABUS_BACKPRESSURE_WAIT:-$(databus_config data_bus_backpressure_wait 5)}"
+
+# Replicas of one agent share its AGENT_NAME and differ by AGENT_INSTANCE
+CONSUMER_ID="${AGENT_NAME}${AGENT_INSTANCE:+.${AGENT_INSTANCE}}"
+
+# Consumer groups: a claimed message is leased to one replica until it is
+# acked, and redelivered to any replica once the lease expires
+DATABUS_LEASE_SECONDS="${DATABUS_LEASE_SECONDS:-$(databus_config data_bus_lease_seconds 60)}"
+DATABUS_MAX_DELIVERIES="${DATABUS_MAX_DELIVERIES:-$(databus_config data_bus_max_deliveries 5)}"
+
+# With wakeups enabled, sleep_interval blocks on a FIFO that publish_message
+# pokes, and POLL_INTERVAL becomes only the fallback timeout
+DATABUS_WAKEUPS="${DATABUS_WAKEUPS:-$(databus_config data_bus_wakeups true)}"
+POLL_INTERVAL="${POLL_INTERVAL:-$(databus_config data_bus_poll_interval 2)}"
+WAKEUP_FD=""
+
+# Knowledge base backend (environment overrides system_config.json):
+#   file   - one JSON file per key in shared_knowledge_base/<domain>/
+#   sqlite - one WAL-mode database, indexed by domain, key, timestamp and user
+KB_BACKEND="${KB_BACKEND:-$(databus_config knowledge_base_backend file)}"
+KB_DB="${KB_DB:-${SHARED_KB_DIR}/knowledge.db}"
+
+# Write-behind: write_knowledge buffers entries in memory (coalescing repeated
+# writes to a key) and flushes them as one batch. Reads of dirty keys are
+# served from the buffer. KB_FSYNC is one of: none, batch, always.
+KB_WRITE_BEHIND="${KB_WRITE_BEHIND:-$(databus_config knowledge_base_write_behind false)}"
+KB_FLUSH_INTERVAL="${KB_FLUSH_INTERVAL:-$(databus_config knowledge_base_flush_interval 2)}"
+KB_FLUSH_BATCH="${KB_FLUSH_BATCH:-$(databus_config knowledge_base_flush_batch 100)}"
+KB_FSYNC="${KB_FSYNC:-$(databus_config knowledge_base_fsync none)}"
+declare -A KB_DIRTY=()
+KB_DIRTY_SINCE=0
+
 generate_message_id() {
     echo "msg_$(date +%s)_$$_${RANDOM}"
 }
 
+# Usage: publish_message <channel> <type> <data> [priority]
+# Without an explicit priority, a "priority" field in <data> is used (the
+# orchestrator tags delegations this way), falling back to "normal".
 publish_message() {
     local channel=$1
     local msg_type=$2
     local data=$3
+    local priority=$4
+    
+    if [ -z "${priority}" ] && [[ "${data}" == *'"priority"'* ]]; then
+        priority=$(jq -r '.priority // empty' <<< "${data}" 2>/dev/null)
+    fi
+    case "${priority}" in
+        high|normal|low) ;;
+        *) priority="normal" ;;
+    esac
+    
+    if [ "${priority}" != "high" ]; then
+        wait_for_capacity "${channel}" || true
+    fi
     
     local msg_id=$(generate_message_id)
     # Arch-compatible timestamp (without milliseconds)
     local timestamp=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
-    local channel_dir="${DATA_BUS_DIR}/channels/${channel}"
+    local seq_dir="${DATA_BUS_DIR}/seq"
+    mkdir -p "${seq_dir}"
     
-    mkdir -p "${channel_dir}"
-    
-    local message=$(cat <<EOFMSG
+    (
+        # Sequence numbers are handed out in index order under this lock
+        flock -x 9
+        local index_file="${seq_dir}/${channel}.idx"
+        local seq=$(( $(stat -c %s "${index_file}" 2>/dev/null || echo 0) / SEQ_RECORD_BYTES + 1 ))
+        local location
+        local message=$(cat <<EOFMSG
 {
     "id": "${msg_id}",
+    "seq": ${seq},
+    "priority": "${priority}",
     "type": "${msg_type}",
     "timestamp": "${timestamp}",
     "sender": "${AGENT_NAME}",
@@ -27,40 +118,364 @@ publish_message() {
 }
 EOFMSG
 )
+        
+        if [ "${DATABUS_BACKEND}" = "log" ]; then
+            location=$(log_append_message "${channel}" "${message}")
+        else
+            local channel_dir="${DATA_BUS_DIR}/channels/${channel}"
+            mkdir -p "${channel_dir}"
+            echo "${message}" > "${channel_dir}/${msg_id}.json"
+            location="${msg_id}"
+        fi
+        # The record goes in last, so readers never see a seq before its message
+        printf "%-$((SEQ_RECORD_BYTES - 1))s\n" "${seq} ${priority} ${location}" >> "${index_file}"
+    ) 9> "${seq_dir}/${channel}.lock"
     
-    echo "${message}" > "${channel_dir}/${msg_id}.json"
+    notify_channel "${channel}"
     echo "${msg_id}"
 }
 
+# Register this agent for wakeups on the given channels. Each agent owns one
+# FIFO (wakeups/<agent>.fifo), linked into wakeups/<channel>/ for every channel.
+# Usage: watch_channels <channel> [channel...]
+watch_channels() {
+    [ "${DATABUS_WAKEUPS}" = "true" ] || return 0
+    
+    local wakeup_dir="${DATA_BUS_DIR}/wakeups"
+    local fifo="${wakeup_dir}/${CONSUMER_ID}.fifo"
+    mkdir -p "${wakeup_dir}"
+    
+    if [ -z "${WAKEUP_FD}" ]; then
+        [ -p "${fifo}" ] || mkfifo "${fifo}" 2>/dev/null || {
+            log_agent "WARN" "Cannot create wakeup FIFO, falling back to polling"
+            return 0
+        }
+        # Opened read-write so the open never blocks and the FIFO always has a reader
+        exec {WAKEUP_FD}<> "${fifo}"
+    fi
+    
+    local channel
+    for channel in "$@"; do
+        mkdir -p "${wakeup_dir}/${channel}"
+        ln -sf "${fifo}" "${wakeup_dir}/${channel}/${CONSUMER_ID}"
+    done
+    log_agent "INFO" "Watching for wakeups on: $*"
+}
+
+# Wake every agent watching a channel. Writes are non-blocking, so a dead
+# agent's FIFO (no reader) or a full pipe never stalls the publisher.
+notify_channel() {
+    local channel=$1
+    local waiter
+    
+    for waiter in "${DATA_BUS_DIR}/wakeups/${channel}"/*; do
+        [ -p "${waiter}" ] || continue
+        printf '1' | dd of="${waiter}" oflag=nonblock status=none 2>/dev/null || true
+    done
+}
+
+# Append one message to the channel's active log segment, rolling to a new
+# segment once DATABUS_SEGMENT_BYTES is reached. Prints "<segment>:<offset>".
+log_append_message() {
+    local channel=$1
+    local message=$2
+    local log_dir="${DATA_BUS_DIR}/log/${channel}"
+    
+    mkdir -p "${log_dir}"
+    
+    # Newlines in valid JSON are only ever whitespace, so this keeps one message per line
+    message="${message//$'\n'/}"
+    
+    (
+        flock -x 9
+        local segment=$(ls "${log_dir}" | grep -E '^[0-9]+\.log$' | sort | tail -n 1)
+        local size=0
+        if [ -z "${segment}" ]; then
+            segment="0000000000.log"
+        else
+            size=$(stat -c %s "${log_dir}/${segment}")
+            if [ "${size}" -ge "${DATABUS_SEGMENT_BYTES}" ]; then
+                segment=$(printf "%010d.log" $((10#${segment%.log} + 1)))
+                size=0
+            fi
+        fi
+        printf '%s\n' "${message}" >> "${log_dir}/${segment}"
+        echo "${segment%.log}:${size}"
+    ) 9> "${log_dir}/.lock"
+}
+
+# Print the seq through which this consumer has handled every message on a
+# channel (0 if none)
+# Usage: channel_cursor <channel> [consumer]
+channel_cursor() {
+    local channel=$1
+    local consumer=${2:-${CONSUMER_ID}}
+    local cursor_file="${DATA_BUS_DIR}/cursors/${channel}/${consumer}"
+    local cursor=0
+    
+    [ -f "${cursor_file}" ] && read -r cursor < "${cursor_file}"
+    echo "${cursor:-0}"
+}
+
+# Persist a consumer's progress once messages are handled, so a restarted
+# agent resumes exactly where it stopped. Priority delivery means messages can
+# be handled out of seq order, so the cursor file holds the contiguous
+# watermark on its first line and any handled seqs above it on the second.
+# Usage: commit_cursor <channel> <seq>[" seq..."] [consumer]
+commit_cursor() {
+    local channel=$1
+    local seqs=$2
+    local consumer=${3:-${CONSUMER_ID}}
+    local cursor_dir="${DATA_BUS_DIR}/cursors/${channel}"
+    local cursor_file="${cursor_dir}/${consumer}"
+    
+    # The archive compactor moves cursors too (compact_archive.py), under the
+    # same lock
+    mkdir -p "${cursor_dir}"
+    (
+        flock -x 9
+        local cursor=0 handled="" seq
+        [ -f "${cursor_file}" ] && { read -r cursor; read -r handled; } < "${cursor_file}"
+        cursor=${cursor:-0}
+        
+        local -A above=()
+        for seq in ${handled} ${seqs}; do
+            [[ "${seq}" =~ ^[0-9]+$ ]] && [ "${seq}" -gt "${cursor}" ] && above[${seq}]=1
+        done
+        [ ${#above[@]} -gt 0 ] || exit 0
+        
+        while [ -n "${above[$((cursor + 1))]}" ]; do
+            cursor=$((cursor + 1))
+            unset "above[${cursor}]"
+        done
+        
+        printf '%s\n%s\n' "${cursor}" "${!above[*]}" > "${cursor_dir}/.${consumer}.$$.tmp"
+        mv "${cursor_dir}/.${consumer}.$$.tmp" "${cursor_file}"
+    ) 9> "${cursor_dir}/.lock"
+}
+
+# Print the messages on a channel with seq greater than <cursor> (minus the
+# already handled seqs listed in [handled]) as a JSON array, highest priority
+# first. Only index records past the cursor are read; messages already gone
+# (archived by another consumer, expired, or dropped with their log segment)
+# are skipped without being opened, and committed for [consumer] so its
+# cursor moves past them.
+# Usage: read_messages_since <channel> <cursor> [handled] [consumer]
+read_messages_since() {
+    local channel=$1
+    local cursor=$2
+    local handled=$3
+    local consumer=$4
+    local index_file="${DATA_BUS_DIR}/seq/${channel}.idx"
+    
+    # Whole records only: a record still being appended must not pass for a
+    # message that is gone
+    local records="" size
+    size=$(stat -c %s "${index_file}" 2>/dev/null) && [ $((size / SEQ_RECORD_BYTES)) -gt "${cursor}" ] && \
+        records=$(tail -c +$((cursor * SEQ_RECORD_BYTES + 1)) "${index_file}" | \
+            head -c $(((size / SEQ_RECORD_BYTES - cursor) * SEQ_RECORD_BYTES)))
+    if [ -z "${records}" ]; then
+        echo "[]"
+        return
+    fi
+    
+    local order='sort_by(($ranks[.priority // "normal"] // 1), .seq)'
+    local -A skipped=()
+    local seq priority location missing=""
+    for seq in ${handled}; do
+        skipped[${seq}]=1
+    done
+    if [ "${DATABUS_BACKEND}" = "log" ]; then
+        local log_dir="${DATA_BUS_DIR}/log/${channel}"
+        local start_segment="" start_offset=0
+        local -A present=()
+        while read -r seq priority location; do
+            location=${location:-${priority}}
+            [ -n "${skipped[${seq}]}" ] && continue
+            if [ -z "${present[${location%:*}]}" ]; then
+                [ -f "${log_dir}/${location%:*}.log" ] && present[${location%:*}]=yes || present[${location%:*}]=no
+            fi
+            if [ "${present[${location%:*}]}" = "no" ]; then
+                missing="${missing} ${seq}"
+            elif [ -z "${start_segment}" ]; then
+                start_segment="${location%:*}" start_offset="${location#*:}"
+            fi
+        done <<< "${records}"
+        [ -n "${missing}" ] && [ -n "${consumer}" ] && commit_cursor "${channel}" "${missing}" "${consumer}"
+        if [ -z "${start_segment}" ]; then
+            echo "[]"
+            return
+        fi
+        
+        # Messages after the first one still in the log are contiguous, so
+        # read from its segment offset to the end
+        local skip="[${handled// /,}]"
+        (
+            exec 9> "${log_dir}/.lock"
+            # Shared lock: never read a line a publisher is still appending
+            flock -s 9
+            local segment_file segment
+            for segment_file in $(ls "${log_dir}" | grep -E '^[0-9]+\.log$' | sort); do
+                segment="${segment_file%.log}"
+                [[ "${segment}" < "${start_segment}" ]] && continue
+                if [ "${segment}" = "${start_segment}" ]; then
+                    tail -c +$((start_offset + 1)) "${log_dir}/${segment_file}"
+                else
+                    cat "${log_dir}/${segment_file}"
+                fi
+            done
+        ) | jq -cs --argjson cursor "${cursor}" --argjson skip "${skip}" --argjson ranks "${DATABUS_PRIORITY_RANKS}" \
+            "[.[] | select(.seq > \$cursor and (.seq as \$s | \$skip | index(\$s) | not))] | ${order}"
+    else
+        local channel_dir="${DATA_BUS_DIR}/channels/${channel}"
+        local files=()
+        while read -r seq priority location; do
+            # Records written before priorities existed are "<seq> <location>"
+            location=${location:-${priority}}
+            [ -n "${skipped[${seq}]}" ] && continue
+            if [ -f "${channel_dir}/${location}.json" ]; then
+                files+=("${channel_dir}/${location}.json")
+            else
+                missing="${missing} ${seq}"
+            fi
+        done <<< "${records}"
+        [ -n "${missing}" ] && [ -n "${consumer}" ] && commit_cursor "${channel}" "${missing}" "${consumer}"
+        if [ ${#files[@]} -eq 0 ]; then
+            echo "[]"
+            return
+        fi
+        # A message archived since the check is simply read next time (and
+        # then committed as missing)
+        cat "${files[@]}" 2>/dev/null | jq -cs --argjson ranks "${DATABUS_PRIORITY_RANKS}" "${order}"
+    fi
+}
+
+# Return this consumer's unhandled messages on a channel, highest priority
+# first and oldest first within a priority. Progress only moves on
+# commit_cursor, so a message that was read but not yet handled is returned
+# again after a restart. An optional timestamp narrows the result further.
+# A replica (AGENT_INSTANCE set) reading a channel for the first time starts
+# at its head: the messages already there are its primary's.
+# Usage: subscribe_channel <channel> [last_seen_timestamp]
 subscribe_channel() {
     local channel=$1
     local last_seen=${2:-"0"}
-    local channel_dir="${DATA_BUS_DIR}/channels/${channel}"
+    local cursor_file="${DATA_BUS_DIR}/cursors/${channel}/${CONSUMER_ID}"
+    local cursor=0 handled=""
     
-    if [ ! -d "${channel_dir}" ]; then
-        echo "[]"
+    if [ ! -f "${cursor_file}" ] && [ -n "${AGENT_INSTANCE}" ]; then
+        mkdir -p "${cursor_file%/*}"
+        (
+            flock -x 9
+            [ -f "${cursor_file}" ] && exit 0
+            local size=$(stat -c %s "${DATA_BUS_DIR}/seq/${channel}.idx" 2>/dev/null || echo 0)
+            printf '%s\n\n' $((size / SEQ_RECORD_BYTES)) > "${cursor_file%/*}/.${CONSUMER_ID}.$$.tmp"
+            mv "${cursor_file%/*}/.${CONSUMER_ID}.$$.tmp" "${cursor_file}"
+        ) 9> "${cursor_file%/*}/.lock"
+    fi
+    [ -f "${cursor_file}" ] && { read -r cursor; read -r handled; } < "${cursor_file}"
+    local messages=$(read_messages_since "${channel}" "${cursor:-0}" "${handled}" "${CONSUMER_ID}")
+    
+    if [ "${last_seen}" = "0" ]; then
+        echo "${messages}"
+    else
+        jq -c --arg last_seen "${last_seen}" '[.[] | select(.timestamp > $last_seen)]' <<< "${messages}"
+    fi
+}
+
+# Print a consumer's unhandled message counts per priority as JSON,
+# e.g. {"high": 1, "normal": 12, "low": 0, "total": 13}
+# Usage: channel_depths <channel> [consumer]
+channel_depths() {
+    local channel=$1
+    local consumer=${2:-${CONSUMER_ID}}
+    local index_file="${DATA_BUS_DIR}/seq/${channel}.idx"
+    local cursor_file="${DATA_BUS_DIR}/cursors/${channel}/${consumer}"
+    local cursor=0 handled=""
+    
+    [ -f "${cursor_file}" ] && { read -r cursor; read -r handled; } < "${cursor_file}"
+    
+    { [ -f "${index_file}" ] && tail -c +$((${cursor:-0} * SEQ_RECORD_BYTES + 1)) "${index_file}"; } | \
+        awk -v handled="${handled}" '
+            BEGIN { split(handled, h, " "); for (i in h) skip[h[i]] = 1; depth["high"] = depth["normal"] = depth["low"] = 0 }
+            NF && !($1 in skip) { p = (NF >= 3 && ($2 in depth)) ? $2 : "normal"; depth[p]++; total++ }
+            END { printf "{\"high\": %d, \"normal\": %d, \"low\": %d, \"total\": %d}\n", depth["high"], depth["normal"], depth["low"], total }'
+}
+
+# Print how far the slowest running consumer of a channel is behind: unhandled
+# messages for plain subscribers (those with a pid file in PID_DIR, so a
+# stopped replica never stalls publishers) and leased or pending messages for
+# consumer groups
+channel_backlog() {
+    local channel=$1
+    local index_file="${DATA_BUS_DIR}/seq/${channel}.idx"
+    
+    if [ ! -f "${index_file}" ]; then
+        echo "0"
         return
     fi
     
-    local messages="["
-    local first=true
+    local published=$(( $(stat -c %s "${index_file}") / SEQ_RECORD_BYTES ))
+    local backlog=0 lag cursor_file cursor handled leases
     
-    for msg_file in "${channel_dir}"/*.json; do
-        [ -f "${msg_file}" ] || continue
-        local msg_timestamp=$(jq -r '.timestamp' "${msg_file}" 2>/dev/null || echo "0")
-        if [[ "${msg_timestamp}" > "${last_seen}" ]]; then
-            [ "${first}" = true ] || messages="${messages},"
-            first=false
-            messages="${messages}$(cat ${msg_file})"
-        fi
+    for cursor_file in "${DATA_BUS_DIR}/cursors/${channel}"/*; do
+        [ -f "${PID_DIR}/${cursor_file##*/}.pid" ] || continue
+        cursor=0 handled=""
+        { read -r cursor; read -r handled; } < "${cursor_file}"
+        handled=(${handled})
+        lag=$((published - ${cursor:-0} - ${#handled[@]}))
+        [ "${lag}" -gt "${backlog}" ] && backlog=${lag}
+    done
+    
+    for leases in "${DATA_BUS_DIR}/groups/${channel}"/*/leases; do
+        [ -d "${leases}" ] || continue
+        lag=$(ls "${leases}" | wc -l)
+        [ "${lag}" -gt "${backlog}" ] && backlog=${lag}
     done
     
-    echo "${messages}]"
+    echo "${backlog}"
+}
+
+# Backpressure signal for publishers: returns 0 once the channel has room
+# (backlog under DATABUS_BACKPRESSURE_LIMIT), waiting up to
+# DATABUS_BACKPRESSURE_WAIT seconds for it; returns 1 if it is still full.
+# Usage: wait_for_capacity <channel>
+wait_for_capacity() {
+    local channel=$1
+    [ "${DATABUS_BACKPRESSURE_LIMIT}" -gt 0 ] || return 0
+    
+    local backlog=$(channel_backlog "${channel}")
+    [ "${backlog}" -lt "${DATABUS_BACKPRESSURE_LIMIT}" ] && return 0
+    
+    log_agent "WARN" "Backpressure on ${channel}: ${backlog} messages behind (limit ${DATABUS_BACKPRESSURE_LIMIT}), slowing down"
+    local waited=0
+    while [ "${waited}" -lt $((DATABUS_BACKPRESSURE_WAIT * 10)) ]; do
+        sleep 0.1
+        waited=$((waited + 1))
+        backlog=$(channel_backlog "${channel}")
+        [ "${backlog}" -lt "${DATABUS_BACKPRESSURE_LIMIT}" ] && return 0
+    done
+    return 1
 }
 
 read_knowledge() {
     local domain=$1
     local key=$2
+    
+    if [ -n "${KB_DIRTY[${domain}/${key}]+set}" ]; then
+        echo "${KB_DIRTY[${domain}/${key}]}"
+        return
+    fi
+    
+    if [ "${KB_BACKEND}" = "sqlite" ]; then
+        local entry=$(kb_sql <<EOSQL
+SELECT entry FROM knowledge WHERE domain = $(sql_quote "${domain}") AND key = $(sql_quote "${key}");
+EOSQL
+)
+        [ -n "${entry}" ] && echo "${entry}" || echo "null"
+        return
+    fi
+    
     local kb_file="${SHARED_KB_DIR}/${domain}/${key}.json"
     [ -f "${kb_file}" ] && cat "${kb_file}" || echo "null"
 }
@@ -69,8 +484,6 @@ write_knowledge() {
     local domain=$1
     local key=$2
     local data=$3
-    local kb_dir="${SHARED_KB_DIR}/${domain}"
-    mkdir -p "${kb_dir}"
     
     local timestamp=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
     local entry=$(cat <<EOFMSG
@@ -84,12 +497,106 @@ write_knowledge() {
 EOFMSG
 )
     
-    echo "${entry}" > "${kb_dir}/${key}.json"
+    # A buffer filled in a subshell (e.g. a "| while read" loop) would be lost
+    # when it exits, so those writes always go straight to storage
+    if [ "${KB_WRITE_BEHIND}" = "true" ] && [ "${BASH_SUBSHELL}" -eq 0 ]; then
+        [ ${#KB_DIRTY[@]} -eq 0 ] && KB_DIRTY_SINCE=${EPOCHSECONDS}
+        KB_DIRTY["${domain}/${key}"]="${entry}"
+        if [ ${#KB_DIRTY[@]} -ge "${KB_FLUSH_BATCH}" ] || \
+           [ $((EPOCHSECONDS - KB_DIRTY_SINCE)) -ge "${KB_FLUSH_INTERVAL}" ]; then
+            flush_knowledge
+        fi
+        return
+    fi
+    
+    if [ "${KB_BACKEND}" = "sqlite" ]; then
+        kb_sql <<< "$(kb_insert_sql "${domain}" "${key}" "${timestamp}" "${AGENT_NAME}" "${entry}")" \
+            || log_agent "ERROR" "Failed to write knowledge ${domain}/${key}"
+        return
+    fi
+    
+    kb_write_file "${domain}" "${key}" "${entry}"
+    [ "${KB_FSYNC}" = "batch" ] && sync "${SHARED_KB_DIR}/${domain}/${key}.json" 2>/dev/null
+}
+
+# Write one entry file via temp file + rename, so readers never see a partial file
+kb_write_file() {
+    local domain=$1
+    local key=$2
+    local entry=$3
+    local kb_dir="${SHARED_KB_DIR}/${domain}"
+    local tmp_file="${kb_dir}/.${key}.json.$$.tmp"
+    
+    mkdir -p "${kb_dir}"
+    echo "${entry}" > "${tmp_file}"
+    [ "${KB_FSYNC}" = "always" ] && sync "${tmp_file}" 2>/dev/null
+    mv -f "${tmp_file}" "${kb_dir}/${key}.json"
+}
+
+# Flush buffered knowledge writes as one group commit: a single SQLite
+# transaction, or one rename per file with at most one fsync call per batch
+flush_knowledge() {
+    [ ${#KB_DIRTY[@]} -eq 0 ] && return 0
+    
+    local slot
+    if [ "${KB_BACKEND}" = "sqlite" ]; then
+        {
+            echo "BEGIN;"
+            for slot in "${!KB_DIRTY[@]}"; do
+                local entry="${KB_DIRTY[${slot}]}"
+                [[ "${entry}" =~ \"timestamp\":\ \"([^\"]*)\" ]]
+                kb_insert_sql "${slot%%/*}" "${slot#*/}" "${BASH_REMATCH[1]}" "${AGENT_NAME}" "${entry}"
+            done
+            echo "COMMIT;"
+        } | kb_sql || log_agent "ERROR" "Failed to flush ${#KB_DIRTY[@]} knowledge write(s)"
+    else
+        local written=()
+        for slot in "${!KB_DIRTY[@]}"; do
+            kb_write_file "${slot%%/*}" "${slot#*/}" "${KB_DIRTY[${slot}]}"
+            written+=("${SHARED_KB_DIR}/${slot}.json")
+        done
+        [ "${KB_FSYNC}" = "batch" ] && sync "${written[@]}" 2>/dev/null
+    fi
+    
+    KB_DIRTY=()
+    KB_DIRTY_SINCE=0
+}
+
+# Dirty entries for a domain whose key matches a glob pattern, one per line
+kb_dirty_entries() {
+    local domain=$1
+    local pattern=$2
+    local slot
+    
+    for slot in "${!KB_DIRTY[@]}"; do
+        [[ "${slot%%/*}" == "${domain}" && "${slot#*/}" == ${pattern} ]] && echo "${KB_DIRTY[${slot}]}"
+    done
+}
+
+# Lay unflushed entries over a stored query result (dirty entries win per key),
+# then apply a jq filter to restore the query's ordering/limits
+kb_overlay_dirty() {
+    local domain=$1
+    local pattern=$2
+    local results=$3
+    local finish=$4
+    local dirty=$(kb_dirty_entries "${domain}" "${pattern}")
+    
+    if [ -z "${dirty}" ]; then
+        echo "${results}"
+        return
+    fi
+    
+    { echo "${results}"; echo "${dirty}"; } | jq -cs "(.[0] + .[1:]) | group_by(.key) | map(.[-1]) | ${finish}"
 }
 
 archive_message() {
     local channel=$1
     local msg_id=$2
+    
+    # Log segments are immutable; consumption is tracked by consumer cursors
+    [ "${DATABUS_BACKEND}" = "log" ] && return
+    
     local msg_file="${DATA_BUS_DIR}/channels/${channel}/${msg_id}.json"
     local archive_dir="${DATA_BUS_DIR}/archive/${channel}"
     
@@ -99,11 +606,170 @@ archive_message() {
     fi
 }
 
+# Claim up to <max> messages for this replica within a consumer group.
+# Messages are handed out by priority, then seq; expired leases are redelivered.
+# Each claimed message must be acked (or nacked) by the consumer.
+# Usage: claim_messages <channel> <group> [max]
+claim_messages() {
+    local channel=$1
+    local group=$2
+    local max=${3:-1}
+    local group_dir="${DATA_BUS_DIR}/groups/${channel}/${group}"
+    
+    mkdir -p "${group_dir}/leases" "${group_dir}/dead"
+    
+    (
+        flock -x 9
+        local claimed=() lease_file consumer expiry deliveries message msg_id
+        
+        # New messages are read once past the group's cursor and parked as
+        # unassigned leases (expiry 0, no deliveries yet). Lease files are
+        # named <priority rank>_<seq>_<msg_id>, zero-padded so they list in
+        # delivery order.
+        local group_cursor=$(channel_cursor "${channel}" "group.${group}") seqs="" rank
+        while read -r message; do
+            [[ "${message}" =~ ^\{\"id\":\"([^\"]+)\",\"seq\":([0-9]+)(,\"priority\":\"([a-z]+)\")? ]] || continue
+            msg_id="${BASH_REMATCH[1]}"
+            seqs="${seqs} ${BASH_REMATCH[2]}"
+            case "${BASH_REMATCH[4]}" in
+                high) rank=0 ;;
+                low) rank=2 ;;
+                *) rank=1 ;;
+            esac
+            printf '%s 0 0\n%s\n' "-" "${message}" \
+                > "${group_dir}/leases/${rank}_$(printf '%012d' "${BASH_REMATCH[2]}")_${msg_id}"
+        done < <(read_messages_since "${channel}" "${group_cursor}" "" "group.${group}" | jq -c '.[]')
+        commit_cursor "${channel}" "${seqs}" "group.${group}"
+        
+        # Unassigned messages, and redeliveries of ones whose consumer never acked in time
+        for lease_file in "${group_dir}/leases"/*; do
+            [ -f "${lease_file}" ] || continue
+            [ ${#claimed[@]} -lt "${max}" ] || break
+            { read -r consumer expiry deliveries; read -r message; } < "${lease_file}"
+            [ "${expiry}" -lt "${EPOCHSECONDS}" ] || continue
+            
+            msg_id=$(basename "${lease_file}")
+            msg_id="${msg_id#*_*_}"
+            if [ "${deliveries}" -ge "${DATABUS_MAX_DELIVERIES}" ]; then
+                mv "${lease_file}" "${group_dir}/dead/"
+                log_agent "WARN" "Message ${msg_id} on ${channel} dead-lettered after ${deliveries} deliveries"
+                continue
+            fi
+            [ "${deliveries}" -gt 0 ] && \
+                log_agent "WARN" "Redelivering ${msg_id} on ${channel} (lease of ${consumer} expired)"
+            lease_message "${lease_file}" $((deliveries + 1)) "${message}"
+            claimed+=("${message}")
+        done
+        
+        if [ ${#claimed[@]} -eq 0 ]; then
+            echo "[]"
+        else
+            printf '%s\n' "${claimed[@]}" | jq -cs '.'
+        fi
+    ) 9> "${group_dir}/.lock"
+}
+
+# Write a lease: "<consumer> <expiry_epoch> <deliveries>" then the message on one line
+lease_message() {
+    local lease_file=$1
+    local deliveries=$2
+    local message=$3
+    printf '%s %s %s\n%s\n' "${CONSUMER_ID}" $((EPOCHSECONDS + DATABUS_LEASE_SECONDS)) "${deliveries}" "${message}" \
+        > "${lease_file}"
+}
+
+# Acknowledge a claimed message: it will never be redelivered to the group
+# Usage: ack_message <channel> <group> <msg_id>
+ack_message() {
+    local channel=$1
+    local group=$2
+    local msg_id=$3
+    local group_dir="${DATA_BUS_DIR}/groups/${channel}/${group}"
+    
+    (
+        flock -x 9
+        archive_message "${channel}" "${msg_id}"
+        rm -f "${group_dir}/leases/"*"_${msg_id}"
+    ) 9> "${group_dir}/.lock"
+}
+
+# Give a claimed message back for immediate redelivery to another replica
+# Usage: nack_message <channel> <group> <msg_id>
+nack_message() {
+    local channel=$1
+    local group=$2
+    local msg_id=$3
+    local group_dir="${DATA_BUS_DIR}/groups/${channel}/${group}"
+    
+    (
+        flock -x 9
+        local consumer expiry deliveries message lease_file
+        lease_file=$(ls "${group_dir}/leases/"*"_${msg_id}" 2>/dev/null) || exit 0
+        { read -r consumer expiry deliveries; read -r message; } < "${lease_file}"
+        printf '%s 0 %s\n%s\n' "${consumer}" "${deliveries}" "${message}" > "${lease_file}"
+    ) 9> "${group_dir}/.lock"
+}
+
+# All entries matching <pattern>, by key, as a JSON array. With --jsonl, one
+# entry per line streamed straight from storage, so nothing holds the whole
+# result; unflushed writes then come last.
+# Usage: query_knowledge <domain> [pattern] [--jsonl]
 query_knowledge() {
     local domain=$1
     local pattern=${2:-"*"}
+    
+    if [ "$3" = "--jsonl" ]; then
+        kb_query_lines "${domain}" "${pattern}"
+        return
+    fi
+    kb_overlay_dirty "${domain}" "${pattern}" "$(kb_query_all "${domain}" "${pattern}")" "sort_by(.key)"
+}
+
+# Most recent <count> entries (by write timestamp), oldest first
+# Usage: query_knowledge_latest <domain> <pattern> <count> [user_id]
+query_knowledge_latest() {
+    local domain=$1
+    local pattern=${2:-"*"}
+    local count=$3
+    local user_id=$4
+    
+    # Dirty entries can shadow stored ones, so fetch enough to still have <count> after the overlay
+    local results=$(kb_query_latest "${domain}" "${pattern}" $((count + ${#KB_DIRTY[@]})) "${user_id}")
+    kb_overlay_dirty "${domain}" "${pattern}" "${results}" \
+        "map(select(\"${user_id}\" == \"\" or .data.user_id == \"${user_id}\")) | sort_by(.timestamp) | .[-${count}:]"
+}
+
+# Entries written within [since, until], oldest first. Timestamps are ISO 8601.
+# Usage: query_knowledge_range <domain> <pattern> <since> [until] [user_id]
+query_knowledge_range() {
+    local domain=$1
+    local pattern=${2:-"*"}
+    local since=$3
+    local until=${4:-"9999-12-31T23:59:59Z"}
+    local user_id=$5
+    
+    local results=$(kb_query_range "${domain}" "${pattern}" "${since}" "${until}" "${user_id}")
+    kb_overlay_dirty "${domain}" "${pattern}" "${results}" \
+        "map(select(.timestamp >= \"${since}\" and .timestamp <= \"${until}\")
+             | select(\"${user_id}\" == \"\" or .data.user_id == \"${user_id}\")) | sort_by(.timestamp)"
+}
+
+kb_query_all() {
+    local domain=$1
+    local pattern=$2
     local kb_dir="${SHARED_KB_DIR}/${domain}"
     
+    if [ "${KB_BACKEND}" = "sqlite" ]; then
+        kb_sql <<EOSQL
+SELECT json_group_array(json(entry)) FROM (
+    SELECT entry FROM knowledge
+    WHERE domain = $(sql_quote "${domain}") AND key GLOB $(sql_quote "${pattern}")
+    ORDER BY key
+);
+EOSQL
+        return
+    fi
+    
     [ ! -d "${kb_dir}" ] && echo "[]" && return
     
     local results="["
@@ -119,6 +785,160 @@ query_knowledge() {
     echo "${results}]"
 }
 
+kb_query_lines() {
+    local domain=$1
+    local pattern=$2
+    local dirty=$(kb_dirty_entries "${domain}" "${pattern}")
+    local shadowed=$(echo "${dirty}" | jq -sc 'map(.key)')
+    
+    {
+        if [ "${KB_BACKEND}" = "sqlite" ]; then
+            kb_sql <<EOSQL
+SELECT json(entry) FROM knowledge
+WHERE domain = $(sql_quote "${domain}") AND key GLOB $(sql_quote "${pattern}")
+ORDER BY key;
+EOSQL
+        else
+            kb_file_entries "${domain}" "${pattern}"
+        fi
+    } | jq -c --argjson shadowed "${shadowed}" 'select(.key as $key | $shadowed | index($key) == null)'
+    
+    [ -n "${dirty}" ] && echo "${dirty}" | jq -c '.'
+    return 0
+}
+
+kb_query_latest() {
+    local domain=$1
+    local pattern=$2
+    local count=$3
+    local user_id=$4
+    
+    if [ "${KB_BACKEND}" = "sqlite" ]; then
+        local user_filter=""
+        [ -n "${user_id}" ] && user_filter="AND user_id = $(sql_quote "${user_id}")"
+        kb_sql <<EOSQL
+SELECT json_group_array(json(entry)) FROM (
+    SELECT entry FROM (
+        SELECT entry, timestamp, rowid AS seq FROM knowledge
+        WHERE domain = $(sql_quote "${domain}") AND key GLOB $(sql_quote "${pattern}") ${user_filter}
+        ORDER BY timestamp DESC, seq DESC
+        LIMIT ${count}
+    ) ORDER BY timestamp, seq
+);
+EOSQL
+        return
+    fi
+    
+    kb_file_entries "${domain}" "${pattern}" | jq -s --argjson n "${count}" --arg user "${user_id}" \
+        '[.[] | select($user == "" or .data.user_id == $user)] | sort_by(.timestamp) | .[-$n:]'
+}
+
+kb_query_range() {
+    local domain=$1
+    local pattern=$2
+    local since=$3
+    local until=$4
+    local user_id=$5
+    
+    if [ "${KB_BACKEND}" = "sqlite" ]; then
+        local user_filter=""
+        [ -n "${user_id}" ] && user_filter="AND user_id = $(sql_quote "${user_id}")"
+        kb_sql <<EOSQL
+SELECT json_group_array(json(entry)) FROM (
+    SELECT entry FROM knowledge
+    WHERE domain = $(sql_quote "${domain}") AND key GLOB $(sql_quote "${pattern}")
+      AND timestamp BETWEEN $(sql_quote "${since}") AND $(sql_quote "${until}") ${user_filter}
+    ORDER BY timestamp, rowid
+);
+EOSQL
+        return
+    fi
+    
+    kb_file_entries "${domain}" "${pattern}" | jq -s --arg since "${since}" --arg until "${until}" --arg user "${user_id}" \
+        '[.[] | select(.timestamp >= $since and .timestamp <= $until)
+              | select($user == "" or .data.user_id == $user)] | sort_by(.timestamp)'
+}
+
+# Stream the raw entries of a file-backed domain (one jq -s can then consume them)
+kb_file_entries() {
+    local domain=$1
+    local pattern=$2
+    local kb_file
+    
+    for kb_file in "${SHARED_KB_DIR}/${domain}"/${pattern}.json; do
+        [ -f "${kb_file}" ] && cat "${kb_file}"
+    done
+}
+
+# SQLite knowledge base helpers
+
+sql_quote() {
+    local value=${1//\'/\'\'}
+    printf "'%s'" "${value}"
+}
+
+# Run SQL from stdin against the knowledge base
+kb_sql() {
+    # WAL + NORMAL never corrupts the database; FULL also syncs every commit
+    local synchronous="NORMAL"
+    [ "${KB_FSYNC}" = "always" ] && synchronous="FULL"
+    sqlite3 -batch -noheader -cmd ".timeout 5000" -cmd "PRAGMA synchronous = ${synchronous};" "${KB_DB}"
+}
+
+kb_insert_sql() {
+    local domain=$1
+    local key=$2
+    local timestamp=$3
+    local updated_by=$4
+    local entry=$5
+    
+    cat <<EOSQL
+WITH e(v) AS (SELECT $(sql_quote "${entry}"))
+INSERT OR REPLACE INTO knowledge (domain, key, timestamp, updated_by, user_id, entry)
+SELECT $(sql_quote "${domain}"), $(sql_quote "${key}"), $(sql_quote "${timestamp}"), $(sql_quote "${updated_by}"),
+       json_extract(v, '\$.data.user_id'), json(v)
+FROM e;
+EOSQL
+}
+
+kb_sqlite_init() {
+    mkdir -p "$(dirname "${KB_DB}")"
+    kb_sql > /dev/null <<EOSQL
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS knowledge (
+    domain     TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    timestamp  TEXT NOT NULL,
+    updated_by TEXT,
+    user_id    TEXT,
+    entry      TEXT NOT NULL,
+    PRIMARY KEY (domain, key)
+);
+CREATE INDEX IF NOT EXISTS idx_knowledge_domain_timestamp ON knowledge (domain, timestamp);
+CREATE INDEX IF NOT EXISTS idx_knowledge_user_timestamp ON knowledge (user_id, domain, timestamp);
+EOSQL
+}
+
+# Load every file-backed entry into the SQLite knowledge base in one transaction
+# Usage: migrate_knowledge_to_sqlite
+migrate_knowledge_to_sqlite() {
+    kb_sqlite_init
+    
+    local kb_file count=0
+    {
+        echo "BEGIN;"
+        for kb_file in "${SHARED_KB_DIR}"/*/*.json; do
+            [ -f "${kb_file}" ] || continue
+            local domain=$(basename "$(dirname "${kb_file}")")
+            local key=$(basename "${kb_file}" .json)
+            local entry=$(< "${kb_file}")
+            local timestamp=$(jq -r '.timestamp // empty' <<< "${entry}" 2>/dev/null)
+            kb_insert_sql "${domain}" "${key}" "${timestamp:-$(date -u +"%Y-%m-%dT%H:%M:%SZ")}" "migration" "${entry}"
+        done
+        echo "COMMIT;"
+    } | kb_sql
+}
+
 log_agent() {
     local level=$1
     local message=$2
@@ -128,14 +948,47 @@ log_agent() {
 }
 
 should_run() {
-    local pid_file="${PID_DIR}/${AGENT_NAME}.pid"
+    local pid_file="${PID_DIR}/${CONSUMER_ID}.pid"
     [ -f "${pid_file}" ] && [ "$$" -eq "$(cat ${pid_file})" ]
 }
 
 sleep_interval() {
-    sleep "${POLL_INTERVAL:-2}"
+    # End of a loop iteration is the natural group-commit point
+    flush_knowledge
+    
+    if [ -n "${WAKEUP_FD}" ]; then
+        wait_for_messages
+    else
+        sleep "${POLL_INTERVAL:-2}"
+    fi
+}
+
+# Block until a watched channel is notified or POLL_INTERVAL elapses
+wait_for_messages() {
+    local poke
+    if read -r -t "${POLL_INTERVAL:-2}" -N 1 -u "${WAKEUP_FD}" poke; then
+        # Coalesce a burst of publishes into a single wakeup
+        read -r -t 0.01 -N 4096 -u "${WAKEUP_FD}" poke || true
+    fi
 }
 
+# Run a python/ helper, through the persistent helper server when it is up
+# Usage: run_python_helper <helper_name> [args...]  (stdin is forwarded)
+run_python_helper() {
+    local helper=$1
+    shift
+    local socket="${HELPER_SOCKET:-${PID_DIR}/helper_server.sock}"
+
+    if [ -S "${socket}" ]; then
+        HELPER_SOCKET="${socket}" python3 -S "${PROJECT_ROOT}/python/helper_client.py" "${helper}" "$@"
+    else
+        python3 "${PROJECT_ROOT}/python/${helper}.py" "$@"
+    fi
+}
+
+[ "${KB_BACKEND}" = "sqlite" ] && kb_sqlite_init
+[ "${KB_WRITE_BEHIND}" = "true" ] && trap 'flush_knowledge' EXIT
+
 # Gemini CLI integration helper
 call_gemini() {
     local prompt=$1
@@ -9,14 +9,12 @@ export PROJECT_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 # Source the data bus library
 source "${PROJECT_ROOT}/lib/databus.sh"
 
-# Agent state
-LAST_SEEN_TIMESTAMP="0"
-
 log_agent "INFO" "OrchestratorAgent starting..."
 
 # Initialize agent
 initialize() {
     log_agent "INFO" "Initializing OrchestratorAgent"
+    watch_channels "user_requests" "data_alerts"
     
     # Read system configuration
     local config=$(cat "${CONFIG_DIR}/system_config.json")
@@ -30,17 +28,16 @@ initialize() {
 
 # Process user requests
 process_user_requests() {
-    local messages=$(subscribe_channel "user_requests" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "user_requests")
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Processing ${msg_count} user request(s)"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_id=$(echo "${message}" | jq -r '.id')
             local msg_type=$(echo "${message}" | jq -r '.type')
             local intent=$(echo "${message}" | jq -r '.data.intent // empty')
-            local msg_timestamp=$(echo "${message}" | jq -r '.timestamp')
             
             log_agent "INFO" "Processing message ${msg_id} with intent: ${intent}"
             
@@ -70,10 +67,9 @@ process_user_requests() {
                     ;;
             esac
             
-            # Update last seen timestamp
-            LAST_SEEN_TIMESTAMP="${msg_timestamp}"
             archive_message "user_requests" "${msg_id}"
-        done
+            commit_cursor "user_requests" "$(echo "${message}" | jq -r '.seq')"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
@@ -141,20 +137,20 @@ generate_daily_briefing() {
     log_agent "INFO" "Generating daily briefing: ${msg_id}"
     
     # This would typically call Python script for complex synthesis
-    "${PROJECT_ROOT}/python/generate_briefing.py" "${msg_id}" &
+    run_python_helper generate_briefing "${msg_id}" &
     
     log_agent "INFO" "Daily briefing generation initiated"
 }
 
 # Process data alerts
 process_data_alerts() {
-    local messages=$(subscribe_channel "data_alerts" "${LAST_SEEN_TIMESTAMP}")
+    local messages=$(subscribe_channel "data_alerts")
     local msg_count=$(echo "${messages}" | jq '. | length')
     
     if [ "${msg_count}" -gt 0 ]; then
         log_agent "INFO" "Processing ${msg_count} data alert(s)"
         
-        echo "${messages}" | jq -c '.[]' | while read -r message; do
+        while read -r message; do
             local msg_id=$(echo "${message}" | jq -r '.id')
             local alert_type=$(echo "${message}" | jq -r '.data.alert_type // empty')
             local severity=$(echo "${message}" | jq -r '.data.severity // "medium"')
@@ -173,7 +169,7 @@ process_data_alerts() {
                     publish_message "delegation_commands" "injury_alert" "{
                         \"alert\": ${message},
                         \"action_required\": true
-                    }"
+                    }" "high"
                     ;;
                 nutritional_gap)
                     publish_message "delegation_commands" "nutrition_alert" "{
@@ -184,7 +180,8 @@ process_data_alerts() {
             esac
             
             archive_message "data_alerts" "${msg_id}"
-        done
+            commit_cursor "data_alerts" "$(echo "${message}" | jq -r '.seq')"
+        done < <(echo "${messages}" | jq -c '.[]')
     fi
 }
 
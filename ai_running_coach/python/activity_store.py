@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Activity Store
+Columnar, typed-array storage for an athlete's activity history, so the
+analysis helpers load it once and compute with vectorized numpy instead of
+walking lists of dicts.
+
+Columns (one .npy file each, memory-mapped on load):
+  activity_id  int64    activityId / id (other ids are hashed to 63 bits)
+  date         int64    days since 1970-01-01
+  distance     float64  km
+  pace         float64  min/km
+  heart_rate   float64  bpm
+  duration     float64  minutes
+  elevation    float64  m gained
+
+Missing numeric values are stored as 0, the same default the helpers always
+used with d.get(field, 0).
+
+On disk a store is a directory holding numbered generations and a CURRENT
+file naming the live one and its committed row count ("<generation> <rows>").
+Readers only look at the committed rows. An append writes the new rows after
+them in the current generation's column files, in place, then renames a new
+CURRENT over the old one, so it costs O(new rows) and readers never see a
+half-written store. A rebuild (or an append a column's .npy header has no
+room to record) writes a whole new generation and switches CURRENT to it.
+
+Usage: activity_store.py append <store_dir>    (activity, or entries as a JSON array or JSON Lines, on stdin)
+       activity_store.py rebuild <store_dir>   (entries as a JSON array or JSON Lines on stdin)
+       activity_store.py info <store_dir>
+"""
+
+import os
+import sys
+import json
+import fcntl
+import shutil
+import struct
+import hashlib
+import uuid
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+
+import numpy as np
+
+from json_stream import iter_json
+
+NUMERIC_COLUMNS = ('distance', 'pace', 'heart_rate', 'duration', 'elevation')
+COLUMNS = ('activity_id', 'date') + NUMERIC_COLUMNS
+
+# Field names looked up in each activity, in order of preference
+FIELDS = {
+    'distance': ('distance',),
+    'pace': ('pace',),
+    'heart_rate': ('heart_rate',),
+    'duration': ('duration', 'duration_minutes'),
+    'elevation': ('elevation_gain', 'elevation', 'elevationGain'),
+}
+DATE_FIELDS = ('date', 'start_time', 'startTimeLocal')
+ID_FIELDS = ('activityId', 'activity_id', 'id')
+
+EPOCH = date(1970, 1, 1)
+
+# Owner of entries that carry no user_id
+DEFAULT_USER = 'default_user'
+
+# Activities parsed per batch when building a store from a stream
+CHUNK_ROWS = 10000
+
+def _number(value):
+    try:
+        return float(value) if value is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+def _day(value):
+    """Days since the epoch for an ISO date/datetime string, or -1 if unknown"""
+    if not value:
+        return -1
+    try:
+        return (datetime.fromisoformat(str(value)[:19].replace('Z', '')).date() - EPOCH).days
+    except ValueError:
+        try:
+            return (date.fromisoformat(str(value)[:10]) - EPOCH).days
+        except ValueError:
+            return -1
+
+def _activity_id(value):
+    """Garmin ids are integers; anything else gets a stable 63-bit hash"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') >> 1
+
+def _column(values):
+    """float64 column from raw values, falling back per value on bad input"""
+    try:
+        column = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_number(v) for v in values], dtype=np.float64)
+    # None converts to NaN rather than failing
+    column[np.isnan(column)] = 0.0
+    return column
+
+def _days(values):
+    """Days since the epoch for ISO date strings, -1 where unknown"""
+    try:
+        days = np.array([str(v)[:10] if v else '' for v in values], dtype='datetime64[D]')
+        return np.where(np.isnat(days), -1, days.astype(np.int64))
+    except ValueError:
+        return np.array([_day(v) for v in values], dtype=np.int64)
+
+def _first(data, names, default=None):
+    for name in names:
+        if name in data:
+            return data[name]
+    return default
+
+def user_id(entry):
+    """The athlete an activity, profile or knowledge base entry belongs to"""
+    if not isinstance(entry, dict):
+        return DEFAULT_USER
+    data = entry.get('data', entry)
+    user = data.get('user_id') if isinstance(data, dict) else None
+    return str(user or entry.get('user_id') or DEFAULT_USER)
+
+class ActivityStore:
+    """A set of equal-length typed column arrays, one row per activity"""
+
+    def __init__(self, columns=None):
+        columns = columns or {}
+        self.columns = {
+            'activity_id': np.asarray(columns.get('activity_id', []), dtype=np.int64),
+            'date': np.asarray(columns.get('date', []), dtype=np.int64),
+        }
+        for name in NUMERIC_COLUMNS:
+            self.columns[name] = np.asarray(columns.get(name, []), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __getattr__(self, name):
+        if name in COLUMNS:
+            return self.columns[name]
+        raise AttributeError(name)
+
+    @classmethod
+    def from_records(cls, activities):
+        """Build columns in one pass over activities or knowledge base entries
+        ({"key", "timestamp", "data": {...}}), keeping their order"""
+        datas, fallback_ids, timestamps = [], [], []
+        for i, activity in enumerate(activities):
+            data = activity.get('data', activity) if isinstance(activity, dict) else {}
+            datas.append(data if isinstance(data, dict) else {})
+            fallback_ids.append(activity.get('key', i) if isinstance(activity, dict) else i)
+            timestamps.append(activity.get('timestamp') if isinstance(activity, dict) else None)
+
+        columns = {
+            'activity_id': [_activity_id(_first(d, ID_FIELDS, key)) for d, key in zip(datas, fallback_ids)],
+            'date': _days([_first(d, DATE_FIELDS, ts) for d, ts in zip(datas, timestamps)]),
+        }
+        for name, fields in FIELDS.items():
+            if len(fields) == 1:
+                columns[name] = _column([d.get(fields[0], 0) for d in datas])
+            else:
+                columns[name] = _column([_first(d, fields, 0) for d in datas])
+        return cls(columns)
+
+    @classmethod
+    def from_stream(cls, activities, chunk_rows=CHUNK_ROWS):
+        """from_records over any iterable (e.g. json_stream.iter_json), holding
+        at most <chunk_rows> parsed activities at a time"""
+        chunks, batch = [], []
+        for activity in activities:
+            batch.append(activity)
+            if len(batch) == chunk_rows:
+                chunks.append(cls.from_records(batch))
+                batch = []
+        chunks.append(cls.from_records(batch))
+        if len(chunks) == 1:
+            return chunks[0]
+        return cls({name: np.concatenate([chunk.columns[name] for chunk in chunks]) for name in COLUMNS})
+
+    def take(self, index):
+        """A new store with the rows selected by an index array or slice"""
+        return ActivityStore({name: column[index] for name, column in self.columns.items()})
+
+    def tail(self, count):
+        return self.take(slice(max(0, len(self) - count), None))
+
+    def concat(self, other):
+        return ActivityStore({name: np.concatenate([self.columns[name], other.columns[name]])
+                              for name in COLUMNS})
+
+    # -- persistence ---------------------------------------------------------
+
+    @staticmethod
+    def current(path):
+        """(generation, committed rows) from CURRENT, or (None, None); rows is
+        None for stores written before CURRENT recorded them"""
+        try:
+            fields = (Path(path) / 'CURRENT').read_text().split()
+            return int(fields[0]), int(fields[1]) if len(fields) > 1 else None
+        except (OSError, ValueError, IndexError):
+            return None, None
+
+    @classmethod
+    def current_generation(cls, path):
+        return cls.current(path)[0]
+
+    @staticmethod
+    def origin(path):
+        """Token that changes whenever the store is rebuilt rather than appended
+        to, so derived state (e.g. trend stats) knows to start over"""
+        try:
+            return (Path(path) / 'ORIGIN').read_text().strip()
+        except OSError:
+            return None
+
+    @classmethod
+    def load(cls, path, mmap=True, generation=None, rows=None):
+        """Open a saved store: the current generation and its committed rows
+        unless a generation (and row count) is given; columns are
+        memory-mapped read-only by default"""
+        current, committed = cls.current(path)
+        if generation is None:
+            generation, rows = current, committed
+        elif rows is None and generation == current:
+            rows = committed
+        if generation is None:
+            return cls()
+        gen_dir = Path(path) / f"{generation:08d}"
+        mode = 'r' if mmap else None
+        store = cls.__new__(cls)
+        store.columns = {name: np.load(gen_dir / f"{name}.npy", mmap_mode=mode)[:rows] for name in COLUMNS}
+        return store
+
+    def save(self, path):
+        """Write a new generation and make it current. Callers hold the store lock."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        generation = (self.current_generation(path) or 0) + 1
+        gen_dir = path / f"{generation:08d}"
+        if gen_dir.exists():
+            shutil.rmtree(gen_dir)
+        gen_dir.mkdir()
+        for name in COLUMNS:
+            np.save(gen_dir / f"{name}.npy", self.columns[name])
+        _commit(path, generation, len(self))
+
+        # Keep the previous generation for readers that opened it just before the switch
+        for old in path.glob('[0-9]' * 8):
+            if int(old.name) < generation - 1:
+                shutil.rmtree(old, ignore_errors=True)
+        return generation
+
+def _commit(path, generation, rows):
+    """Make <rows> rows of <generation> what readers see"""
+    tmp = Path(path) / '.CURRENT.tmp'
+    tmp.write_text(f"{generation} {rows}\n")
+    os.replace(tmp, Path(path) / 'CURRENT')
+
+def _grown_header(column_file, rows):
+    """(data offset, dtype, header bytes) to rewrite a 1-d .npy column as
+    <rows> long in place, or None if its header has no room for the shape"""
+    with open(column_file, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+            else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+    if len(shape) != 1 or fortran_order:
+        return None
+    length_format = '<H' if version == (1, 0) else '<I'
+    prefix = len(np.lib.format.magic(*version)) + struct.calcsize(length_format)
+    text = f"{{'descr': {np.lib.format.dtype_to_descr(dtype)!r}, 'fortran_order': False, 'shape': ({rows},), }}"
+    if len(text) + 1 > offset - prefix:
+        return None
+    # np.save pads the header with spaces to align the data; keep the same length
+    header = text.ljust(offset - prefix - 1) + '\n'
+    return offset, dtype, np.lib.format.magic(*version) + struct.pack(length_format, len(header)) + header.encode()
+
+def _append_in_place(path, generation, rows, new):
+    """Write <new> after the first <rows> rows of each column of <generation>
+    (dropping anything an interrupted append left past them) and commit.
+    False, with nothing committed, if a column header can't grow in place."""
+    gen_dir = Path(path) / f"{generation:08d}"
+    headers = {}
+    for name in COLUMNS:
+        headers[name] = _grown_header(gen_dir / f"{name}.npy", rows + len(new))
+        if headers[name] is None:
+            return False
+    # Rows before headers, headers before CURRENT: a reader that sees a
+    # longer header or row count always finds the rows behind it
+    for name, (offset, dtype, header) in headers.items():
+        with open(gen_dir / f"{name}.npy", 'r+b') as f:
+            f.seek(offset + rows * dtype.itemsize)
+            f.write(np.ascontiguousarray(new.columns[name], dtype=dtype).tobytes())
+            f.truncate()
+    for name, (offset, dtype, header) in headers.items():
+        with open(gen_dir / f"{name}.npy", 'r+b') as f:
+            f.write(header)
+    _commit(path, generation, rows + len(new))
+    return True
+
+@contextmanager
+def store_lock(path):
+    """Exclusive lock on a store directory for read-modify-write"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield path
+
+def append(path, activities):
+    """Append activities not already in the store (matched by activity_id),
+    in place in the current generation"""
+    with store_lock(path):
+        store = ActivityStore.load(path)
+        new = as_store(activities)
+        fresh = ~np.isin(new.activity_id, store.activity_id)
+        # Drop duplicates within the batch too, keeping the first
+        _, first = np.unique(new.activity_id, return_index=True)
+        keep = np.zeros(len(new), dtype=bool)
+        keep[first] = True
+        new = new.take(fresh & keep)
+        if len(new):
+            generation, _ = ActivityStore.current(path)
+            if generation is None or not _append_in_place(path, generation, len(store), new):
+                store.concat(new).save(path)
+        return len(new)
+
+def rebuild(path, activities):
+    with store_lock(path):
+        store = as_store(activities)
+        store.save(path)
+        origin = Path(path) / '.ORIGIN.tmp'
+        origin.write_text(f"{uuid.uuid4().hex}\n")
+        os.replace(origin, Path(path) / 'ORIGIN')
+        return len(store)
+
+def read_state(path, name):
+    """Derived state persisted next to a store (e.g. trend_stats.json), or None"""
+    try:
+        with open(Path(path) / name) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_state(path, name, state):
+    if not Path(path).is_dir():
+        return  # nothing saved there yet
+    tmp = Path(path) / f".{name}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, Path(path) / name)
+
+def as_store(activities):
+    """Accept an ActivityStore, a list of activities/entries or any iterable of them"""
+    if isinstance(activities, ActivityStore):
+        return activities
+    if activities is None or isinstance(activities, list):
+        return ActivityStore.from_records(activities or [])
+    return ActivityStore.from_stream(activities)
+
+if __name__ == "__main__":
+    try:
+        if len(sys.argv) < 3 or sys.argv[1] not in ('append', 'rebuild', 'info'):
+            print("Usage: activity_store.py {append|rebuild|info} <store_dir>", file=sys.stderr)
+            sys.exit(2)
+        command, path = sys.argv[1], sys.argv[2]
+
+        if command == 'info':
+            store = ActivityStore.load(path)
+            result = {'activities': len(store), 'generation': ActivityStore.current_generation(path)}
+            if len(store):
+                known = store.date[store.date >= 0]
+                if len(known):
+                    result['first_date'] = str(EPOCH + timedelta(days=int(known.min())))
+                    result['last_date'] = str(EPOCH + timedelta(days=int(known.max())))
+        else:
+            activities = iter_json(sys.stdin)
+            if command == 'append':
+                result = {'appended': append(path, activities)}
+            else:
+                result = {'activities': rebuild(path, activities)}
+            result['generation'] = ActivityStore.current_generation(path)
+
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
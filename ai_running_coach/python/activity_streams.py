@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Activity Streams
+Per-second records of a single activity, read from a FIT, TCX or GPX file,
+kept as compact typed arrays: one directory per activity holding one .npy
+file per column, memory-mapped on load. Each save writes a new numbered
+version directory and then renames a CURRENT file naming it over the old
+one; streams saved before versions keep their files at the top level.
+
+Columns:
+  time_ms     int32    milliseconds since the first record
+  heart_rate  uint8    bpm, 0 where not recorded
+  cadence     uint8    strides (cycles) per minute, 0 where not recorded
+  latitude    float32  degrees, NaN where not recorded
+  longitude   float32  degrees, NaN where not recorded
+  altitude    float32  m, NaN where not recorded
+  distance    float32  m from the start
+  speed       float32  m/s
+
+meta.json holds the start time, the source format and the record count.
+Files without distance or speed (GPX) get them derived from positions and
+time.
+
+Usage: activity_streams.py ingest <file> <streams_dir> [activity_id]
+       activity_streams.py info <streams_dir>/<activity_id>
+"""
+
+import os
+import sys
+import json
+import shutil
+import struct
+import warnings
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from datetime import datetime, timezone
+
+import numpy as np
+
+COLUMNS = {
+    'time_ms': np.int32,
+    'heart_rate': np.uint8,
+    'cadence': np.uint8,
+    'latitude': np.float32,
+    'longitude': np.float32,
+    'altitude': np.float32,
+    'distance': np.float32,
+    'speed': np.float32,
+}
+# Parsed from files before conversion; time is epoch seconds
+RAW_COLUMNS = ('timestamp', 'heart_rate', 'cadence', 'latitude', 'longitude', 'altitude', 'distance', 'speed')
+
+EARTH_RADIUS_M = 6371008.8
+
+# -- FIT ---------------------------------------------------------------------
+
+FIT_EPOCH = 631065600  # 1989-12-31T00:00:00Z
+FIT_RECORD = 20
+SEMICIRCLES = 2 ** 31 / 180
+
+# Record message fields: field number -> (column, scale, offset)
+FIT_RECORD_FIELDS = {
+    253: ('timestamp', 1, 0),
+    0: ('latitude', SEMICIRCLES, 0),
+    1: ('longitude', SEMICIRCLES, 0),
+    2: ('altitude', 5, 500),
+    78: ('altitude', 5, 500),       # enhanced_altitude, preferred
+    3: ('heart_rate', 1, 0),
+    4: ('cadence', 1, 0),
+    5: ('distance', 100, 0),
+    6: ('speed', 1000, 0),
+    73: ('speed', 1000, 0),         # enhanced_speed, preferred
+}
+# Superseded field -> its enhanced (wider) version
+FIT_ENHANCED = {2: 78, 6: 73}
+
+# Base type -> (struct code, invalid value)
+FIT_BASE_TYPES = {
+    0x00: ('B', 0xFF), 0x01: ('b', 0x7F), 0x02: ('B', 0xFF), 0x0A: ('B', 0),
+    0x83: ('h', 0x7FFF), 0x84: ('H', 0xFFFF), 0x8B: ('H', 0),
+    0x85: ('i', 0x7FFFFFFF), 0x86: ('I', 0xFFFFFFFF), 0x8C: ('I', 0),
+    0x88: ('f', None), 0x89: ('d', None),
+    0x8E: ('q', 0x7FFFFFFFFFFFFFFF), 0x8F: ('Q', 0xFFFFFFFFFFFFFFFF), 0x90: ('Q', 0),
+}
+
+class _FitDefinition:
+    """Layout of one local message type: total size, and for record
+    messages a struct picking out the fields we keep"""
+
+    def __init__(self, global_num, endian, fields, developer_size):
+        self.global_num = global_num
+        self.size = sum(size for _, size, _ in fields) + developer_size
+        self.struct = None
+        self.fields = []   # (field number, invalid value) per unpacked value
+        if global_num != FIT_RECORD:
+            return
+        fmt = endian
+        for number, size, base_type in fields:
+            code, invalid = FIT_BASE_TYPES.get(base_type, (None, None))
+            if number in FIT_RECORD_FIELDS and code and struct.calcsize(code) == size:
+                fmt += code
+                self.fields.append((number, invalid))
+            else:
+                fmt += f"{size}x"
+        self.struct = struct.Struct(fmt)
+        numbers = [number for number, _ in self.fields]
+        self.timestamp_index = numbers.index(253) if 253 in numbers else None
+
+def parse_fit(path):
+    """Record messages of a FIT file as raw columns"""
+    data = Path(path).read_bytes()
+    groups = {}     # definition -> (record indexes, value tuples)
+    timestamps = []
+    start = 0
+
+    # A file may hold several FIT files back to back
+    while start + 12 <= len(data):
+        header_size = data[start]
+        data_size = struct.unpack_from('<I', data, start + 4)[0]
+        if data[start + 8:start + 12] != b'.FIT':
+            raise ValueError("Not a FIT file")
+        pos, end = start + header_size, start + header_size + data_size
+        definitions = {}
+        last_timestamp = None
+
+        while pos < end:
+            header = data[pos]
+            pos += 1
+            if header & 0x80:
+                # Compressed timestamp header: 5-bit offset from the last timestamp
+                local = (header >> 5) & 0x3
+                offset = header & 0x1F
+                timestamp = None
+                if last_timestamp is not None:
+                    timestamp = (last_timestamp & ~0x1F) + offset
+                    if offset < (last_timestamp & 0x1F):
+                        timestamp += 0x20
+                    last_timestamp = timestamp
+            elif header & 0x40:
+                local = header & 0x0F
+                endian = '>' if data[pos + 1] else '<'
+                global_num = struct.unpack_from(endian + 'H', data, pos + 2)[0]
+                count = data[pos + 4]
+                pos += 5
+                fields = [tuple(data[pos + 3 * i:pos + 3 * i + 3]) for i in range(count)]
+                pos += 3 * count
+                developer_size = 0
+                if header & 0x20:
+                    developer_count = data[pos]
+                    developer_size = sum(data[pos + 3 * i + 2] for i in range(developer_count))
+                    pos += 1 + 3 * developer_count
+                definitions[local] = _FitDefinition(global_num, endian, fields, developer_size)
+                continue
+            else:
+                local = header & 0x0F
+                timestamp = None
+
+            definition = definitions.get(local)
+            if definition is None:
+                raise ValueError(f"FIT data message before its definition at byte {pos - 1}")
+            if definition.struct is not None:
+                values = definition.struct.unpack_from(data, pos)
+                if definition.timestamp_index is not None:
+                    value = values[definition.timestamp_index]
+                    if value != 0xFFFFFFFF:
+                        timestamp = last_timestamp = value
+                indexes, rows = groups.setdefault(definition, ([], []))
+                indexes.append(len(timestamps))
+                rows.append(values)
+                timestamps.append(timestamp if timestamp is not None else np.nan)
+            pos += definition.size
+
+        start = end + 2  # CRC
+
+    count = len(timestamps)
+    columns = {name: np.full(count, np.nan) for name in RAW_COLUMNS}
+    columns['timestamp'] = np.array(timestamps, dtype=np.float64) + FIT_EPOCH
+    for definition, (indexes, rows) in groups.items():
+        indexes, rows = np.array(indexes), np.array(rows, dtype=np.float64).reshape(len(rows), -1)
+        numbers = {number for number, _ in definition.fields}
+        for j, (number, invalid) in enumerate(definition.fields):
+            if number == 253 or FIT_ENHANCED.get(number) in numbers:
+                continue
+            name, scale, offset = FIT_RECORD_FIELDS[number]
+            values = rows[:, j]
+            if invalid is not None:
+                values = np.where(values == invalid, np.nan, values)
+            columns[name][indexes] = values / scale - offset
+    return columns
+
+# -- TCX / GPX -----------------------------------------------------------------
+
+def _local(tag):
+    return tag.rpartition('}')[2]
+
+def _xml_points(path, point_tag, fields, attributes=()):
+    """Raw columns from every <point_tag> element: text of descendants named
+    in fields (local name -> column), plus attributes (name -> column)"""
+    root = ET.parse(path).getroot()
+    namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+    names = list(dict.fromkeys(list(fields.values()) + [column for _, column in attributes]))
+    values = {name: [] for name in names}
+    times = []
+
+    for point in root.iter(namespace + point_tag):
+        row = dict.fromkeys(names)
+        time = None
+        for attribute, column in attributes:
+            row[column] = point.get(attribute)
+        for element in point.iter():
+            name = _local(element.tag)
+            if name == 'Time' or name == 'time':
+                time = element.text
+            elif name in fields:
+                row[fields[name]] = element.text
+        times.append(time)
+        for name in names:
+            values[name].append(row[name])
+
+    columns = {name: np.full(len(times), np.nan) for name in RAW_COLUMNS}
+    columns['timestamp'] = _epoch_seconds(times)
+    for name in names:
+        columns[name] = np.array([np.nan if v is None else v for v in values[name]], dtype=np.float64)
+    return columns
+
+def parse_tcx(path):
+    return _xml_points(path, 'Trackpoint', {
+        'LatitudeDegrees': 'latitude',
+        'LongitudeDegrees': 'longitude',
+        'AltitudeMeters': 'altitude',
+        'DistanceMeters': 'distance',
+        'Value': 'heart_rate',          # only inside HeartRateBpm within a trackpoint
+        'Cadence': 'cadence',
+        'RunCadence': 'cadence',
+        'Speed': 'speed',
+    })
+
+def parse_gpx(path):
+    return _xml_points(path, 'trkpt', {
+        'ele': 'altitude',
+        'hr': 'heart_rate',
+        'cad': 'cadence',
+        'speed': 'speed',
+    }, attributes=(('lat', 'latitude'), ('lon', 'longitude')))
+
+def _epoch_seconds(times):
+    """ISO 8601 times as float epoch seconds, NaN where missing"""
+    try:
+        with warnings.catch_warnings():
+            # numpy only warns about UTC offsets; parse those exactly below
+            warnings.simplefilter('error')
+            stamps = np.array([t.strip().rstrip('Z') if t else 'NaT' for t in times], dtype='datetime64[ms]')
+        return np.where(np.isnat(stamps), np.nan, stamps.astype(np.int64) / 1000.0)
+    except (ValueError, UserWarning):
+        # UTC offsets other than Z
+        return np.array([datetime.fromisoformat(t.strip().replace('Z', '+00:00')).timestamp()
+                         if t else np.nan for t in times], dtype=np.float64)
+
+PARSERS = {'.fit': parse_fit, '.tcx': parse_tcx, '.gpx': parse_gpx}
+
+# -- streams -----------------------------------------------------------------
+
+def _fill_forward(values):
+    """Carry the last recorded value over NaN gaps (leading gaps get the first)"""
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return values
+    index = np.where(valid, np.arange(len(values)), 0)
+    np.maximum.accumulate(index, out=index)
+    filled = values[index]
+    filled[:np.argmax(valid)] = values[np.argmax(valid)]
+    return filled
+
+def _track_distance(latitude, longitude):
+    """Cumulative haversine distance in m"""
+    lat, lon = np.radians(_fill_forward(latitude)), np.radians(_fill_forward(longitude))
+    dlat, dlon = np.diff(lat), np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    steps = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.concatenate([[0.0], np.cumsum(np.nan_to_num(steps))])
+
+class ActivityStream:
+    """Equal-length typed columns, one row per record, plus meta"""
+
+    def __init__(self, columns, meta):
+        self.columns = columns
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.columns['time_ms'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def from_raw(cls, raw, source):
+        """Typed columns from parsed raw columns: records without a time are
+        dropped, distance and speed are derived when missing"""
+        keep = ~np.isnan(raw['timestamp'])
+        raw = {name: values[keep] for name, values in raw.items()}
+        order = np.argsort(raw['timestamp'], kind='stable')
+        raw = {name: values[order] for name, values in raw.items()}
+        if len(raw['timestamp']) == 0:
+            raise ValueError("No timed records in activity file")
+
+        seconds = raw['timestamp'] - raw['timestamp'][0]
+        distance = raw['distance']
+        if np.isnan(distance).all():
+            distance = _track_distance(raw['latitude'], raw['longitude'])
+        distance = np.maximum.accumulate(np.nan_to_num(_fill_forward(distance)))
+        speed = raw['speed']
+        if np.isnan(speed).all():
+            speed = np.gradient(distance, seconds) if len(seconds) > 1 else np.zeros(1)
+
+        columns = {
+            'time_ms': np.round(seconds * 1000),
+            'heart_rate': np.clip(np.nan_to_num(raw['heart_rate']), 0, 255),
+            'cadence': np.clip(np.nan_to_num(raw['cadence']), 0, 255),
+            'latitude': raw['latitude'],
+            'longitude': raw['longitude'],
+            'altitude': raw['altitude'],
+            'distance': distance,
+            'speed': np.nan_to_num(speed),
+        }
+        columns = {name: values.astype(COLUMNS[name]) for name, values in columns.items()}
+        start = datetime.fromtimestamp(raw['timestamp'][0], timezone.utc)
+        meta = {'start_time': start.isoformat().replace('+00:00', 'Z'), 'source': source,
+                'records': len(seconds)}
+        return cls(columns, meta)
+
+    @classmethod
+    def from_file(cls, path):
+        suffix = Path(path).suffix.lower()
+        if suffix not in PARSERS:
+            raise ValueError(f"Unsupported activity file: {path} (expected .fit, .tcx or .gpx)")
+        return cls.from_raw(PARSERS[suffix](path), suffix[1:])
+
+    @staticmethod
+    def current(path):
+        """Directory of the live version: the one CURRENT names, or the stream
+        directory itself for streams saved before versions"""
+        path = Path(path)
+        try:
+            return path / f"{int((path / 'CURRENT').read_text()):08d}"
+        except (OSError, ValueError):
+            return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved stream; columns are memory-mapped read-only by default.
+        A version that later saves remove while it is being opened is retried
+        at the new current one."""
+        mode = 'r' if mmap else None
+        while True:
+            version = cls.current(path)
+            try:
+                meta = json.loads((version / 'meta.json').read_text())
+                return cls({name: np.load(version / f"{name}.npy", mmap_mode=mode) for name in COLUMNS}, meta)
+            except FileNotFoundError:
+                if cls.current(path) == version:
+                    raise
+
+    def save(self, path):
+        """Write a new version and make it current: readers see the old
+        stream or the new one, never a half-written or missing one"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        current = self.current(path)
+        version = int(current.name) + 1 if current != path else 1
+        version_dir = path / f"{version:08d}"
+        tmp = path / f".{version_dir.name}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for name in COLUMNS:
+            np.save(tmp / f"{name}.npy", self.columns[name])
+        (tmp / 'meta.json').write_text(json.dumps(self.meta))
+        # Left by a save that never switched CURRENT
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp, version_dir)
+
+        pointer = path / f".CURRENT.{os.getpid()}.tmp"
+        pointer.write_text(f"{version}\n")
+        os.replace(pointer, path / 'CURRENT')
+
+        # Keep the previous version for readers that opened it just before the switch
+        for old in path.glob('[0-9]*'):
+            if old.is_dir() and int(old.name) < version - 1:
+                shutil.rmtree(old, ignore_errors=True)
+        if current == path:
+            for name in (*(f"{column}.npy" for column in COLUMNS), 'meta.json'):
+                (path / name).unlink(missing_ok=True)
+
+def ingest(path, streams_dir, activity_id=None):
+    """Parse an activity file and save it under <streams_dir>/<activity_id>"""
+    stream = ActivityStream.from_file(path)
+    activity_id = str(activity_id or Path(path).stem)
+    stream.meta['activity_id'] = activity_id
+    stream.save(Path(streams_dir) / activity_id)
+    return stream
+
+if __name__ == "__main__":
+    try:
+        if len(sys.argv) >= 4 and sys.argv[1] == 'ingest':
+            stream = ingest(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+            result = stream.meta
+        elif len(sys.argv) == 3 and sys.argv[1] == 'info':
+            result = ActivityStream.load(sys.argv[2]).meta
+        else:
+            print("Usage: activity_streams.py {ingest <file> <streams_dir> [activity_id]|info <dir>}",
+                  file=sys.stderr)
+            sys.exit(2)
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Analysis Pipeline
+Runs the independent analyses of one activity store (trends, training load
+anomalies, cross-stream correlations, plan compliance) side by side on a
+process pool, in place of one cold helper process after another.
+
+The store is opened once per worker, memory-mapped at the generation and row
+count the pipeline started with (activities appended meanwhile are left for
+the next run): every worker maps the same .npy files, so the columns are
+shared through the page cache and only the store path, generation and row
+count are sent to the workers. Each stage still brings its own
+persisted state up to date (trend_stats.json, training_load.json, ...), so
+an unchanged store costs little; --full recomputes every stage from the
+whole history, which is where the pool pays off.
+
+--workers 0 (the default) means one per stage, up to the CPU count; with
+one worker the stages run in this process, one after another.
+
+Usage: analysis_pipeline.py <store_dir> [--features <dir>] [--stages trends,anomalies,...]
+                            [--workers <n>] [--full] [--max-hr <bpm>]      (training plan, if any, on stdin)
+Output: {"generation", "activities", "workers", "results": {stage: result},
+         "timings": {"load_ms", "stages": {stage: {"ms", "pid"}}, "total_ms"}}
+A stage that fails has {"error"} as its result; the others still run.
+"""
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from activity_store import ActivityStore
+from analyze_trends import analyze_trends, load_stats
+from daily_features import correlations
+from detect_anomalies import detect_anomalies
+from process_activity import DEFAULT_MAX_HR
+from training_load import load_state
+from update_training_progress import load_progress, progress_report
+
+STAGE_NAMES = ('trends', 'anomalies', 'correlations', 'compliance')
+
+# The store this worker process has mapped: (store_dir, generation, ActivityStore)
+_attached = None
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+def _attach(store_dir, generation, rows):
+    """Pool initializer: map the pinned generation and rows once per worker"""
+    global _attached
+    _attached = (store_dir, generation, ActivityStore.load(store_dir, generation=generation, rows=rows))
+
+def trends(store_dir, store, options):
+    return analyze_trends(store, load_stats(store_dir, store, full=options['full']))
+
+def anomalies(store_dir, store, options):
+    return detect_anomalies(store, load_state(store_dir, store, full=options['full']))
+
+def daily_correlations(store_dir, store, options):
+    # The daily feature table is synced with the store on ingest
+    if not options.get('features'):
+        return None
+    return correlations(options['features'], full=options['full'])
+
+def compliance(store_dir, store, options):
+    if not options.get('plan'):
+        return None
+    progress = load_progress(store_dir, store, options['plan'], options['full'], options['max_hr'])
+    return progress_report(progress)
+
+STAGES = {
+    'trends': trends,
+    'anomalies': anomalies,
+    'correlations': daily_correlations,
+    'compliance': compliance,
+}
+
+def run_stage(name, options):
+    """One stage against the attached store; (result, {"ms", "pid"})"""
+    store_dir, _, store = _attached
+    start = time.perf_counter()
+    try:
+        result = STAGES[name](store_dir, store, options)
+    except Exception as e:
+        result = {'error': str(e)}
+    return result, {'ms': _ms(start), 'pid': os.getpid()}
+
+def run_pipeline(store_dir, stages=STAGE_NAMES, workers=None, full=False, features=None, plan=None,
+                 max_hr=DEFAULT_MAX_HR):
+    """Run <stages> over the store's current generation on <workers> processes
+    (None: one per stage, up to the CPU count)"""
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(unknown)}")
+    if workers is None:
+        workers = min(len(stages), os.cpu_count() or 1)
+    options = {'full': full, 'features': features, 'plan': plan, 'max_hr': max_hr}
+
+    start = time.perf_counter()
+    generation, rows = ActivityStore.current(store_dir)
+    _attach(store_dir, generation, rows)
+    timings = {'load_ms': _ms(start), 'stages': {}}
+
+    if workers <= 1 or len(stages) <= 1:
+        outcomes = {name: run_stage(name, options) for name in stages}
+    else:
+        with ProcessPoolExecutor(workers, initializer=_attach,
+                                 initargs=(store_dir, generation, rows)) as pool:
+            futures = {name: pool.submit(run_stage, name, options) for name in stages}
+            outcomes = {name: future.result() for name, future in futures.items()}
+
+    results = {}
+    for name, (result, timing) in outcomes.items():
+        results[name] = result
+        timings['stages'][name] = timing
+    timings['total_ms'] = _ms(start)
+    return {
+        'generation': generation,
+        'activities': len(_attached[2]),
+        'workers': max(1, min(workers, len(stages))),
+        'results': results,
+        'timings': timings,
+    }
+
+def main(args):
+    if not args or args[0].startswith('--'):
+        print("Usage: analysis_pipeline.py <store_dir> [--features <dir>] [--stages ...] [--workers <n>] [--full]",
+              file=sys.stderr)
+        sys.exit(2)
+
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+
+    text = sys.stdin.read() if not sys.stdin.isatty() else ''
+    plan = json.loads(text) if text.strip() else None
+    stages = option('--stages')
+    workers = option('--workers')
+    result = run_pipeline(
+        args[0],
+        stages=tuple(stages.split(',')) if stages else STAGE_NAMES,
+        workers=int(workers or 0) or None,
+        full='--full' in args,
+        features=option('--features'),
+        plan=plan,
+        max_hr=float(option('--max-hr', DEFAULT_MAX_HR)),
+    )
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    try:
+        # Pool workers find run_stage by module name, which __main__ is not
+        # under the helper server
+        import analysis_pipeline
+        analysis_pipeline.main(sys.argv[1:])
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
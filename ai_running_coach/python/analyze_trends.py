@@ -1,44 +1,209 @@
 #!/usr/bin/env python3
-"""Analyze performance trends from activity data"""
+"""Analyze performance trends from activity data
+Usage: analyze_trends.py                          (activities as a JSON array or JSON Lines on stdin)
+       analyze_trends.py --store <dir> [--full]   (columnar activity store, see activity_store.py)
+
+With --store, running aggregates are persisted next to the store
+(trend_stats.json) and only the activities appended since the last run are
+folded in, O(1) each. --full recomputes them from every activity.
+
+The aggregates are Welford's running count, mean and M2 (sum of squared
+deviations from the mean) per column for the standard deviation, and each
+column's total (and the first half of the history's pace total) as the few
+non-overlapping floats that add up to it exactly, the partial sums math.fsum
+keeps. math.fsum of those is the correctly rounded total whichever way it was
+reached, so the averages and the trend match a full recompute exactly.
+"""
 
 import sys
 import json
+import math
+from itertools import chain
 from datetime import datetime
 
-def analyze_trends(activities):
-    """Analyze trends in activity data"""
-    
-    if not activities or len(activities) == 0:
+import numpy as np
+
+from activity_store import ActivityStore, as_store, read_state, write_state
+from json_stream import iter_json
+
+STATS_FILE = 'trend_stats.json'
+STAT_COLUMNS = ('pace', 'distance', 'heart_rate')
+
+def _moments(values):
+    """Mean and M2 of a float array"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return 0.0, 0.0
+    mean = math.fsum(values) / len(values)
+    return mean, math.fsum((values - mean) ** 2)
+
+def _exact_total(values):
+    """The exact sum of a float array as non-overlapping partials, smallest
+    first: each one is the correctly rounded remainder of the sum"""
+    values = np.asarray(values, dtype=np.float64).tolist()
+    partials = []
+    while True:
+        rest = math.fsum(chain(values, (-p for p in partials)))
+        if rest == 0:
+            return partials[::-1]
+        partials.append(rest)
+
+def _add(partials, value):
+    """Add a float to exact partials in place (Shewchuk, as in math.fsum)"""
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i += 1
+        value = high
+    partials[i:] = [value]
+
+class TrendStats:
+    """Running aggregates behind analyze_trends: count, and per column the
+    mean and M2 and the exact total, and the first half's exact pace total"""
+
+    def __init__(self, origin=None):
+        self.origin = origin
+        self.count = 0
+        self.means = {column: 0.0 for column in STAT_COLUMNS}
+        self.m2 = {column: 0.0 for column in STAT_COLUMNS}
+        self.totals = {column: [] for column in STAT_COLUMNS}
+        self.first_half_pace = []
+
+    @classmethod
+    def of(cls, columns, origin=None):
+        """Stats of columns of equal length ({column: float array})"""
+        stats = cls(origin)
+        stats.count = len(columns['pace'])
+        for column in STAT_COLUMNS:
+            stats.means[column], stats.m2[column] = _moments(columns[column])
+            stats.totals[column] = _exact_total(columns[column])
+        stats.first_half_pace = _exact_total(columns['pace'][:stats.count // 2])
+        return stats
+
+    @classmethod
+    def full(cls, store, origin=None):
+        """Recompute from every activity in the store"""
+        return cls.of(store, origin)
+
+    @classmethod
+    def grouped(cls, store, groups, count):
+        """Stats for each of <count> athletes over one shared store, where
+        groups gives each row's athlete; rows keep their order within one"""
+        sizes = np.bincount(groups, minlength=count)
+        order = np.argsort(groups, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        columns = {column: np.asarray(store[column])[order] for column in STAT_COLUMNS}
+        return [cls.of({column: values[bounds[g]:bounds[g + 1]] for column, values in columns.items()})
+                for g in range(count)]
+
+    def update(self, store):
+        """Fold in activities appended to the store since these stats were
+        taken, one Welford step each"""
+        for index in range(self.count, len(store)):
+            # The half split moves up by one row on every other activity
+            mid = self.count // 2
+            self.count += 1
+            for column in STAT_COLUMNS:
+                value = float(store[column][index])
+                delta = value - self.means[column]
+                self.means[column] += delta / self.count
+                self.m2[column] += delta * (value - self.means[column])
+                _add(self.totals[column], value)
+            if self.count // 2 > mid:
+                _add(self.first_half_pace, float(store.pace[mid]))
+        return self
+
+    def mean(self, column):
+        return math.fsum(self.totals[column]) / self.count
+
+    def std_dev(self, column):
+        return (self.m2[column] / self.count) ** 0.5
+
+    def half_pace_means(self):
+        mid = self.count // 2
+        if mid == 0:
+            return 0, 0
+        first = math.fsum(self.first_half_pace) / mid
+        second = math.fsum(chain(self.totals['pace'], (-p for p in self.first_half_pace))) / (self.count - mid)
+        return first, second
+
+    def to_dict(self):
+        return {
+            'origin': self.origin,
+            'count': self.count,
+            'mean': self.means,
+            'm2': self.m2,
+            'total': self.totals,
+            'first_half_pace': self.first_half_pace,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data.get('origin'))
+        stats.count = data['count']
+        stats.means = {column: float(data['mean'][column]) for column in STAT_COLUMNS}
+        stats.m2 = {column: float(data['m2'][column]) for column in STAT_COLUMNS}
+        stats.totals = {column: [float(p) for p in data['total'][column]] for column in STAT_COLUMNS}
+        stats.first_half_pace = [float(p) for p in data['first_half_pace']]
+        return stats
+
+def load_stats(store_dir, store, full=False):
+    """Persisted stats brought up to date with the store, recomputing in full
+    on request or when the store was rebuilt"""
+    origin = ActivityStore.origin(store_dir)
+
+    stats = None
+    if not full:
+        try:
+            stats = TrendStats.from_dict(read_state(store_dir, STATS_FILE))
+        except (AttributeError, TypeError, ValueError, KeyError):
+            stats = None
+    if stats is None or stats.origin != origin or stats.count > len(store):
+        stats = TrendStats.full(store, origin)
+    elif stats.count == len(store):
+        return stats
+    else:
+        stats.update(store)
+
+    write_state(store_dir, STATS_FILE, stats.to_dict())
+    return stats
+
+def analyze_trends(activities, stats=None):
+    """Analyze trends in activity data (a list of activities or an ActivityStore).
+    Pass the store's persisted TrendStats to skip the full pass."""
+
+    if stats is None:
+        stats = TrendStats.full(as_store(activities))
+    if stats.count == 0:
         return {"error": "No activities to analyze"}
-    
-    # Extract data
-    data = [act.get('data', act) for act in activities]
-    
-    # Calculate averages
-    avg_pace = sum([d.get('pace', 0) for d in data]) / len(data) if data else 0
-    avg_distance = sum([d.get('distance', 0) for d in data]) / len(data) if data else 0
-    avg_hr = sum([d.get('heart_rate', 0) for d in data]) / len(data) if data else 0
-    
+
     # Trend detection (simple: compare first half to second half)
-    mid = len(data) // 2
-    first_half_pace = sum([d.get('pace', 0) for d in data[:mid]]) / mid if mid > 0 else 0
-    second_half_pace = sum([d.get('pace', 0) for d in data[mid:]]) / (len(data) - mid) if mid > 0 else 0
-    
+    first_half_pace, second_half_pace = stats.half_pace_means()
     improving = second_half_pace < first_half_pace if first_half_pace > 0 else False
-    
+
     return {
-        'total_activities': len(data),
-        'average_pace_min_per_km': round(avg_pace, 2),
-        'average_distance_km': round(avg_distance, 2),
-        'average_heart_rate': round(avg_hr, 0),
+        'total_activities': stats.count,
+        'average_pace_min_per_km': round(stats.mean('pace'), 2),
+        'average_distance_km': round(stats.mean('distance'), 2),
+        'average_heart_rate': round(stats.mean('heart_rate'), 0),
+        'pace_std_dev_min_per_km': round(stats.std_dev('pace'), 2),
         'trend': 'improving' if improving else 'stable',
         'analysis_date': datetime.now().isoformat()
     }
 
 if __name__ == "__main__":
     try:
-        activities = json.load(sys.stdin)
-        analysis = analyze_trends(activities)
+        if len(sys.argv) > 2 and sys.argv[1] == '--store':
+            store = ActivityStore.load(sys.argv[2])
+            stats = load_stats(sys.argv[2], store, full='--full' in sys.argv[3:])
+            analysis = analyze_trends(store, stats)
+        else:
+            analysis = analyze_trends(iter_json(sys.stdin))
         print(json.dumps(analysis, indent=2))
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Baselines
+Per-athlete baselines that anomaly checks score new data against, in place
+of global thresholds:
+
+  activities   for each workout type (and "all"), the last WINDOW values of
+               distance, duration, pace and heart rate, with median and MAD
+  resting HR   the last RHR_WINDOW days (Garmin daily summaries), with
+               median, MAD and trend in bpm per week
+
+A value is scored as a robust z-score, (value - median) / (1.4826 * MAD),
+with the spread floored at MIN_SPREAD of the median so a run of identical
+workouts doesn't turn every change into an outlier. A workout type with
+fewer than MIN_SAMPLES values is scored against "all".
+
+Each athlete is one small JSON file (<dir>/<user_id>.json) holding the
+windows and their statistics, so loading a baseline costs the same however
+long the history, and folding in an activity only touches its windows.
+evict() deletes athletes with no new data for STALE_DAYS and keeps at most
+MAX_ATHLETES; each athlete keeps at most MAX_TYPES workout types.
+
+Usage: baselines.py update <dir>              (activities as a JSON array or JSON Lines on stdin)
+       baselines.py health <dir>              (Garmin daily summaries on stdin)
+       baselines.py show <dir> [user_id]
+       baselines.py evict <dir> [--days <n>]
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+from pathlib import Path
+from datetime import date, timedelta
+from collections import OrderedDict
+
+import numpy as np
+
+from activity_store import ActivityStore, DEFAULT_USER, EPOCH, store_lock, user_id
+from json_stream import iter_json
+
+METRICS = ('distance', 'duration', 'pace', 'heart_rate')
+TYPE_FIELDS = ('type', 'activity_type', 'activityType')
+ALL_TYPES = 'all'
+
+WINDOW = 30
+RHR_WINDOW = 28
+MIN_SAMPLES = 5
+MAD_SCALE = 1.4826
+MIN_SPREAD = 0.05
+
+MAX_TYPES = 8
+STALE_DAYS = 180
+MAX_ATHLETES = 10000
+
+def _median_mad(values):
+    values = np.asarray(values, dtype=np.float64)
+    median = float(np.median(values))
+    return median, float(np.median(np.abs(values - median)))
+
+def _push(window, value, size):
+    """Append to a {"values", "median", "mad"} window, keeping the last <size>"""
+    window['values'] = (window.get('values', []) + [value])[-size:]
+    window['median'], window['mad'] = _median_mad(window['values'])
+
+def _z(window, value):
+    if not window or len(window['values']) < MIN_SAMPLES:
+        return None
+    spread = max(MAD_SCALE * window['mad'], MIN_SPREAD * abs(window['median']))
+    return (value - window['median']) / spread if spread > 0 else None
+
+def activity_type(data):
+    for field in TYPE_FIELDS:
+        value = data.get(field)
+        if isinstance(value, dict):
+            value = value.get('typeKey')
+        if value:
+            return str(value).lower()
+    return 'unknown'
+
+def _today():
+    return (date.today() - EPOCH).days
+
+class Baseline:
+    """One athlete's windows; plain JSON-able dicts all the way down"""
+
+    def __init__(self, user, data=None):
+        data = data or {}
+        self.user = user
+        self.last_day = data.get('last_day')
+        self.types = data.get('types', {})
+        self.resting_hr = data.get('resting_hr', {})
+
+    def _seen(self, day):
+        if day >= 0 and (self.last_day is None or day > self.last_day):
+            self.last_day = day
+
+    def add_activity(self, day, kind, values):
+        """Fold one activity's metrics (0 = not recorded) into its type and "all" """
+        self._seen(day)
+        for name in (kind, ALL_TYPES):
+            windows = self.types.setdefault(name, {})
+            windows['last_day'] = max(day, windows.get('last_day', day))
+            for metric in METRICS:
+                if values.get(metric, 0) > 0:
+                    _push(windows.setdefault(metric, {}), values[metric], WINDOW)
+
+        # Forget the workout type done least recently
+        kinds = [name for name in self.types if name != ALL_TYPES]
+        if len(kinds) > MAX_TYPES:
+            del self.types[min(kinds, key=lambda name: self.types[name]['last_day'])]
+
+    def score_activity(self, kind, values):
+        """{metric: {"value", "median", "z"}} for the recorded metrics that have a baseline"""
+        windows = self.types.get(kind, {})
+        scores = {}
+        for metric in METRICS:
+            value = values.get(metric, 0)
+            if value <= 0:
+                continue
+            window = windows.get(metric)
+            if not window or len(window['values']) < MIN_SAMPLES:
+                window = self.types.get(ALL_TYPES, {}).get(metric)
+            z = _z(window, value)
+            if z is not None:
+                scores[metric] = {'value': round(value, 2), 'median': round(window['median'], 2), 'z': round(z, 2)}
+        return scores
+
+    def add_resting_hr(self, day, value):
+        """Fold in a day's resting HR (a re-sent day replaces its value)"""
+        self._seen(day)
+        rhr = self.resting_hr
+        readings = dict(zip(rhr.get('days', []), rhr.get('values', [])))
+        readings[day] = value
+        days = sorted(readings)[-RHR_WINDOW:]
+        rhr['days'], rhr['values'] = days, [readings[d] for d in days]
+        rhr['median'], rhr['mad'] = _median_mad(rhr['values'])
+        rhr['trend_per_week'] = None
+        if len(days) >= MIN_SAMPLES and days[-1] > days[0]:
+            rhr['trend_per_week'] = round(float(np.polyfit(days, rhr['values'], 1)[0]) * 7, 2)
+
+    def score_resting_hr(self, value):
+        z = _z(self.resting_hr, value)
+        if z is None:
+            return None
+        return {'value': value, 'median': round(self.resting_hr['median'], 1), 'z': round(z, 2),
+                'trend_per_week': self.resting_hr['trend_per_week']}
+
+    def to_dict(self):
+        return {'user_id': self.user, 'last_day': self.last_day, 'types': self.types, 'resting_hr': self.resting_hr}
+
+def _path(directory, user):
+    """File for an athlete; ids that aren't safe file names get a hash suffix"""
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', user)
+    if name != user or name.startswith('.'):
+        name = f"{name}-{hashlib.blake2b(user.encode(), digest_size=6).hexdigest()}"
+    return Path(directory) / f"{name}.json"
+
+def load(directory, user):
+    """An athlete's baseline (empty if there is none yet)"""
+    try:
+        return Baseline(user, json.loads(_path(directory, user).read_text()))
+    except (OSError, ValueError):
+        return Baseline(user)
+
+def save(directory, baseline):
+    path = _path(directory, baseline.user)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.parent / f".{path.name}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(baseline.to_dict()))
+    os.replace(tmp, path)
+
+def _by_user(entries):
+    grouped = OrderedDict()
+    for entry in entries:
+        grouped.setdefault(user_id(entry), []).append(entry)
+    return grouped
+
+def update_activities(directory, activities, score=False):
+    """Fold activities into their athletes' baselines. With score, each is
+    first scored against the baseline as it stood; returns
+    [{"user_id", "activity_id", "type", "scores"}] in input order."""
+    results = []
+    with store_lock(directory):
+        for user, entries in _by_user(activities).items():
+            baseline = load(directory, user)
+            store = ActivityStore.from_records(entries)
+            for i, entry in enumerate(entries):
+                data = entry.get('data', entry) if isinstance(entry, dict) else {}
+                kind = activity_type(data if isinstance(data, dict) else {})
+                values = {metric: float(store[metric][i]) for metric in METRICS}
+                if score:
+                    results.append({'user_id': user, 'activity_id': int(store.activity_id[i]), 'type': kind,
+                                    'scores': baseline.score_activity(kind, values)})
+                baseline.add_activity(int(store.date[i]), kind, values)
+            save(directory, baseline)
+    return results
+
+def _resting_hr(data):
+    health = data.get('health_metrics', data)
+    try:
+        value = float(health.get('resting_hr', health.get('restingHeartRate')))
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+def update_health(directory, summaries, score=False):
+    """Fold daily summaries' resting HR in, optionally scoring it first (not
+    for a day the baseline already holds, e.g. a summary re-sent after a
+    restart); returns [{"user_id", "date", "scores"}]"""
+    results = []
+    with store_lock(directory):
+        for user, entries in _by_user(summaries).items():
+            baseline = load(directory, user)
+            changed = False
+            days = ActivityStore.from_records(entries).date
+            for entry, day in zip(entries, days.tolist()):
+                data = entry.get('data', entry) if isinstance(entry, dict) else {}
+                value = _resting_hr(data) if isinstance(data, dict) else None
+                if value is None or day < 0:
+                    continue
+                if score and day not in baseline.resting_hr.get('days', []):
+                    scores = baseline.score_resting_hr(value)
+                    results.append({'user_id': user, 'date': str(EPOCH + timedelta(days=day)),
+                                    'scores': {'resting_hr': scores} if scores else {}})
+                baseline.add_resting_hr(day, value)
+                changed = True
+            if changed:
+                save(directory, baseline)
+    return results
+
+def evict(directory, today=None, stale_days=STALE_DAYS, max_athletes=MAX_ATHLETES):
+    """Delete baselines with no data for <stale_days>, then the least recently
+    active beyond <max_athletes>; returns how many were deleted"""
+    today = _today() if today is None else today
+    athletes = []
+    with store_lock(directory):
+        for path in Path(directory).glob('*.json'):
+            try:
+                last_day = json.loads(path.read_text()).get('last_day')
+            except (OSError, ValueError):
+                last_day = None
+            athletes.append((last_day if last_day is not None else -1, path))
+        athletes.sort(reverse=True)
+        evicted = [path for i, (last_day, path) in enumerate(athletes)
+                   if last_day < today - stale_days or i >= max_athletes]
+        for path in evicted:
+            path.unlink(missing_ok=True)
+    return len(evicted)
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv[1:]
+        if len(args) < 2 or args[0] not in ('update', 'health', 'show', 'evict'):
+            print("Usage: baselines.py {update|health|show|evict} <dir> ...", file=sys.stderr)
+            sys.exit(2)
+        command, directory = args[0], args[1]
+
+        if command in ('update', 'health'):
+            entries = list(iter_json(sys.stdin))
+            if command == 'update':
+                update_activities(directory, entries)
+            else:
+                update_health(directory, entries)
+            result = {'entries': len(entries)}
+        elif command == 'show':
+            result = load(directory, args[2] if len(args) > 2 else DEFAULT_USER).to_dict()
+        else:
+            days = int(args[args.index('--days') + 1]) if '--days' in args else STALE_DAYS
+            result = {'evicted': evict(directory, stale_days=days)}
+
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Batch Analysis
+analyze_trends, detect_anomalies and (optionally) generate_training_plan for
+many athletes in one process. Every athlete's activities go into one shared
+columnar table (see activity_store.py), grouped by user_id, and each metric
+is computed for all athletes at once with grouped numpy reductions.
+
+Activities without a user_id belong to DEFAULT_USER (see activity_store.py).
+Within an athlete, activities are taken in input order, as the
+single-athlete helpers do.
+
+Usage: batch_analysis.py [--profiles <file>]    (activities as a JSON array or JSON Lines on stdin)
+Output: one JSON line per athlete, in order of first appearance:
+        {"user_id", "trends", "anomalies"[, "training_plan"]}
+"""
+
+import sys
+import json
+from array import array
+
+import numpy as np
+
+from activity_store import ActivityStore, user_id
+from analyze_trends import TrendStats, analyze_trends
+from detect_anomalies import load_alerts
+from generate_training_plan import generate_training_plan
+from json_stream import iter_json
+from training_load import ACUTE_LAMBDA, CHRONIC_LAMBDA, MONOTONY_DAYS, load_metrics
+
+class BatchTable:
+    """An ActivityStore over every athlete plus each row's athlete index"""
+
+    def __init__(self, store, codes, users):
+        self.store = store
+        self.codes = codes
+        self.users = users
+
+    @classmethod
+    def from_stream(cls, activities):
+        users, codes = {}, array('q')
+
+        def tagged():
+            for activity in activities:
+                codes.append(users.setdefault(user_id(activity), len(users)))
+                yield activity
+
+        store = ActivityStore.from_stream(tagged())
+        return cls(store, np.frombuffer(codes, dtype=np.int64), list(users))
+
+def batch_trends(table):
+    """analyze_trends for every athlete, from exact grouped sums so each
+    result is the one analyze_trends gives for that athlete alone"""
+    return [analyze_trends(None, stats)
+            for stats in TrendStats.grouped(table.store, table.codes, len(table.users))]
+
+def batch_anomalies(table):
+    """detect_anomalies for every athlete. An EWMA that starts from zero is a
+    sum over activities weighted by (1 - lambda) ** days before the latest
+    day, so no per-athlete daily series is needed."""
+    users = len(table.users)
+    dated = table.store.date >= 0
+    codes, days, loads = table.codes[dated], table.store.date[dated], table.store.distance[dated]
+
+    last = np.full(users, -1, dtype=np.int64)
+    np.maximum.at(last, codes, days)
+    first = np.full(users, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes, days)
+
+    age = last[codes] - days
+    acute = ACUTE_LAMBDA * np.bincount(codes, weights=loads * (1 - ACUTE_LAMBDA) ** age, minlength=users)
+    chronic = CHRONIC_LAMBDA * np.bincount(codes, weights=loads * (1 - CHRONIC_LAMBDA) ** age, minlength=users)
+    recent = age < MONOTONY_DAYS
+    week = np.bincount(codes[recent] * MONOTONY_DAYS + (MONOTONY_DAYS - 1 - age[recent]),
+                       weights=loads[recent], minlength=users * MONOTONY_DAYS).reshape(users, MONOTONY_DAYS)
+
+    results = []
+    for u in range(users):
+        if last[u] < 0:
+            results.append({"has_alerts": False})
+            continue
+        metrics = load_metrics(int(last[u]), int(last[u] - first[u] + 1),
+                               float(acute[u]), float(chronic[u]), week[u])
+        results.append(load_alerts(metrics))
+    return results
+
+def batch_plans(profiles):
+    """generate_training_plan per athlete; athletes with the same goal and
+    training days share one generated plan"""
+    plans, cache = {}, {}
+    for profile in profiles:
+        data = profile.get('data', profile) if isinstance(profile, dict) else {}
+        key = (json.dumps(data.get('goals', {}).get('target_race', '10k')),
+               json.dumps(data.get('preferences', {}).get('training_days_per_week', 4)))
+        if key not in cache:
+            cache[key] = generate_training_plan(profile)
+        plans[user_id(profile)] = cache[key]
+    return plans
+
+def batch_analyze(activities, profiles=()):
+    """Per-athlete results, in order of first appearance"""
+    table = BatchTable.from_stream(activities)
+    plans = batch_plans(profiles)
+    trends, anomalies = batch_trends(table), batch_anomalies(table)
+
+    for u, user in enumerate(table.users):
+        result = {'user_id': user, 'trends': trends[u], 'anomalies': anomalies[u]}
+        if user in plans:
+            result['training_plan'] = plans.pop(user)
+        yield result
+    # Athletes with a profile but no activities yet
+    for user, plan in plans.items():
+        yield {'user_id': user, 'trends': {"error": "No activities to analyze"},
+               'anomalies': {"has_alerts": False}, 'training_plan': plan}
+
+if __name__ == "__main__":
+    try:
+        profiles = []
+        if len(sys.argv) > 2 and sys.argv[1] == '--profiles':
+            with open(sys.argv[2]) as f:
+                profiles = list(iter_json(f))
+        for result in batch_analyze(iter_json(sys.stdin), profiles):
+            sys.stdout.write(json.dumps(result) + '\n')
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Compact the data bus archive
+Rolls archived one-file-per-message JSON into gzip segments partitioned by
+day, keeps an index per segment, and enforces retention. Live channel
+messages are only expired into the archive once every consumer cursor is
+past them, unless they have gone unread for the whole retention window.
+
+Layout per channel:
+  data_bus/archive/<channel>/segments/<YYYY-MM-DD>.jsonl.gz   one gzip member per run
+  data_bus/archive/<channel>/segments/<YYYY-MM-DD>.idx.jsonl  {"id", "type", "timestamp", "member", "line"}
+
+Usage: compact_archive.py [--min-age SECONDS] [--retention-days DAYS]
+       compact_archive.py --get <channel> <msg_id>
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import fcntl
+import shutil
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATA_BUS_DIR = Path(os.environ.get('DATA_BUS_DIR', PROJECT_ROOT / 'data_bus'))
+CONFIG_FILE = Path(os.environ.get('CONFIG_DIR', PROJECT_ROOT / 'config')) / 'system_config.json'
+
+SEGMENTS = 'segments'
+
+def load_config():
+    """Retention settings from system_config.json"""
+    try:
+        with open(CONFIG_FILE) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    return {
+        'max_message_age_seconds': config.get('system', {}).get('max_message_age_seconds', 3600),
+        'retention_days': config.get('storage', {}).get('data_retention_days', 90),
+    }
+
+def message_day(message, path):
+    """Partition key: the message's own timestamp, falling back to file mtime"""
+    timestamp = message.get('timestamp', '') if isinstance(message, dict) else ''
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+    except ValueError:
+        return datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).strftime('%Y-%m-%d')
+
+def read_message(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def read_cursors(channel):
+    """Each consumer's cursor on a channel: (watermark, handled seqs above it)"""
+    cursors = {}
+    for path in sorted((DATA_BUS_DIR / 'cursors' / channel).glob('[!.]*')):
+        try:
+            lines = path.read_text().split('\n')
+        except OSError:
+            continue
+        watermark = int(lines[0]) if lines[0].strip().isdigit() else 0
+        cursors[path.name] = (watermark, {int(s) for s in (lines[1] if len(lines) > 1 else '').split()})
+    return cursors
+
+def commit_cursor(channel, consumer, seq):
+    """Mark one seq handled for a consumer, as databus.sh commit_cursor does
+    (and under its lock)"""
+    cursor_dir = DATA_BUS_DIR / 'cursors' / channel
+    cursor_dir.mkdir(parents=True, exist_ok=True)
+    with open(cursor_dir / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        watermark, handled = read_cursors(channel).get(consumer, (0, set()))
+        if seq <= watermark:
+            return
+        handled.add(seq)
+        while watermark + 1 in handled:
+            watermark += 1
+            handled.discard(watermark)
+        tmp = cursor_dir / f".{consumer}.{os.getpid()}.tmp"
+        tmp.write_text(f"{watermark}\n{' '.join(map(str, sorted(handled)))}\n")
+        os.replace(tmp, cursor_dir / consumer)
+
+def expire_channel_messages(max_age_seconds, unread_max_age_seconds):
+    """Move live channel messages older than max_message_age_seconds into the
+    archive once every consumer with a cursor on the channel has handled
+    them. Messages still unread by a (stopped or slow) consumer stay until
+    unread_max_age_seconds; then they are dropped anyway, and the cursors of
+    the consumers that never read them are moved past them.
+    Returns (expired, kept_unread, dropped_unread)."""
+    channels_dir = DATA_BUS_DIR / 'channels'
+    now = time.time()
+    expired, kept_unread, dropped_unread = 0, 0, []
+
+    for channel_dir in sorted(p for p in channels_dir.glob('*/') if p.is_dir()):
+        channel = channel_dir.name
+        cursors = read_cursors(channel)
+        for msg_file in sorted(channel_dir.glob('*.json')):
+            try:
+                age = now - msg_file.stat().st_mtime
+                if age < max_age_seconds:
+                    continue
+                message = read_message(msg_file)
+                seq = message.get('seq') if isinstance(message, dict) else None
+                unread = [] if seq is None else [consumer for consumer, (watermark, handled) in cursors.items()
+                                                 if seq > watermark and seq not in handled]
+                if unread and age < unread_max_age_seconds:
+                    kept_unread += 1
+                    continue
+                archive_dir = DATA_BUS_DIR / 'archive' / channel
+                archive_dir.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(msg_file), str(archive_dir / msg_file.name))
+                expired += 1
+            except FileNotFoundError:
+                # Consumed and archived by its agent while we were looking
+                continue
+            if unread:
+                for consumer in unread:
+                    commit_cursor(channel, consumer, seq)
+                cursors = read_cursors(channel)
+                dropped_unread.append({'channel': channel, 'id': message.get('id', msg_file.stem),
+                                       'seq': seq, 'consumers': unread})
+
+    return expired, kept_unread, dropped_unread
+
+def compact_channel(channel_dir, min_age_seconds):
+    """Append settled message files to their day's segment, then remove them"""
+    segments_dir = channel_dir / SEGMENTS
+    cutoff = time.time() - min_age_seconds
+
+    by_day = {}
+    for msg_file in channel_dir.rglob('*.json'):
+        if SEGMENTS in msg_file.relative_to(channel_dir).parts:
+            continue
+        if msg_file.stat().st_mtime >= cutoff:
+            continue
+        message = read_message(msg_file)
+        by_day.setdefault(message_day(message, msg_file), []).append((msg_file, message))
+
+    compacted = 0
+    for day, entries in sorted(by_day.items()):
+        segments_dir.mkdir(parents=True, exist_ok=True)
+        segment_file = segments_dir / f"{day}.jsonl.gz"
+        index_file = segments_dir / f"{day}.idx.jsonl"
+
+        # Each run appends a new gzip member; the index records where it starts
+        member = segment_file.stat().st_size if segment_file.exists() else 0
+        index_lines = []
+        with open(segment_file, 'ab') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as segment:
+            for line, (msg_file, message) in enumerate(entries):
+                if message is None:
+                    message = {'id': msg_file.stem, 'raw': msg_file.read_text(errors='replace')}
+                segment.write((json.dumps(message, separators=(',', ':')) + '\n').encode())
+                index_lines.append(json.dumps({
+                    'id': message.get('id', msg_file.stem),
+                    'type': message.get('type'),
+                    'timestamp': message.get('timestamp'),
+                    'member': member,
+                    'line': line
+                }))
+        with open(segment_file, 'ab') as raw:
+            os.fsync(raw.fileno())
+
+        with open(index_file, 'a') as index:
+            index.write('\n'.join(index_lines) + '\n')
+            index.flush()
+            os.fsync(index.fileno())
+
+        # Only drop the originals once the segment and index are durable
+        for msg_file, _ in entries:
+            msg_file.unlink(missing_ok=True)
+        compacted += len(entries)
+
+    # Remove day directories left empty by older archive layouts
+    for sub_dir in sorted(channel_dir.glob('*/'), reverse=True):
+        if sub_dir.name != SEGMENTS and sub_dir.is_dir() and not any(sub_dir.iterdir()):
+            sub_dir.rmdir()
+
+    return compacted
+
+def drop_expired_segments(channel_dir, retention_days):
+    """Delete day segments (and their index) older than the retention window"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    dropped = 0
+    for segment_file in (channel_dir / SEGMENTS).glob('*.jsonl.gz'):
+        day = segment_file.name[:10]
+        if day < cutoff:
+            segment_file.unlink(missing_ok=True)
+            (channel_dir / SEGMENTS / f"{day}.idx.jsonl").unlink(missing_ok=True)
+            dropped += 1
+    return dropped
+
+def drop_expired_log_segments(retention_days):
+    """Delete sealed log-backend segments older than the retention window"""
+    cutoff = time.time() - retention_days * 86400
+    dropped = 0
+    for log_dir in (DATA_BUS_DIR / 'log').glob('*/'):
+        segments = sorted(log_dir.glob('[0-9]*.log'))
+        # Never touch the active (last) segment
+        for segment_file in segments[:-1]:
+            if segment_file.stat().st_mtime < cutoff:
+                segment_file.unlink(missing_ok=True)
+                dropped += 1
+    return dropped
+
+def compact(min_age_seconds, retention_days, max_message_age_seconds):
+    archive_dir = DATA_BUS_DIR / 'archive'
+    expired, kept_unread, dropped_unread = expire_channel_messages(max_message_age_seconds,
+                                                                   retention_days * 86400)
+    result = {
+        'expired_from_channels': expired,
+        'kept_unread': kept_unread,
+        'dropped_unread': dropped_unread,
+        'compacted': 0,
+        'segments_dropped': 0,
+        'log_segments_dropped': drop_expired_log_segments(retention_days),
+    }
+
+    for channel_dir in sorted(p for p in archive_dir.glob('*/') if p.is_dir()):
+        with open(channel_dir / '.compact.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            result['compacted'] += compact_channel(channel_dir, min_age_seconds)
+            result['segments_dropped'] += drop_expired_segments(channel_dir, retention_days)
+
+    return result
+
+def get_archived_message(channel, msg_id):
+    """Find a message through the segment indexes and read only its gzip member"""
+    segments_dir = DATA_BUS_DIR / 'archive' / channel / SEGMENTS
+    for index_file in sorted(segments_dir.glob('*.idx.jsonl'), reverse=True):
+        with open(index_file) as index:
+            for line in index:
+                entry = json.loads(line)
+                if entry['id'] != msg_id:
+                    continue
+                segment_file = segments_dir / index_file.name.replace('.idx.jsonl', '.jsonl.gz')
+                with open(segment_file, 'rb') as raw:
+                    raw.seek(entry['member'])
+                    with gzip.GzipFile(fileobj=raw) as segment:
+                        for n, message in enumerate(segment):
+                            if n == entry['line']:
+                                return json.loads(message)
+    return None
+
+if __name__ == "__main__":
+    config = load_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-age', type=int, default=60,
+                        help="only compact archive files older than this many seconds")
+    parser.add_argument('--retention-days', type=int, default=config['retention_days'])
+    parser.add_argument('--max-message-age', type=int, default=config['max_message_age_seconds'])
+    parser.add_argument('--get', nargs=2, metavar=('CHANNEL', 'MSG_ID'))
+    args = parser.parse_args()
+
+    try:
+        if args.get:
+            message = get_archived_message(*args.get)
+            print(json.dumps(message, indent=2))
+            sys.exit(0 if message is not None else 1)
+        result = compact(args.min_age, args.retention_days, args.max_message_age)
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Daily Features
+One row per day joining the athlete's data streams, so correlations
+("pace is 5% slower on days after poor sleep") come from one small cached
+table instead of re-reading every knowledge base file.
+
+Columns (float64, NaN where the source had nothing that day):
+  run_count, run_distance     activities from the activity store (km)
+  run_pace, run_heart_rate    distance-weighted min/km, mean bpm
+  sleep_hours, deep_sleep_hours, resting_hr
+                              Garmin daily summary (or raw sleep data); the
+                              night's sleep counts for the day it ends on
+  hours_slept, sleep_quality, energy, mood, soreness, pain
+                              DailyJournal entries; ratings as ordinals
+                              (see RATINGS), soreness the worst level
+  calories, protein_g, carbohydrates_g, fat_g
+                              FoodLog nutrition_info, summed over the day
+
+Each source only touches its own columns. Sleep, journal and food entries
+replace the days they cover, as the knowledge base does; activities are
+folded in from the activity store as it grows, like the trend stats.
+
+The table is saved as one .npz file (replaced atomically). correlate()
+relates every feature on day t to every feature of another source on day
+t + lag, all pairs of a lag at once with masked matrix products over the
+days both are present, and is cached until the table changes.
+
+Usage: daily_features.py add <dir> {sleep|journal|food}    (entries as a JSON array or JSON Lines on stdin)
+       daily_features.py sync <dir> <activity_store_dir>
+       daily_features.py correlate <dir> [--lags <days>] [--full]
+       daily_features.py info <dir>
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+
+from activity_store import ActivityStore, EPOCH, read_state, store_lock, write_state
+from json_stream import iter_json
+
+TABLE_FILE = 'features.npz'
+CORRELATIONS_FILE = 'correlations.json'
+
+# Per-day activity sums the run_* features are derived from
+RUN_SUMS = ('run_count', 'run_distance', 'run_pace_km', 'run_paced_km', 'run_hr_sum', 'run_hr_count')
+SOURCES = {
+    'sleep': ('sleep_hours', 'deep_sleep_hours', 'resting_hr'),
+    'journal': ('hours_slept', 'sleep_quality', 'energy', 'mood', 'soreness', 'pain'),
+    'food': ('calories', 'protein_g', 'carbohydrates_g', 'fat_g'),
+}
+COLUMNS = RUN_SUMS + tuple(name for names in SOURCES.values() for name in names)
+FEATURES = {'run': ('run_count', 'run_distance', 'run_pace', 'run_heart_rate'), **SOURCES}
+
+# Journal column -> (DailyJournal field, ordinal for each answer)
+RATINGS = {
+    'sleep_quality': ('sleep_quality', {'poor': 0, 'fair': 1, 'good': 2, 'excellent': 3}),
+    'energy': ('energy_level', {'exhausted': 0, 'poor': 1, 'low': 2, 'average': 3, 'good': 4,
+                                'high': 5, 'energized': 6}),
+    'mood': ('mood', {'sad': 0, 'stressed': 0, 'irritable': 0, 'unmotivated': 1, 'normal': 2,
+                      'calm': 3, 'happy': 3, 'motivated': 4, 'energetic': 4}),
+}
+NUTRIENTS = {'calories': 'calories', 'protein_g': 'protein_g',
+             'carbohydrates_g': 'carbohydrates_g', 'fat_g': 'fat_g'}
+
+# Which way "higher" reads for outcomes in insight text
+DIRECTION_WORDS = {'run_pace': ('slower', 'faster')}
+
+DEFAULT_LAGS = 3
+# A pair needs this many days with both values, and at least this |r|
+MIN_DAYS = 14
+MIN_CORRELATION = 0.3
+MAX_INSIGHTS = 10
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return number if np.isfinite(number) else np.nan
+
+def _day(value):
+    """Days since the epoch for an ISO date/datetime string, or None"""
+    try:
+        return (date.fromisoformat(str(value)[:10]) - EPOCH).days
+    except (TypeError, ValueError):
+        return None
+
+def _entry_day(entry, data, fields=('date', 'calendarDate', 'timestamp')):
+    """A knowledge base entry's day: from the data, else its key, else its timestamp"""
+    for value in [data.get(field) for field in fields] + [entry.get('key'), entry.get('timestamp')]:
+        day = _day(value) if value else None
+        if day is not None:
+            return day
+    return None
+
+def _entries(entries):
+    """(entry, data) pairs, unwrapping {"key", "timestamp", "data"} and lists of meals"""
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        data = entry.get('data', entry)
+        if isinstance(data, dict):
+            data = data.get('entries', data.get('meals', [data]))
+        items = data if isinstance(data, list) else []
+        for item in items:
+            if isinstance(item, dict):
+                yield entry, item
+
+def sleep_row(data):
+    """Garmin daily summary ({"health_metrics": {"sleep", "resting_hr"}}),
+    the collector's sleep dict or the raw Garmin sleep payload"""
+    health = data.get('health_metrics', data)
+    sleep = health.get('sleep', health) or {}
+    daily = sleep.get('dailySleepDTO', sleep)
+    hours = _number(daily.get('duration_hours'))
+    if np.isnan(hours):
+        hours = _number(daily.get('sleepTimeSeconds')) / 3600
+    deep = _number(daily.get('deep_sleep_hours'))
+    if np.isnan(deep):
+        deep = _number(daily.get('deepSleepSeconds')) / 3600
+    return {'sleep_hours': hours, 'deep_sleep_hours': deep,
+            'resting_hr': _number(health.get('resting_hr', health.get('restingHeartRate')))}
+
+def journal_row(data):
+    row = {'hours_slept': _number(data.get('hours_slept'))}
+    for name, (field, scale) in RATINGS.items():
+        row[name] = scale.get(str(data.get(field)).lower(), np.nan)
+    levels = [_number(s.get('level')) for s in data.get('muscle_soreness') or [] if isinstance(s, dict)]
+    row['soreness'] = max(levels) if levels else (0.0 if 'muscle_soreness' in data else np.nan)
+    injury = data.get('injury_report')
+    if isinstance(injury, dict):
+        row['pain'] = _number(injury.get('pain_level', 0)) if injury.get('is_injured') else 0.0
+    else:
+        row['pain'] = np.nan
+    return row
+
+def food_row(data):
+    """Nutrition of one meal entry; NaN for nutrients no item reported"""
+    row = {}
+    infos = [item.get('nutrition_info') or {} for item in data.get('food_items') or [] if isinstance(item, dict)]
+    for column, field in NUTRIENTS.items():
+        values = [_number(info.get(field)) for info in infos if field in info]
+        row[column] = float(np.nansum(values)) if values else np.nan
+    return row
+
+ROWS = {'sleep': sleep_row, 'journal': journal_row, 'food': food_row}
+
+def _group_days(days, values, combine):
+    """Collapse repeated days: 'sum' adds them (NaN only if all are NaN),
+    'last' keeps the last value"""
+    unique, inverse = np.unique(days, return_inverse=True)
+    if combine == 'sum':
+        present = np.bincount(inverse, weights=~np.isnan(values), minlength=len(unique))
+        total = np.bincount(inverse, weights=np.nan_to_num(values), minlength=len(unique))
+        return unique, np.where(present > 0, total, np.nan)
+    last = np.zeros(len(unique), dtype=np.int64)
+    np.maximum.at(last, inverse, np.arange(len(days)))
+    return unique, values[last]
+
+class DailyFeatures:
+    """Per-day columns over a sorted array of days"""
+
+    def __init__(self, days=None, columns=None, meta=None):
+        self.days = np.asarray(days if days is not None else [], dtype=np.int64)
+        columns = columns or {}
+        self.columns = {name: np.asarray(columns.get(name, np.full(len(self.days), np.nan)), dtype=np.float64)
+                        for name in COLUMNS}
+        self.meta = meta or {'version': 0, 'activity_origin': None, 'activity_count': 0}
+
+    def __len__(self):
+        return len(self.days)
+
+    def _rows(self, days):
+        """Row index of each day, adding rows for days not in the table yet"""
+        missing = np.setdiff1d(days, self.days)
+        if len(missing):
+            merged = np.union1d(self.days, missing)
+            keep = np.searchsorted(merged, self.days)
+            for name, column in self.columns.items():
+                grown = np.full(len(merged), np.nan)
+                grown[keep] = column
+                self.columns[name] = grown
+            self.days = merged
+        return np.searchsorted(self.days, days)
+
+    def add(self, source, entries):
+        """Set the source's columns for the days the entries cover; returns
+        the number of days touched"""
+        days, values = [], []
+        for entry, data in _entries(entries):
+            day = _entry_day(entry, data)
+            if day is not None:
+                days.append(day)
+                values.append(ROWS[source](data))
+        if not days:
+            return 0
+        days = np.array(days, dtype=np.int64)
+        # A day's meals add up; anything else, the latest entry wins
+        combine = 'sum' if source == 'food' else 'last'
+        for name in SOURCES[source]:
+            unique, column = _group_days(days, np.array([row[name] for row in values], dtype=np.float64), combine)
+            rows = self._rows(unique)
+            self.columns[name][rows] = column
+        self.meta['version'] += 1
+        return len(np.unique(days))
+
+    def sync(self, store, origin=None):
+        """Fold in activities appended to the store since the last sync (all of
+        them if the store was rebuilt); returns the number folded in"""
+        count = self.meta['activity_count']
+        if origin != self.meta['activity_origin'] or count > len(store):
+            for name in RUN_SUMS:
+                self.columns[name][:] = np.nan
+            count = 0
+        new = store.take(slice(count, None))
+        self.meta.update(activity_origin=origin, activity_count=len(store))
+        dated = new.date >= 0
+        if not dated.any():
+            return len(new)
+
+        days, distance = new.date[dated], new.distance[dated]
+        pace, heart_rate = new.pace[dated], new.heart_rate[dated]
+        paced = (pace > 0) & (distance > 0)
+        sums = {
+            'run_count': np.ones(len(days)),
+            'run_distance': distance,
+            'run_pace_km': np.where(paced, pace * distance, 0.0),
+            'run_paced_km': np.where(paced, distance, 0.0),
+            'run_hr_sum': np.where(heart_rate > 0, heart_rate, 0.0),
+            'run_hr_count': (heart_rate > 0).astype(np.float64),
+        }
+        unique, inverse = np.unique(days, return_inverse=True)
+        rows = self._rows(unique)
+        for name, values in sums.items():
+            column = self.columns[name]
+            column[rows] = np.nan_to_num(column[rows]) + np.bincount(inverse, weights=values, minlength=len(unique))
+        self.meta['version'] += 1
+        return len(new)
+
+    def features(self):
+        """Feature name -> per-day values, run_* derived from the sums"""
+        c = self.columns
+        with np.errstate(invalid='ignore', divide='ignore'):
+            derived = {
+                'run_count': c['run_count'],
+                'run_distance': c['run_distance'],
+                'run_pace': np.where(c['run_paced_km'] > 0, c['run_pace_km'] / c['run_paced_km'], np.nan),
+                'run_heart_rate': np.where(c['run_hr_count'] > 0, c['run_hr_sum'] / c['run_hr_count'], np.nan),
+            }
+        return {**derived, **{name: c[name] for names in SOURCES.values() for name in names}}
+
+    def matrix(self):
+        """(first day, feature names, days x features array over every
+        calendar day from the first to the last, NaN where absent)"""
+        names = [name for names in FEATURES.values() for name in names]
+        if not len(self.days):
+            return None, names, np.zeros((0, len(names)))
+        first = int(self.days[0])
+        dense = np.full((int(self.days[-1]) - first + 1, len(names)), np.nan)
+        features = self.features()
+        for j, name in enumerate(names):
+            dense[self.days - first, j] = features[name]
+        return first, names, dense
+
+    # -- persistence ---------------------------------------------------------
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(Path(path) / TABLE_FILE) as saved:
+                return cls(saved['days'], {name: saved[name] for name in COLUMNS if name in saved.files},
+                           json.loads(str(saved['meta'])))
+        except (OSError, KeyError, ValueError):
+            return cls()
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        tmp = path / f".{TABLE_FILE}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, days=self.days, meta=np.array(json.dumps(self.meta)), **self.columns)
+        os.replace(tmp, path / TABLE_FILE)
+
+def correlation_matrices(x, y):
+    """Pearson r and pair counts between every column of x and every column
+    of y over the rows where both are present (NaN = absent)"""
+    has_x, has_y = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(has_x, x, 0.0), np.where(has_y, y, 0.0)
+    mx, my = has_x.astype(np.float64), has_y.astype(np.float64)
+
+    n = mx.T @ my
+    sum_x, sum_y = x0.T @ my, mx.T @ y0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = x0.T @ y0 - sum_x * sum_y / n
+        var_x = (x0 * x0).T @ my - sum_x * sum_x / n
+        var_y = mx.T @ (y0 * y0) - sum_y * sum_y / n
+        r = cov / np.sqrt(var_x * var_y)
+    # Constant columns have no correlation; rounding can push |r| a hair past 1
+    r[~(var_x > 1e-12 * np.maximum(n, 1)) | ~(var_y > 1e-12 * np.maximum(n, 1))] = np.nan
+    return np.clip(r, -1, 1), n.astype(np.int64)
+
+def _effect(driver, outcome):
+    """Percent difference in the outcome mean when the driver is below its
+    median vs at or above it (over days with both)"""
+    both = ~np.isnan(driver) & ~np.isnan(outcome)
+    driver, outcome = driver[both], outcome[both]
+    low = driver < np.median(driver)
+    if not low.any() or low.all():
+        return None
+    base = outcome[~low].mean()
+    return round(float((outcome[low].mean() - base) / base * 100), 1) if base else None
+
+def _insight(driver, outcome, lag, effect):
+    higher, lower = DIRECTION_WORDS.get(outcome, ('higher', 'lower'))
+    when = {0: 'on days with', 1: 'the day after'}.get(lag, f"{lag} days after")
+    return (f"{outcome.replace('_', ' ')} is {abs(effect)}% {higher if effect > 0 else lower} "
+            f"{when} low {driver.replace('_', ' ')}")
+
+def correlate(table, lags=DEFAULT_LAGS, min_days=MIN_DAYS, min_correlation=MIN_CORRELATION):
+    """Correlations between features of different sources, the driver on day t
+    and the outcome on day t + lag for lag 0..lags, strongest first. Same-day
+    pairs are listed once, with the run feature as the outcome. Insights
+    describe the strongest effects on running."""
+    first, names, dense = table.matrix()
+    source = np.array([group for group, columns in FEATURES.items() for _ in columns])
+    is_run = source == 'run'
+    index = np.arange(len(names))
+    other_source = source[:, None] != source[None, :]
+    same_day = is_run[None, :] | (~is_run[:, None] & (index[:, None] < index[None, :]))
+
+    found = []
+    for lag in range(lags + 1):
+        if len(dense) <= lag:
+            break
+        r, n = correlation_matrices(dense[:len(dense) - lag], dense[lag:])
+        keep = other_source & (n >= min_days) & (np.abs(np.nan_to_num(r)) >= min_correlation)
+        if lag == 0:
+            keep &= same_day
+        for i, j in zip(*np.nonzero(keep)):
+            found.append((abs(r[i, j]), lag, int(i), int(j), float(r[i, j]), int(n[i, j])))
+    found.sort(key=lambda f: (-f[0], f[1]))
+
+    correlations, insights = [], []
+    for _, lag, i, j, r, n in found:
+        item = {'driver': names[i], 'outcome': names[j], 'lag_days': lag, 'r': round(r, 3), 'days': n}
+        if is_run[j] and not is_run[i] and len(insights) < MAX_INSIGHTS:
+            effect = _effect(dense[:len(dense) - lag, i], dense[lag:, j])
+            if effect:
+                item['effect_percent'] = effect
+                insights.append(_insight(names[i], names[j], lag, effect))
+        correlations.append(item)
+
+    return {
+        'days': len(table),
+        'first_date': str(EPOCH + timedelta(days=first)) if first is not None else None,
+        'lags': lags,
+        'correlations': correlations,
+        'insights': insights,
+    }
+
+def correlations(path, lags=DEFAULT_LAGS, full=False):
+    """correlate() over the saved table, reusing the cached result while the
+    table is unchanged"""
+    table = DailyFeatures.load(path)
+    cached = read_state(path, CORRELATIONS_FILE)
+    if (not full and cached and cached.get('version') == table.meta['version']
+            and cached.get('result', {}).get('lags') == lags):
+        return {**cached['result'], 'cached': True}
+    result = correlate(table, lags)
+    write_state(path, CORRELATIONS_FILE, {'version': table.meta['version'], 'result': result})
+    return {**result, 'cached': False}
+
+def info(path):
+    table = DailyFeatures.load(path)
+    result = {'days': len(table), 'version': table.meta['version'], 'activities': table.meta['activity_count']}
+    if len(table):
+        result['first_date'] = str(EPOCH + timedelta(days=int(table.days[0])))
+        result['last_date'] = str(EPOCH + timedelta(days=int(table.days[-1])))
+        result['days_with'] = {name: int((~np.isnan(values)).sum()) for name, values in table.features().items()}
+    return result
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv[1:]
+        if len(args) < 2 or args[0] not in ('add', 'sync', 'correlate', 'info'):
+            print("Usage: daily_features.py {add|sync|correlate|info} <dir> ...", file=sys.stderr)
+            sys.exit(2)
+        command, path = args[0], args[1]
+
+        if command == 'add':
+            if len(args) < 3 or args[2] not in SOURCES:
+                raise ValueError(f"source must be one of {', '.join(SOURCES)}")
+            with store_lock(path):
+                table = DailyFeatures.load(path)
+                result = {'source': args[2], 'days': table.add(args[2], iter_json(sys.stdin))}
+                table.save(path)
+        elif command == 'sync':
+            if len(args) < 3:
+                raise ValueError("sync needs the activity store directory")
+            with store_lock(path):
+                table = DailyFeatures.load(path)
+                result = {'activities': table.sync(ActivityStore.load(args[2]), ActivityStore.origin(args[2]))}
+                table.save(path)
+        elif command == 'correlate':
+            lags = int(args[args.index('--lags') + 1]) if '--lags' in args else DEFAULT_LAGS
+            result = correlations(path, lags, full='--full' in args)
+        else:
+            result = info(path)
+
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
@@ -1,64 +1,133 @@
 #!/usr/bin/env python3
-"""Detect anomalies in training data"""
+"""Detect anomalies in training data from acute:chronic workload metrics
+(see training_load.py), and in new activities and daily resting heart rate
+scored against the athlete's own baselines (see baselines.py)
+Usage: detect_anomalies.py                          (activities as a JSON array or JSON Lines on stdin)
+       detect_anomalies.py --store <dir> [--full]   (persisted training load state)
+       detect_anomalies.py --baselines <dir>        (new activities or Garmin daily summaries on stdin;
+                                                     each is scored, then folded into the baseline)
+"""
 
 import sys
 import json
 
-def detect_anomalies(activities):
-    """Detect potential overtraining or injury risk"""
-    
-    if len(activities) < 3:
+import baselines
+from activity_store import ActivityStore, as_store
+from json_stream import iter_json
+from training_load import CHRONIC_DAYS, TrainingLoad, load_state
+
+# Thresholds: ACWR above 1.5 is the injury "danger zone", 1.3-1.5 is a
+# spike worth backing off from; monotony above 2 means too little variation
+ACWR_DANGER = 1.5
+ACWR_HIGH = 1.3
+MONOTONY_HIGH = 2.0
+# Robust z-scores against the athlete's baseline: beyond 3.5 is an outlier,
+# beyond 5 far outside anything they have done recently
+Z_ALERT = 3.5
+Z_SEVERE = 5.0
+
+# Baseline score -> (alert type, recommended action), checked in this order
+BASELINE_ALERTS = (
+    ('resting_hr', 'elevated_resting_hr', "Resting heart rate is well above baseline; consider an easy or rest day"),
+    ('heart_rate', 'elevated_heart_rate', "Heart rate was well above usual for this workout type; watch for fatigue or illness"),
+    ('distance', 'distance_spike', "Much longer than usual for this workout type; plan extra recovery"),
+    ('duration', 'duration_spike', "Much longer than usual for this workout type; plan extra recovery"),
+)
+
+def detect_anomalies(activities, state=None):
+    """Detect potential overtraining or injury risk. Pass the store's
+    persisted TrainingLoad to skip the full pass."""
+
+    if state is None:
+        state = TrainingLoad.full(as_store(activities))
+    if state.day is None:
         return {"has_alerts": False}
-    
-    data = [act.get('data', act) for act in activities]
-    
-    # Calculate weekly load
-    distances = [d.get('distance', 0) for d in data]
-    total_distance = sum(distances)
-    avg_distance = total_distance / len(distances)
-    
-    # Check for sudden spike
-    recent_avg = sum(distances[-3:]) / 3
-    spike = recent_avg > (avg_distance * 1.3)
-    
-    # Check for high heart rate
-    heart_rates = [d.get('heart_rate', 0) for d in data if d.get('heart_rate', 0) > 0]
-    high_hr = False
-    if heart_rates:
-        avg_hr = sum(heart_rates) / len(heart_rates)
-        high_hr = avg_hr > 165
-    
-    has_alerts = spike or high_hr
-    
+    return load_alerts(state.metrics())
+
+def load_alerts(metrics):
+    """Alert (or not) for one athlete's training load metrics"""
+    acwr = metrics['acwr']
+    # The chronic load means little until it covers its full window
+    established = metrics['history_days'] >= CHRONIC_DAYS
+
     result = {
-        "has_alerts": has_alerts,
+        "has_alerts": False,
         "alert_type": "",
         "severity": "low",
-        "details": {},
+        "details": metrics,
         "recommended_action": ""
     }
-    
-    if spike:
+
+    if established and acwr is not None and acwr > ACWR_DANGER:
+        result["has_alerts"] = True
+        result["alert_type"] = "injury_risk"
+        result["severity"] = "high"
+        result["recommended_action"] = "Cut back to the chronic load; acute load is more than 1.5x it"
+    elif established and acwr is not None and acwr > ACWR_HIGH:
+        result["has_alerts"] = True
         result["alert_type"] = "overtraining"
         result["severity"] = "medium"
-        result["details"] = {
-            "weekly_distance": round(total_distance, 1),
-            "spike_detected": True
-        }
         result["recommended_action"] = "Consider reducing training load"
-    
-    if high_hr:
+    elif metrics['monotony'] > MONOTONY_HIGH:
+        result["has_alerts"] = True
         result["alert_type"] = "fatigue"
         result["severity"] = "medium"
-        result["details"]["average_heart_rate"] = round(avg_hr, 0)
-        result["recommended_action"] = "Increase rest and recovery"
-    
+        result["recommended_action"] = "Vary daily load with easy and rest days"
+
+    return result
+
+def baseline_alerts(scores):
+    """Alert (or not) for one activity's or day's baseline scores
+    ({metric: {"value", "median", "z"}}); the highest outlier wins"""
+    result = {
+        "has_alerts": False,
+        "alert_type": "",
+        "severity": "low",
+        "details": scores,
+        "recommended_action": ""
+    }
+
+    flagged = [(scores[metric]['z'], alert_type, action) for metric, alert_type, action in BASELINE_ALERTS
+               if scores.get(metric) and scores[metric]['z'] > Z_ALERT]
+    if flagged:
+        z, alert_type, action = max(flagged, key=lambda f: f[0])
+        result["has_alerts"] = True
+        result["alert_type"] = alert_type
+        result["severity"] = "high" if z > Z_SEVERE else "medium"
+        result["recommended_action"] = action
+
     return result
 
+def _is_daily_summary(entry):
+    data = entry.get('data', entry) if isinstance(entry, dict) else None
+    return isinstance(data, dict) and 'health_metrics' in data
+
+def score_new_data(directory, entries):
+    """Score activities and daily summaries against their athletes' baselines,
+    then fold them in. Returns the most severe alert; every score is in the
+    details when there is none."""
+    entries = list(entries)
+    scored = baselines.update_activities(directory, [e for e in entries if not _is_daily_summary(e)], score=True)
+    scored += baselines.update_health(directory, [e for e in entries if _is_daily_summary(e)], score=True)
+
+    alerts = []
+    for item in scored:
+        result = baseline_alerts(item['scores'])
+        if result['has_alerts']:
+            alerts.append({**result, 'details': item})
+    if not alerts:
+        return {"has_alerts": False, "details": scored}
+    return max(alerts, key=lambda result: result['severity'] == 'high')
+
 if __name__ == "__main__":
     try:
-        activities = json.load(sys.stdin)
-        result = detect_anomalies(activities)
+        if len(sys.argv) > 2 and sys.argv[1] == '--store':
+            store = ActivityStore.load(sys.argv[2])
+            result = detect_anomalies(store, load_state(sys.argv[2], store, full='--full' in sys.argv[3:]))
+        elif len(sys.argv) > 2 and sys.argv[1] == '--baselines':
+            result = score_new_data(sys.argv[2], iter_json(sys.stdin))
+        else:
+            result = detect_anomalies(iter_json(sys.stdin))
         print(json.dumps(result, indent=2))
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
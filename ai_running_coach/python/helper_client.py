@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Helper Client
+Runs a python/ helper through helper_server.py, as a drop-in for
+`python3 python/<helper>.py [args...]`. Falls back to running the helper
+directly when the server is not reachable.
+Usage: helper_client.py <helper_name> [args...]
+
+This runs once per agent call, so it sticks to builtin modules (_socket
+instead of socket, no json) - those imports would cost more than the call.
+"""
+
+import os
+import sys
+import _socket
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def socket_path():
+    if os.environ.get('HELPER_SOCKET'):
+        return os.environ['HELPER_SOCKET']
+    pid_dir = os.environ.get('PID_DIR', os.path.join(os.path.dirname(PYTHON_DIR), 'pids'))
+    return os.path.join(pid_dir, 'helper_server.sock')
+
+def run_direct(helper, args):
+    script = os.path.join(PYTHON_DIR, f"{helper}.py")
+    os.execv(sys.executable, [sys.executable, script] + args)
+
+def recv_all(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+def main():
+    if len(sys.argv) < 2:
+        sys.stderr.write("Usage: helper_client.py <helper_name> [args...]\n")
+        sys.exit(2)
+
+    helper, args = sys.argv[1], sys.argv[2:]
+
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        run_direct(helper, args)
+
+    # Request: "<header_len>\n" + NUL-joined [tty_flag, helper, *args] + stdin
+    stdin_is_tty = sys.stdin.isatty()
+    header = b'\0'.join(
+        [b'1' if stdin_is_tty else b'0', os.fsencode(helper)] + [os.fsencode(a) for a in args]
+    )
+    sock.sendall(str(len(header)).encode() + b'\n' + header)
+    if not stdin_is_tty:
+        # In chunks: the server streams stdin to the helper as it arrives
+        while True:
+            chunk = sys.stdin.buffer.read1(65536)
+            if not chunk:
+                break
+            sock.sendall(chunk)
+    sock.shutdown(_socket.SHUT_WR)
+
+    # Response: "<exit_code> <stderr_len>\n" + stderr + stdout
+    response = recv_all(sock)
+    status, _, body = response.partition(b'\n')
+    try:
+        exit_code, stderr_len = (int(field) for field in status.split())
+    except ValueError:
+        sys.stderr.write("No response from helper server\n")
+        sys.exit(1)
+
+    sys.stdout.buffer.write(body[stderr_len:])
+    sys.stdout.flush()
+    sys.stderr.buffer.write(body[:stderr_len])
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Helper Server
+Loads every python/*.py helper once and serves them over a Unix domain socket,
+so agents stop paying interpreter startup and imports on every call.
+Usage: helper_server.py [--socket PATH]
+Call helpers through helper_client.py (or run_python_helper in lib/databus.sh)
+"""
+
+import io
+import os
+import sys
+import signal
+import socketserver
+import traceback
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = PYTHON_DIR.parent
+
+# Scripts that are part of the server itself, not helpers
+EXCLUDED = {'helper_server', 'helper_client'}
+
+def default_socket_path():
+    """Socket location shared by the server, the client and lib/databus.sh"""
+    if os.environ.get('HELPER_SOCKET'):
+        return os.environ['HELPER_SOCKET']
+    pid_dir = os.environ.get('PID_DIR', str(PROJECT_ROOT / 'pids'))
+    return os.path.join(pid_dir, 'helper_server.sock')
+
+def log(message):
+    print(f"[helper_server] {message}", file=sys.stderr, flush=True)
+
+class _TtyStdin(io.StringIO):
+    """Empty stdin that reports itself as a terminal, like an interactive call"""
+    def isatty(self):
+        return True
+
+class _Unclosable(io.RawIOBase):
+    """Read-only view of the connection that survives its TextIOWrapper"""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read1(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        pass
+
+def load_helpers():
+    """Compile every helper once and run its module body to warm imports"""
+    if str(PYTHON_DIR) not in sys.path:
+        sys.path.insert(0, str(PYTHON_DIR))
+
+    helpers = {}
+    for path in sorted(PYTHON_DIR.glob('*.py')):
+        name = path.stem
+        if name in EXCLUDED:
+            continue
+        try:
+            code = compile(path.read_text(), str(path), 'exec')
+        except SyntaxError as e:
+            log(f"Skipping {name}: {e}")
+            continue
+
+        try:
+            # Importing under the helper's own name pulls its dependencies
+            # into sys.modules without running the __main__ block
+            exec(code, {'__name__': name, '__file__': str(path)})
+        except Exception as e:
+            log(f"Warning: preloading {name} failed: {e}")
+
+        helpers[name] = (str(path), code)
+
+    return helpers
+
+def run_helper(helpers, name, args, payload, stdin_is_tty=False):
+    """Run a helper's __main__ block in this process. payload is the stdin
+    bytes, or a binary file the helper reads as it goes.
+
+    Returns (exit_code, stdout_bytes, stderr_bytes). Callers must run this in
+    a forked child, since helpers freely rebind sys.stdin/sys.argv.
+    """
+    if name not in helpers:
+        return 127, b'', f"Unknown helper: {name}\n".encode()
+
+    path, code = helpers[name]
+    stdout, stderr = io.StringIO(), io.StringIO()
+
+    sys.argv = [path] + list(args)
+    if stdin_is_tty:
+        sys.stdin = _TtyStdin()
+    else:
+        if isinstance(payload, bytes):
+            payload = io.BytesIO(payload)
+        sys.stdin = io.TextIOWrapper(payload, encoding='utf-8')
+    sys.stdout, sys.stderr = stdout, stderr
+
+    exit_code = 0
+    try:
+        exec(code, {'__name__': '__main__', '__file__': path})
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=stderr)
+            exit_code = 1
+    except Exception:
+        traceback.print_exc(file=stderr)
+        exit_code = 1
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+
+    return exit_code, stdout.getvalue().encode(), stderr.getvalue().encode()
+
+class HelperRequestHandler(socketserver.StreamRequestHandler):
+    """One request per connection.
+
+    Request:  "<header_len>\\n" + NUL-joined [tty_flag, helper, *args] + raw stdin
+    Response: "<exit_code> <stderr_len>\\n" + stderr + stdout
+
+    stdin is handed to the helper as the socket stream itself, so helpers
+    that parse incrementally (json_stream) never hold all of it.
+
+    Deliberately not JSON: the client would spend more time importing json
+    than the whole round trip takes.
+    """
+
+    def handle(self):
+        try:
+            header_len = int(self.rfile.readline())
+            fields = [os.fsdecode(f) for f in self.rfile.read(header_len).split(b'\0')]
+            stdin_is_tty, name, args = fields[0] == '1', fields[1], fields[2:]
+        except (ValueError, IndexError):
+            stdin_is_tty, name, args = False, '', []
+        exit_code, stdout, stderr = run_helper(
+            self.server.helpers, name, args, _Unclosable(self.rfile), stdin_is_tty
+        )
+        # Whatever the helper left unread, so the client can finish sending
+        while self.rfile.read(65536):
+            pass
+
+        self.wfile.write(f"{exit_code} {len(stderr)}\n".encode())
+        self.wfile.write(stderr)
+        self.wfile.write(stdout)
+
+class HelperServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Forks per request after helpers are loaded, so children start warm"""
+    max_children = 64
+
+def serve(socket_path):
+    helpers = load_helpers()
+    log(f"Loaded {len(helpers)} helper(s): {', '.join(sorted(helpers))}")
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+
+    server = HelperServer(socket_path, HelperRequestHandler)
+    server.helpers = helpers
+    os.chmod(socket_path, 0o600)
+
+    def shutdown(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, shutdown)
+
+    log(f"Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        log("Stopped")
+
+if __name__ == "__main__":
+    socket_path = default_socket_path()
+    if len(sys.argv) > 2 and sys.argv[1] == '--socket':
+        socket_path = sys.argv[2]
+    serve(socket_path)
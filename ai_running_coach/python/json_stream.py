@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+JSON Stream
+Incremental reader for helper input, so a long history is parsed one entry at
+a time instead of materializing the whole document with json.load.
+
+Accepts either a JSON array (yields its elements) or a sequence of JSON
+values such as JSON Lines (yields each value), e.g. the output of
+`query_knowledge <domain> <pattern> --jsonl`. A single object yields itself.
+
+Usage: json_stream.py    (counts the values on stdin)
+"""
+
+import sys
+import json
+
+CHUNK_SIZE = 65536
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+_NUMBER_TAIL = '0123456789.eE+-'
+
+def iter_json(stream, chunk_size=CHUNK_SIZE):
+    """Yield each element of a top-level array, or each top-level value.
+    Raises ValueError on malformed input, as json.load would: an array must
+    have exactly one comma between elements, none trailing, and nothing but
+    whitespace after its closing bracket."""
+    buffer, pos, eof = '', 0, False
+    in_array = None
+    # Inside the array: 'first' element or ']', a 'value' (after a comma),
+    # or a 'separator' (',' or ']'); 'closed' once ']' has been read
+    expect = 'first'
+
+    def fill(size):
+        nonlocal buffer, pos, eof
+        chunk = stream.read(size)
+        if not chunk:
+            eof = True
+        # Drop what has been consumed so the buffer stays about one chunk long
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Skip whitespace
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            fill(chunk_size)
+
+        if pos == len(buffer):
+            if in_array and expect != 'closed':
+                raise ValueError("Unterminated JSON array")
+            return
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array:
+            char = buffer[pos]
+            if expect == 'closed':
+                raise ValueError(f"Extra data after the JSON array at {buffer[pos:pos + 20]!r}")
+            if char == ']' and expect != 'value':
+                expect = 'closed'
+                pos += 1
+                continue
+            if char == ',' and expect == 'separator':
+                expect = 'value'
+                pos += 1
+                continue
+            if expect == 'separator':
+                raise ValueError(f"Expected ',' or ']' in the JSON array at {buffer[pos:pos + 20]!r}")
+            if char in ',]':
+                raise ValueError(f"Expected a value in the JSON array at {buffer[pos:pos + 20]!r}")
+            expect = 'separator'
+
+        # A value is complete once something other than more of a number
+        # follows it: "12" may be the start of "123", "1.5" of "1.5e-7"
+        size = chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+                if eof or (end < len(buffer) and buffer[end] not in _NUMBER_TAIL):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            # Grow reads geometrically so a huge single value is not re-parsed per chunk
+            size = max(size, len(buffer) - pos)
+            fill(size)
+        pos = end
+        yield value
+
+if __name__ == "__main__":
+    try:
+        print(json.dumps({"values": sum(1 for _ in iter_json(sys.stdin))}))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
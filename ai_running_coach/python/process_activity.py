@@ -1,17 +1,209 @@
 #!/usr/bin/env python3
 """
 Process Activity
-Placeholder - Implement specific logic as needed
+Ingests an activity's per-second records (FIT, TCX or GPX, see
+activity_streams.py) and derives, with vectorized numpy over the whole
+stream: per-km splits, time in heart rate zones, grade-adjusted pace and
+aerobic decoupling.
+
+The activity comes as JSON on stdin (e.g. a Garmin activity); its file is
+taken from "activity_file" (or "file"), or given with --file. Without a file,
+a stream already ingested for the activity id is reused.
+
+Usage: process_activity.py [--file <path>] [--streams <dir>] [--max-hr <bpm>]
 """
 
 import sys
 import json
+from pathlib import Path
+
+import numpy as np
+
+from activity_streams import ActivityStream, ingest
+
+FILE_FIELDS = ('activity_file', 'file')
+ID_FIELDS = ('activityId', 'activity_id', 'id')
+MAX_HR_FIELDS = ('max_heart_rate', 'maxHeartRate')
+
+DEFAULT_MAX_HR = 190
+# Zone lower bounds as a fraction of max heart rate (Z1-Z5)
+HR_ZONES = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+# A gap longer than this between records is a pause, not running
+PAUSE_SECONDS = 10
+STOPPED_SPEED = 0.5  # m/s
+# Grade is measured over +-GRADE_SPAN m and clipped to +-MAX_GRADE
+GRADE_SPAN = 25.0
+MAX_GRADE = 0.45
+# Decoupling needs enough steady running for the halves to mean anything
+MIN_DECOUPLING_SECONDS = 20 * 60
+
+def _first(data, names, default=None):
+    for name in names:
+        if data.get(name) is not None:
+            return data[name]
+    return default
+
+def minetti_cost(grade):
+    """Energy cost of running (J/kg/m) at a grade, Minetti et al. 2002"""
+    g = grade
+    return (((((155.4 * g - 30.4) * g - 43.3) * g + 46.3) * g + 19.5) * g + 3.6)
+
+FLAT_COST = minetti_cost(0.0)
+
+def _pace(seconds, meters):
+    """min/km, None when there is no distance"""
+    return round(seconds / 60 / (meters / 1000), 2) if meters > 0 else None
+
+def _interpolate(values):
+    """Fill NaN by linear interpolation over sample index (flat at the ends)"""
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return values
+    index = np.arange(len(values))
+    return np.interp(index, index[valid], values[valid])
+
+def derive(stream):
+    """Per-sample arrays every metric works from"""
+    seconds = stream['time_ms'].astype(np.float64) / 1000
+    distance = stream['distance'].astype(np.float64)
+    speed = stream['speed'].astype(np.float64)
+    heart_rate = stream['heart_rate'].astype(np.float64)
+
+    # Time each sample stands for; pauses and standing still don't count
+    dt = np.diff(seconds, append=seconds[-1])
+    dt[dt > PAUSE_SECONDS] = 0
+    dt[speed < STOPPED_SPEED] = 0
+
+    altitude = _interpolate(stream['altitude'].astype(np.float64))
+    if np.isnan(altitude).all():
+        grade = np.zeros(len(seconds))
+        climb = np.zeros(len(seconds))
+    else:
+        ahead = np.minimum(np.searchsorted(distance, distance + GRADE_SPAN), len(distance) - 1)
+        behind = np.searchsorted(distance, distance - GRADE_SPAN)
+        run = distance[ahead] - distance[behind]
+        rise = altitude[ahead] - altitude[behind]
+        grade = np.clip(np.divide(rise, run, out=np.zeros(len(run)), where=run > 1), -MAX_GRADE, MAX_GRADE)
+        climb = np.maximum(np.diff(altitude, prepend=altitude[0]), 0)
+
+    return {
+        'seconds': seconds,
+        'distance': distance,
+        'dt': dt,
+        'speed': speed,
+        'gap_speed': speed * minetti_cost(grade) / FLAT_COST,
+        'heart_rate': heart_rate,
+        'cadence': stream['cadence'].astype(np.float64),
+        'climb': climb,
+    }
+
+def splits(d, split_m=1000.0):
+    """One entry per km (the last one partial): time, pace, grade-adjusted
+    pace, average heart rate and elevation gain"""
+    distance, dt = d['distance'], d['dt']
+    total = distance[-1]
+    if total <= 0:
+        return []
+    count = int(np.ceil(total / split_m))
+    index = np.minimum((distance // split_m).astype(np.int64), count - 1)
+
+    seconds = np.bincount(index, weights=dt, minlength=count)
+    gap_meters = np.bincount(index, weights=d['gap_speed'] * dt, minlength=count)
+    has_hr = d['heart_rate'] > 0
+    hr_seconds = np.bincount(index, weights=dt * has_hr, minlength=count)
+    hr_sum = np.bincount(index, weights=d['heart_rate'] * dt, minlength=count)
+    climb = np.bincount(index, weights=d['climb'], minlength=count)
+    meters = np.minimum(split_m, total - np.arange(count) * split_m)
+
+    return [{
+        'km': i + 1,
+        'distance_km': round(float(meters[i]) / 1000, 3),
+        'time_seconds': round(float(seconds[i]), 1),
+        'pace_min_per_km': _pace(seconds[i], meters[i]),
+        'gap_min_per_km': _pace(seconds[i], gap_meters[i]),
+        'average_heart_rate': round(float(hr_sum[i] / hr_seconds[i])) if hr_seconds[i] else None,
+        'elevation_gain_m': round(float(climb[i]), 1),
+    } for i in range(count)]
+
+def hr_zones(d, max_hr=DEFAULT_MAX_HR):
+    """Minutes in each zone; "z0" is recorded time below zone 1"""
+    has_hr = d['heart_rate'] > 0
+    zone = np.searchsorted(np.array(HR_ZONES) * max_hr, d['heart_rate'][has_hr], side='right')
+    minutes = np.bincount(zone, weights=d['dt'][has_hr], minlength=len(HR_ZONES) + 1) / 60
+    return {f"z{i}": round(float(m), 1) for i, m in enumerate(minutes)}
+
+def decoupling(d):
+    """Aerobic decoupling (Pa:HR): how much grade-adjusted speed per heartbeat
+    drops from the first half of moving time to the second, in percent"""
+    dt = d['dt'] * (d['heart_rate'] > 0)
+    elapsed = np.cumsum(dt)
+    if elapsed[-1] < MIN_DECOUPLING_SECONDS:
+        return None
+    second = elapsed > elapsed[-1] / 2
+    efficiency = []
+    for half in (~second, second):
+        beats = (d['heart_rate'][half] * dt[half]).sum()
+        efficiency.append((d['gap_speed'][half] * dt[half]).sum() / beats if beats else 0)
+    if not efficiency[0]:
+        return None
+    return round(float((efficiency[0] - efficiency[1]) / efficiency[0] * 100), 2)
+
+def activity_metrics(stream, max_hr=DEFAULT_MAX_HR):
+    d = derive(stream)
+    moving = float(d['dt'].sum())
+    meters = float(d['distance'][-1])
+    has_hr = d['heart_rate'] > 0
+    hr_seconds = float(d['dt'][has_hr].sum())
+    has_cadence = d['cadence'] > 0
+    cadence_seconds = float(d['dt'][has_cadence].sum())
+    gap_meters = float((d['gap_speed'] * d['dt']).sum())
+
+    return {
+        **stream.meta,
+        'distance_km': round(meters / 1000, 2),
+        'elapsed_minutes': round(float(d['seconds'][-1]) / 60, 1),
+        'moving_minutes': round(moving / 60, 1),
+        'pace_min_per_km': _pace(moving, meters),
+        'gap_min_per_km': _pace(moving, gap_meters),
+        'average_heart_rate': round(float((d['heart_rate'] * d['dt']).sum()) / hr_seconds) if hr_seconds else None,
+        'max_heart_rate': int(d['heart_rate'].max()) if has_hr.any() else None,
+        # Stored cadence is strides per minute; runners quote steps
+        'average_cadence_spm': round(float((d['cadence'] * d['dt']).sum()) / cadence_seconds * 2)
+            if cadence_seconds else None,
+        'elevation_gain_m': round(float(d['climb'].sum()), 1),
+        'decoupling_percent': decoupling(d),
+        'hr_zone_minutes': hr_zones(d, max_hr),
+        'splits': splits(d),
+    }
+
+def process_activity(activity, file=None, streams_dir=None, max_hr=None):
+    """Ingest the activity's file (if any) and compute its metrics"""
+    activity = activity.get('data', activity) if isinstance(activity, dict) else {}
+    file = file or _first(activity, FILE_FIELDS)
+    activity_id = _first(activity, ID_FIELDS)
+    max_hr = max_hr or _first(activity, MAX_HR_FIELDS, DEFAULT_MAX_HR)
+
+    if file and streams_dir:
+        stream = ingest(file, streams_dir, activity_id)
+    elif file:
+        stream = ActivityStream.from_file(file)
+    elif streams_dir and activity_id is not None and (Path(streams_dir) / str(activity_id)).is_dir():
+        stream = ActivityStream.load(Path(streams_dir) / str(activity_id))
+    else:
+        return {"status": "success", "activity_id": activity_id, "streams": False,
+                "message": "No activity file to ingest"}
+
+    return {"status": "success", "streams": True, **activity_metrics(stream, float(max_hr))}
 
 def main():
     try:
-        data = json.load(sys.stdin) if not sys.stdin.isatty() else {}
-        # Implement your logic here
-        result = {"status": "success", "message": "Processing complete"}
+        args = sys.argv[1:]
+        options = dict(zip(args[::2], args[1::2]))
+        text = sys.stdin.read() if not sys.stdin.isatty() else ''
+        data = json.loads(text) if text.strip() else {}
+        result = process_activity(data, options.get('--file'), options.get('--streams'),
+                                  options.get('--max-hr'))
         print(json.dumps(result, indent=2))
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
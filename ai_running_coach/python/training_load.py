@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Training Load
+Acute:chronic workload engine over the activity store. Daily load is the
+distance run that day (km); from it:
+
+  acute    exponentially weighted 7-day load  (lambda = 2 / (7 + 1))
+  chronic  exponentially weighted 28-day load (lambda = 2 / (28 + 1))
+  acwr     acute / chronic
+  monotony mean / standard deviation of the last 7 daily loads
+  strain   last 7 days' load * monotony
+
+Days without an activity count as zero load. Metrics are taken as of the day
+of the latest activity.
+
+With --store the state is persisted next to the store (training_load.json)
+and activities appended since the last run are folded in one day at a time,
+O(1) each. --full (or an activity dated before the last one) recomputes it
+from the daily series, which is vectorized over the full history, as is
+--daily.
+
+Usage: training_load.py --store <dir> [--full]    (current metrics)
+       training_load.py --store <dir> --daily     (per-day series, backfill)
+       training_load.py                           (activities as a JSON array or JSON Lines on stdin)
+"""
+
+import sys
+import json
+from datetime import timedelta
+
+import numpy as np
+
+from activity_store import ActivityStore, EPOCH, as_store, read_state, write_state
+from json_stream import iter_json
+
+STATE_FILE = 'training_load.json'
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+ACUTE_LAMBDA = 2 / (ACUTE_DAYS + 1)
+CHRONIC_LAMBDA = 2 / (CHRONIC_DAYS + 1)
+MONOTONY_DAYS = 7
+# Identical loads every day of the week: standard deviation 0
+MONOTONY_CAP = 10.0
+
+# Days per block in the vectorized EWMA; decay**-BLOCK must stay well inside float range
+BLOCK = 128
+
+def _ewma(loads, lam):
+    """EWMA of a daily series, starting from 0: e[t] = lam * x[t] + (1 - lam) * e[t-1].
+    Within each block e[k] = r**(k+1) * (carry + lam * cumsum(x[i] * r**-(i+1))),
+    so only the carry between blocks is sequential."""
+    decay = 1.0 - lam
+    out = np.empty(len(loads))
+    powers = decay ** np.arange(1, BLOCK + 1)
+    carry = 0.0
+    for start in range(0, len(loads), BLOCK):
+        block = loads[start:start + BLOCK]
+        grow = powers[:len(block)]
+        out[start:start + len(block)] = grow * (carry + lam * np.cumsum(block / grow))
+        carry = out[start + len(block) - 1]
+    return out
+
+def _date(day):
+    return str(EPOCH + timedelta(days=day))
+
+def _monotony(mean, sd):
+    if sd > 1e-9:
+        return mean / sd
+    return MONOTONY_CAP if mean > 0 else 0.0
+
+def daily_loads(store):
+    """(first day, load per day from the first to the last dated activity)"""
+    dated = store.date >= 0
+    days = store.date[dated]
+    if len(days) == 0:
+        return None, np.zeros(0)
+    first = int(days.min())
+    return first, np.bincount(days - first, weights=store.distance[dated])
+
+def daily_metrics(store):
+    """Every metric for every day of the history, vectorized"""
+    first, loads = daily_loads(store)
+    acute = _ewma(loads, ACUTE_LAMBDA)
+    chronic = _ewma(loads, CHRONIC_LAMBDA)
+
+    # Rolling 7-day sums from cumulative sums (the first days see a shorter window of zeros)
+    padded = np.concatenate([np.zeros(MONOTONY_DAYS), loads])
+    sums = np.cumsum(padded)
+    squares = np.cumsum(padded * padded)
+    week = sums[MONOTONY_DAYS:] - sums[:-MONOTONY_DAYS]
+    week_squares = squares[MONOTONY_DAYS:] - squares[:-MONOTONY_DAYS]
+    mean = week / MONOTONY_DAYS
+    sd = np.sqrt(np.clip(week_squares / MONOTONY_DAYS - mean * mean, 0, None))
+    monotony = np.where(sd > 1e-9, mean / np.where(sd > 1e-9, sd, 1),
+                        np.where(mean > 0, MONOTONY_CAP, 0.0))
+
+    return {
+        'first_day': first,
+        'load': loads,
+        'acute': acute,
+        'chronic': chronic,
+        'acwr': np.divide(acute, chronic, out=np.zeros(len(loads)), where=chronic > 0),
+        'monotony': monotony,
+        'strain': week * monotony,
+    }
+
+def load_metrics(day, history_days, acute, chronic, week):
+    """Metrics as of <day>, given the EWMAs and the last 7 daily loads"""
+    week = np.asarray(week, dtype=np.float64)
+    monotony = _monotony(float(week.mean()), float(week.std()))
+    return {
+        'date': _date(day) if day is not None else None,
+        'history_days': history_days,
+        'acute_load': round(acute, 2),
+        'chronic_load': round(chronic, 2),
+        'acwr': round(acute / chronic, 2) if chronic > 0 else None,
+        'monotony': round(monotony, 2),
+        'strain': round(float(week.sum()) * monotony, 1),
+        'weekly_distance': round(float(week.sum()), 1),
+    }
+
+class TrainingLoad:
+    """Streaming state: EWMAs up to the day before the latest activity day,
+    that day's load so far and the last 7 daily loads"""
+
+    def __init__(self, origin=None):
+        self.origin = origin
+        self.count = 0          # store rows folded in
+        self.day = None         # latest activity day (days since the epoch)
+        self.days = 0           # days of history up to and including it
+        self.today = 0.0        # load on that day
+        self.acute_before = 0.0
+        self.chronic_before = 0.0
+        self.window = [0.0] * MONOTONY_DAYS
+
+    @classmethod
+    def full(cls, store, origin=None):
+        """Recompute from the vectorized daily series"""
+        state = cls(origin)
+        state.count = len(store)
+        first, loads = daily_loads(store)
+        if first is None:
+            return state
+        state.day = first + len(loads) - 1
+        state.days = len(loads)
+        state.today = float(loads[-1])
+        if len(loads) > 1:
+            state.acute_before = float(_ewma(loads[:-1], ACUTE_LAMBDA)[-1])
+            state.chronic_before = float(_ewma(loads[:-1], CHRONIC_LAMBDA)[-1])
+        state.window = ([0.0] * MONOTONY_DAYS + loads[-MONOTONY_DAYS:].tolist())[-MONOTONY_DAYS:]
+        return state
+
+    def add(self, day, load):
+        """Fold in one activity; returns False if it predates the latest day"""
+        if day < 0:
+            return True
+        if self.day is None:
+            self.day, self.days = day, 1
+        elif day < self.day:
+            return False
+        elif day > self.day:
+            gap = day - self.day
+            # Close the latest day, then decay through the gap days without load
+            self.acute_before = self.acute() * (1 - ACUTE_LAMBDA) ** (gap - 1)
+            self.chronic_before = self.chronic() * (1 - CHRONIC_LAMBDA) ** (gap - 1)
+            self.window = (self.window + [0.0] * min(gap, MONOTONY_DAYS))[-MONOTONY_DAYS:]
+            self.day, self.today = day, 0.0
+            self.days += gap
+        self.today += load
+        self.window[-1] += load
+        return True
+
+    def update(self, store):
+        """Fold in rows appended since these stats were taken; None if one of
+        them is out of order and a full recompute is needed"""
+        for index in range(self.count, len(store)):
+            if not self.add(int(store.date[index]), float(store.distance[index])):
+                return None
+            self.count += 1
+        return self
+
+    def acute(self):
+        return ACUTE_LAMBDA * self.today + (1 - ACUTE_LAMBDA) * self.acute_before
+
+    def chronic(self):
+        return CHRONIC_LAMBDA * self.today + (1 - CHRONIC_LAMBDA) * self.chronic_before
+
+    def metrics(self):
+        return load_metrics(self.day, self.days, self.acute(), self.chronic(), self.window)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        for name in vars(state):
+            setattr(state, name, data[name])
+        return state
+
+def load_state(store_dir, store, full=False):
+    """Persisted state brought up to date with the store, recomputing in full
+    on request, when the store was rebuilt or when activities arrive out of order"""
+    origin = ActivityStore.origin(store_dir)
+
+    state = None
+    if not full:
+        try:
+            state = TrainingLoad.from_dict(read_state(store_dir, STATE_FILE))
+        except (TypeError, KeyError):
+            state = None
+    if state is None or state.origin != origin or state.count > len(store):
+        state = None
+    elif state.count == len(store):
+        return state
+    else:
+        state = state.update(store)
+    if state is None:
+        state = TrainingLoad.full(store, origin)
+
+    write_state(store_dir, STATE_FILE, state.to_dict())
+    return state
+
+def training_load(activities):
+    """Current metrics for a list of activities or an ActivityStore"""
+    return TrainingLoad.full(as_store(activities)).metrics()
+
+if __name__ == "__main__":
+    try:
+        if len(sys.argv) > 2 and sys.argv[1] == '--store':
+            store = ActivityStore.load(sys.argv[2])
+            if '--daily' in sys.argv[3:]:
+                series = daily_metrics(store)
+                first = series.pop('first_day')
+                result = [{'date': _date(first + i),
+                           **{name: round(float(values[i]), 2) for name, values in series.items()}}
+                          for i in range(len(series['load']))]
+            else:
+                result = load_state(sys.argv[2], store, full='--full' in sys.argv[3:]).metrics()
+        else:
+            result = training_load(iter_json(sys.stdin))
+        print(json.dumps(result, indent=2))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(1)
@@ -1,17 +1,364 @@
 #!/usr/bin/env python3
 """
 Update Training Progress
-Placeholder - Implement specific logic as needed
+Joins the current training plan's workouts with the activities actually
+run, by date, and reports per-workout compliance and weekly adherence.
+
+Plans come in either shape the knowledge base holds: generate_training_plan
+output ({"workouts": [{"date", "type", "distance_km", "pace"}]}) or the
+TrainingPlan schema ({"start_date", "weeks": [{"days": [{"day_of_week",
+"workout_type", "distance_km", "duration_minutes", "pace_target"}]}]}).
+Rest, strength and cross-training days are not matched.
+
+An activity goes to a run planned the same day, adding to it if it is
+already matched (e.g. a warm-up recorded separately); else to the nearest
+unmatched run planned up to MATCH_DAYS either side (a workout moved a
+day); else it is unplanned.
+
+Compliance per workout (0-100) averages, for whatever the plan specifies:
+  distance   actual / planned km
+  duration   actual / planned minutes
+  intensity  average pace against a pace target, or average heart rate
+             against the zone or the band for the workout type
+each full marks within TOLERANCE of the target, falling to 0 at MISS.
+
+With --store the parsed plan, the matches and each matched workout's
+compliance are persisted next to the store (training_progress.json); only
+activities appended since the last run are joined, by date lookup, and only
+the workouts they land on are re-scored. A new plan, max HR or rebuilt
+store starts over.
+
+Usage: update_training_progress.py --store <dir> [--full] [--max-hr <bpm>]   (training plan on stdin)
+       update_training_progress.py                 ({"training_plan", "activities"} on stdin)
 """
 
 import sys
 import json
+import hashlib
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+import numpy as np
+
+from activity_store import ActivityStore, EPOCH, as_store, read_state, write_state
+from process_activity import DEFAULT_MAX_HR, HR_ZONES
+
+STATE_FILE = 'training_progress.json'
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+# TrainingPlan schema workout types that are runs, and the kind of run
+RUN_TYPES = {'easy_run': 'easy', 'long_run': 'long', 'tempo_run': 'tempo',
+             'interval_run': 'interval', 'recovery_run': 'recovery'}
+# Average heart rate band per kind of run, as a fraction of max HR
+INTENSITY_BANDS = {
+    'recovery': (0.0, 0.72),
+    'easy': (0.0, 0.79),
+    'long': (0.0, 0.82),
+    'tempo': (0.80, 0.90),
+    'interval': (0.84, 1.0),
+}
+
+MATCH_DAYS = 1
+TOLERANCE = 0.10
+MISS = 0.50
+# Workouts at or above this compliance count as completed
+COMPLETED = 80
+
+def _day(value):
+    try:
+        return (date.fromisoformat(str(value)[:10]) - EPOCH).days
+    except (TypeError, ValueError):
+        return None
+
+def _date(day):
+    return str(EPOCH + timedelta(days=day))
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _pace_target(text):
+    """min/km from '6:00 min/km', '5:30/km', '5.5' or the middle of '4:50-5:00/km', else None"""
+    text = str(text or '').strip().split()[0].split('/')[0] if text else ''
+    paces = []
+    try:
+        for part in text.split('-'):
+            if ':' in part:
+                minutes, seconds = part.split(':')
+                paces.append(int(minutes) + int(seconds) / 60)
+            else:
+                paces.append(float(part))
+    except ValueError:
+        return None
+    return sum(paces) / len(paces) if paces else None
+
+def _zone(text):
+    """Zone number from 'Zone 2' / 'Z2', else None"""
+    digits = ''.join(ch for ch in str(text or '') if ch.isdigit())
+    lowered = str(text or '').lower()
+    if digits and ('zone' in lowered or lowered.startswith('z')) and 1 <= int(digits) <= len(HR_ZONES):
+        return int(digits)
+    return None
+
+def _workout(day, week, kind, distance, duration, target):
+    return {'day': day, 'week': week, 'kind': kind,
+            'distance_km': _number(distance) or None, 'duration_minutes': _number(duration) or None,
+            'pace_target': _pace_target(target) if _zone(target) is None else None, 'zone': _zone(target)}
+
+def planned_workouts(plan):
+    """Runs in the plan as a list sorted by day"""
+    plan = plan.get('data', plan) if isinstance(plan, dict) else {}
+    workouts = []
+
+    for workout in plan.get('workouts') or []:
+        day = _day(workout.get('date'))
+        kind = str(workout.get('type', 'easy'))
+        if day is None or kind in ('rest', 'strength', 'cross_training'):
+            continue
+        target = workout.get('pace_target')
+        if target is None and workout.get('pace') not in INTENSITY_BANDS:
+            target = workout.get('pace')
+        workouts.append(_workout(day, workout.get('week_number'), RUN_TYPES.get(kind, kind),
+                                 workout.get('distance_km'), workout.get('duration_minutes'), target))
+
+    # generate_training_plan's "weeks" is just the count
+    start, weeks = _day(plan.get('start_date')), plan.get('weeks')
+    for week in weeks if isinstance(weeks, list) else []:
+        number = week.get('week_number', 1)
+        for workout in week.get('days') or []:
+            kind = RUN_TYPES.get(workout.get('workout_type'))
+            if kind is None:
+                continue
+            day = _day(workout.get('date'))
+            if day is None and start is not None and workout.get('day_of_week') in WEEKDAYS:
+                # The first date in that plan week falling on that weekday
+                week_start = start + 7 * (number - 1)
+                weekday = (EPOCH + timedelta(days=week_start)).weekday()
+                day = week_start + (WEEKDAYS.index(workout['day_of_week']) - weekday) % 7
+            if day is not None:
+                workouts.append(_workout(day, number, kind, workout.get('distance_km'),
+                                         workout.get('duration_minutes'), workout.get('pace_target')))
+
+    workouts.sort(key=lambda w: w['day'])
+    return workouts
+
+def plan_fingerprint(plan):
+    plan = plan.get('data', plan) if isinstance(plan, dict) else {}
+    return hashlib.blake2b(json.dumps(plan, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+def _score(deviation):
+    """1 within TOLERANCE of the target (as a fraction), 0 from MISS on"""
+    return max(0.0, min(1.0, 1 - (abs(deviation) - TOLERANCE) / (MISS - TOLERANCE)))
+
+class Progress:
+    """Streaming join state: what was run against each planned workout"""
+
+    def __init__(self, plan=None, origin=None, max_hr=DEFAULT_MAX_HR, workouts=None):
+        self.plan = plan        # plan fingerprint
+        self.origin = origin    # activity store origin
+        self.max_hr = max_hr
+        self.workouts = workouts or []
+        self.count = 0          # store rows folded in
+        self.latest_day = None
+        self.actual = {}        # workout index -> summed actuals
+        self.results = {}       # workout index -> workout_compliance
+        self.unplanned = 0
+
+    def add(self, days, activity_id, day, distance, duration, pace, heart_rate):
+        """Match one activity; <days> is the sorted list of workout days.
+        Returns the index of the workout it went to, if any."""
+        if day < 0:
+            return None
+        self.latest_day = day if self.latest_day is None else max(self.latest_day, day)
+        lo, hi = bisect_left(days, day - MATCH_DAYS), bisect_right(days, day + MATCH_DAYS)
+        nearby = sorted(range(lo, hi), key=lambda i: (abs(days[i] - day), days[i] - day))
+        same_day = [i for i in nearby if days[i] == day]
+        free = [i for i in nearby if str(i) not in self.actual]
+        if not nearby or (not same_day and not free):
+            self.unplanned += 1
+            return None
+        target = ([i for i in same_day if i in free] or same_day or free)[0]
+
+        actual = self.actual.setdefault(str(target), {'activity_ids': [], 'distance_km': 0.0, 'duration_minutes': 0.0,
+                                                      'paced_km': 0.0, 'pace_km': 0.0, 'hr_minutes': 0.0,
+                                                      'hr_sum': 0.0})
+        actual['activity_ids'].append(activity_id)
+        actual['distance_km'] += distance
+        actual['duration_minutes'] += duration
+        if pace > 0 and distance > 0:
+            actual['paced_km'] += distance
+            actual['pace_km'] += pace * distance
+        if heart_rate > 0:
+            # Time-weighted when durations are known, else one unit per activity
+            weight = duration if duration > 0 else 1.0
+            actual['hr_minutes'] += weight
+            actual['hr_sum'] += heart_rate * weight
+        return target
+
+    def update(self, store):
+        """Match the store rows not yet folded in and re-score the workouts they went to"""
+        days = [w['day'] for w in self.workouts]
+        new = np.asarray(store.date[self.count:])
+        dated = new[new >= 0]
+        if len(dated):
+            latest = int(dated.max())
+            self.latest_day = latest if self.latest_day is None else max(self.latest_day, latest)
+
+        # Only activities within MATCH_DAYS of a workout need matching one by one
+        near = np.zeros(len(new), dtype=bool)
+        if days:
+            plan_days = np.asarray(days)
+            after = np.searchsorted(plan_days, new - MATCH_DAYS)
+            near = (after < len(plan_days)) & (plan_days[np.minimum(after, len(plan_days) - 1)] <= new + MATCH_DAYS)
+            near &= new >= 0
+        self.unplanned += int((~near & (new >= 0)).sum())
+
+        touched = set()
+        for i in (np.flatnonzero(near) + self.count).tolist():
+            touched.add(self.add(days, int(store.activity_id[i]), int(store.date[i]), float(store.distance[i]),
+                                 float(store.duration[i]), float(store.pace[i]), float(store.heart_rate[i])))
+        touched.discard(None)
+        for i in touched:
+            self.results[str(i)] = workout_compliance(self.workouts[i], self.actual[str(i)], self.max_hr)
+        self.count = len(store)
+        return self
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        progress = cls()
+        for name in vars(progress):
+            setattr(progress, name, data[name])
+        return progress
+
+def workout_compliance(workout, actual, max_hr=DEFAULT_MAX_HR):
+    """Deviations and compliance (0-100) of what was run against a planned workout"""
+    result = {'date': _date(workout['day']), 'week': workout['week'], 'type': workout['kind'],
+              'planned': {name: workout[name] for name in ('distance_km', 'duration_minutes')
+                          if workout[name] is not None}}
+    result['actual'] = {'distance_km': round(actual['distance_km'], 2),
+                        'duration_minutes': round(actual['duration_minutes'], 1),
+                        'activity_ids': actual['activity_ids']}
+    scores, deviations = [], {}
+
+    for name in ('distance_km', 'duration_minutes'):
+        if workout[name] and actual[name] > 0:
+            deviation = actual[name] / workout[name] - 1
+            deviations[name.split('_')[0]] = round(deviation * 100, 1)
+            scores.append(_score(deviation))
+
+    pace = actual['pace_km'] / actual['paced_km'] if actual['paced_km'] else None
+    heart_rate = actual['hr_sum'] / actual['hr_minutes'] if actual['hr_minutes'] else None
+    intensity = None
+    if workout['pace_target'] and pace:
+        # Positive: slower than the target
+        intensity = {'metric': 'pace', 'target': round(workout['pace_target'], 2), 'actual': round(pace, 2),
+                     'deviation': pace / workout['pace_target'] - 1}
+    elif heart_rate:
+        if workout['zone']:
+            zone = workout['zone']
+            low, high = HR_ZONES[zone - 1], HR_ZONES[zone] if zone < len(HR_ZONES) else 1.0
+        else:
+            low, high = INTENSITY_BANDS.get(workout['kind'], INTENSITY_BANDS['easy'])
+        low, high = low * max_hr, high * max_hr
+        bound = low if heart_rate < low else high if heart_rate > high else heart_rate
+        intensity = {'metric': 'heart_rate', 'target': [round(low), round(high)], 'actual': round(heart_rate),
+                     'deviation': heart_rate / bound - 1}
+    if intensity:
+        scores.append(_score(intensity['deviation']))
+        intensity['deviation'] = round(intensity['deviation'] * 100, 1)
+        deviations['intensity'] = intensity
+
+    result['deviation_percent'] = deviations
+    result['compliance'] = round(sum(scores) / len(scores) * 100) if scores else 100
+    result['status'] = 'completed' if result['compliance'] >= COMPLETED else 'partial'
+    return result
+
+def progress_report(progress, as_of=None, recent=7):
+    """Weekly adherence over the plan so far, and the <recent> latest matched workouts"""
+    if as_of is None:
+        as_of = progress.latest_day if progress.latest_day is not None else (date.today() - EPOCH).days
+    workouts = progress.workouts
+    matched = {int(i): result for i, result in progress.results.items()}
+
+    weeks = {}
+    for i, workout in enumerate(workouts):
+        week = weeks.setdefault(workout['week'], {'week': workout['week'], 'planned': 0, 'due': 0, 'completed': 0,
+                                                  'partial': 0, 'missed': 0, 'planned_km': 0.0,
+                                                  'actual_km': 0.0, 'compliance_sum': 0})
+        week['planned'] += 1
+        week['planned_km'] += workout['distance_km'] or 0
+        if i in matched:
+            week['due'] += 1
+            week[matched[i]['status']] += 1
+            week['actual_km'] += matched[i]['actual']['distance_km']
+            week['compliance_sum'] += matched[i]['compliance']
+        elif workout['day'] < as_of:
+            week['due'] += 1
+            week['missed'] += 1
+
+    weekly = []
+    for week in weeks.values():
+        if not week['due']:
+            continue
+        total = week.pop('compliance_sum')
+        week['adherence_percent'] = round(week['completed'] / week['due'] * 100)
+        week['compliance'] = round(total / week['due'])
+        week['planned_km'], week['actual_km'] = round(week['planned_km'], 1), round(week['actual_km'], 1)
+        weekly.append(week)
+
+    due = sum(week['due'] for week in weekly)
+    return {
+        'as_of': _date(as_of),
+        'planned_workouts': len(workouts),
+        'due_workouts': due,
+        'completed': sum(week['completed'] for week in weekly),
+        'missed': sum(week['missed'] for week in weekly),
+        'unplanned_activities': progress.unplanned,
+        'adherence_percent': round(sum(week['completed'] for week in weekly) / due * 100) if due else None,
+        'compliance': round(sum(week['compliance'] * week['due'] for week in weekly) / due) if due else None,
+        'weeks': weekly,
+        'recent_workouts': [matched[i] for i in sorted(matched)[-recent:]],
+    }
+
+def load_progress(store_dir, store, plan, full=False, max_hr=DEFAULT_MAX_HR):
+    """Persisted join state brought up to date with the store and plan"""
+    origin, fingerprint = ActivityStore.origin(store_dir), plan_fingerprint(plan)
+    progress = None
+    if not full:
+        try:
+            progress = Progress.from_dict(read_state(store_dir, STATE_FILE))
+        except (TypeError, KeyError):
+            progress = None
+    if (progress is None or progress.plan != fingerprint or progress.origin != origin
+            or progress.max_hr != max_hr or progress.count > len(store)):
+        progress = Progress(fingerprint, origin, max_hr, planned_workouts(plan))
+    elif progress.count == len(store):
+        return progress
+
+    progress.update(store)
+    write_state(store_dir, STATE_FILE, progress.to_dict())
+    return progress
+
+def update_training_progress(plan, activities, max_hr=DEFAULT_MAX_HR):
+    """Compliance report for a plan and a list of activities or an ActivityStore"""
+    return progress_report(Progress(max_hr=max_hr, workouts=planned_workouts(plan)).update(as_store(activities)))
 
 def main():
     try:
+        args = sys.argv[1:]
+        max_hr = float(args[args.index('--max-hr') + 1]) if '--max-hr' in args else DEFAULT_MAX_HR
         data = json.load(sys.stdin) if not sys.stdin.isatty() else {}
-        # Implement your logic here
-        result = {"status": "success", "message": "Processing complete"}
+        if '--store' in args:
+            store_dir = args[args.index('--store') + 1]
+            progress = load_progress(store_dir, ActivityStore.load(store_dir), data, '--full' in args, max_hr)
+            result = progress_report(progress)
+        else:
+            result = update_training_progress(data.get('training_plan', {}), data.get('activities', []), max_hr)
         print(json.dumps(result, indent=2))
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
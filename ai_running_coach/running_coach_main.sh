@@ -14,6 +14,10 @@ export LOGS_DIR="${PROJECT_ROOT}/logs"
 export CONFIG_DIR="${PROJECT_ROOT}/config"
 export PID_DIR="${PROJECT_ROOT}/pids"
 
+# Agents whose replicas split the work (consumer groups, claimed files); the
+# others read on per-replica cursors, so every replica would handle every message
+SCALABLE_AGENTS="training_planner data_analysis"
+
 # Colors
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -66,6 +70,18 @@ init_config() {
         "name": "AI Running Coach",
         "version": "1.0.0",
         "data_bus_poll_interval": 2,
+        "data_bus_backend": "file",
+        "data_bus_segment_bytes": 1048576,
+        "data_bus_lease_seconds": 60,
+        "data_bus_max_deliveries": 5,
+        "data_bus_backpressure_limit": 500,
+        "data_bus_backpressure_wait": 5,
+        "data_bus_wakeups": true,
+        "knowledge_base_backend": "file",
+        "knowledge_base_write_behind": false,
+        "knowledge_base_flush_interval": 2,
+        "knowledge_base_flush_batch": 100,
+        "knowledge_base_fsync": "none",
         "max_message_age_seconds": 3600
     },
     "agents": {
@@ -78,7 +94,12 @@ init_config() {
         "training_planner": {"enabled": true, "priority": 4},
         "strength_coach": {"enabled": true, "priority": 4},
         "injury_prevention": {"enabled": true, "priority": 4},
-        "nutritionist": {"enabled": true, "priority": 4}
+        "nutritionist": {"enabled": true, "priority": 4},
+        "archive_compactor": {"enabled": true, "priority": 5}
+    },
+    "storage": {
+        "data_retention_days": 90,
+        "archive_compaction_interval_seconds": 300
     }
 }
 EOF
@@ -110,6 +131,7 @@ init_agents() {
         "strength_coach_agent.sh"
         "injury_prevention_agent.sh"
         "nutritionist_agent.sh"
+        "archive_compactor_agent.sh"
     )
     
     local missing=0
@@ -128,10 +150,17 @@ init_agents() {
     fi
 }
 
-# Start an agent
+# Start an agent, or an extra replica of it when an instance number is given
 start_agent() {
     local agent_name=$1
+    local instance=$2
     local agent_script="${AGENTS_DIR}/${agent_name}_agent.sh"
+    
+    # Replicas keep their own pid file and log; inside the agent AGENT_INSTANCE
+    # makes CONSUMER_ID unique (see claim_messages in lib/databus.sh)
+    if [ -n "${instance}" ]; then
+        agent_name="${agent_name}.${instance}"
+    fi
     local pid_file="${PID_DIR}/${agent_name}.pid"
     
     if [ -f "${pid_file}" ]; then
@@ -148,11 +177,33 @@ start_agent() {
     fi
     
     log "Starting agent: ${agent_name}"
-    nohup bash "${agent_script}" > "${LOGS_DIR}/${agent_name}.log" 2>&1 &
+    AGENT_INSTANCE="${instance}" nohup bash "${agent_script}" > "${LOGS_DIR}/${agent_name}.log" 2>&1 &
     echo $! > "${pid_file}"
     log "Agent ${agent_name} started (PID: $(cat ${pid_file}))"
 }
 
+# Start the persistent Python helper server used by run_python_helper
+start_helper_server() {
+    local pid_file="${PID_DIR}/helper_server.pid"
+    
+    if [ -f "${pid_file}" ] && ps -p "$(cat ${pid_file})" > /dev/null 2>&1; then
+        warning "Helper server is already running (PID: $(cat ${pid_file}))"
+        return 0
+    fi
+    
+    log "Starting helper server"
+    nohup python3 "${PROJECT_ROOT}/python/helper_server.py" > "${LOGS_DIR}/helper_server.log" 2>&1 &
+    echo $! > "${pid_file}"
+    
+    # Give it a moment to preload helpers; agents fall back to python3 until the socket appears
+    local waited=0
+    while [ ! -S "${PID_DIR}/helper_server.sock" ] && [ ${waited} -lt 50 ]; do
+        sleep 0.1
+        waited=$((waited + 1))
+    done
+    log "Helper server started (PID: $(cat ${pid_file}))"
+}
+
 # Stop an agent
 stop_agent() {
     local agent_name=$1
@@ -180,10 +231,48 @@ stop_agent() {
     fi
 }
 
+# Run <count> replicas of an agent: the primary plus instances 2..count
+scale_agent() {
+    local agent_name=$1
+    local count=$2
+    
+    if [ -z "${agent_name}" ] || ! [[ "${count}" =~ ^[1-9][0-9]*$ ]]; then
+        error "Usage: $0 scale <agent> <replicas>"
+        return 1
+    fi
+    
+    if [ "${count}" -gt 1 ] && [[ " ${SCALABLE_AGENTS} " != *" ${agent_name} "* ]]; then
+        error "Agent ${agent_name} does not share its work between replicas (scalable: ${SCALABLE_AGENTS// /, })"
+        return 1
+    fi
+    
+    start_agent "${agent_name}"
+    
+    local instance
+    for ((instance = 2; instance <= count; instance++)); do
+        start_agent "${agent_name}" "${instance}"
+    done
+    
+    # Stop replicas above the new count
+    local pid_file
+    for pid_file in "${PID_DIR}/${agent_name}".*.pid; do
+        [ -f "${pid_file}" ] || continue
+        instance=$(basename "${pid_file}" .pid)
+        instance="${instance##*.}"
+        if [ "${instance}" -gt "${count}" ]; then
+            stop_agent "${agent_name}.${instance}"
+        fi
+    done
+    
+    log "Agent ${agent_name} scaled to ${count} replica(s)"
+}
+
 # Start all agents
 start_all() {
     log "Starting all agents..."
     
+    start_helper_server
+    
     start_agent "orchestrator"
     sleep 1
     
@@ -200,6 +289,7 @@ start_all() {
     start_agent "strength_coach"
     start_agent "injury_prevention"
     start_agent "nutritionist"
+    start_agent "archive_compactor"
     
     log "All agents started"
     sleep 2
@@ -240,6 +330,8 @@ status() {
         "strength_coach:Strength Coach"
         "injury_prevention:Injury Prevention"
         "nutritionist:Nutritionist"
+        "archive_compactor:Archive Compactor"
+        "helper_server:Python Helper Server"
     )
     
     for agent_info in "${agents[@]}"; do
@@ -251,7 +343,12 @@ status() {
         if [ -f "${pid_file}" ]; then
             local pid=$(cat "${pid_file}")
             if ps -p "${pid}" > /dev/null 2>&1; then
-                echo -e "${GREEN}● RUNNING${NC} (PID: ${pid})"
+                local replicas=$(ls "${PID_DIR}/${agent}".*.pid 2>/dev/null | wc -l)
+                if [ "${replicas}" -gt 0 ]; then
+                    echo -e "${GREEN}● RUNNING${NC} (PID: ${pid}, +${replicas} replica(s))"
+                else
+                    echo -e "${GREEN}● RUNNING${NC} (PID: ${pid})"
+                fi
                 ((running++))
             else
                 echo -e "${RED}○ STOPPED${NC} (stale PID)"
@@ -268,6 +365,15 @@ status() {
     echo -e "${BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}\n"
 }
 
+# Wake agents watching data_bus/incoming (see watch_channels in lib/databus.sh)
+notify_incoming() {
+    local waiter
+    for waiter in "${DATA_BUS_DIR}/wakeups/incoming"/*; do
+        [ -p "${waiter}" ] || continue
+        printf '1' | dd of="${waiter}" oflag=nonblock status=none 2>/dev/null || true
+    done
+}
+
 # Send message to the system
 send_message() {
     local message="$1"
@@ -279,11 +385,12 @@ send_message() {
     
     info "Sending message to AI Running Coach..."
     echo "${message}" > "${DATA_BUS_DIR}/incoming/user_input.txt"
+    notify_incoming
     
     log "Message sent. Waiting for response..."
     
-    # Wait for response (max 10 seconds)
-    local timeout=10
+    # Wait for response (max 10 seconds, checked every 100ms)
+    local timeout=100
     local elapsed=0
     
     while [ ${elapsed} -lt ${timeout} ]; do
@@ -294,11 +401,11 @@ send_message() {
             echo ""
             return 0
         fi
-        sleep 1
-        ((elapsed++))
+        sleep 0.1
+        elapsed=$((elapsed + 1))
     done
     
-    warning "No response received within ${timeout} seconds"
+    warning "No response received within $((timeout / 10)) seconds"
     echo "Check logs for more details: ./running_coach.sh logs user_interaction"
 }
 
@@ -366,8 +473,8 @@ show_chat_help() {
 cleanup() {
     log "Cleaning up old messages..."
     
-    find "${DATA_BUS_DIR}/channels" -name "*.json" -mmin +60 -delete 2>/dev/null || true
-    find "${DATA_BUS_DIR}/archive" -name "*.json" -mtime +7 -delete 2>/dev/null || true
+    # Expire stale channel messages into the archive, compact it and apply retention
+    python3 "${PROJECT_ROOT}/python/compact_archive.py" --min-age 0 || warning "Archive compaction failed"
     find "${DATA_BUS_DIR}/processed" -name "*.txt" -mmin +60 -delete 2>/dev/null || true
     
     log "Cleanup complete"
@@ -396,6 +503,25 @@ backup_data() {
     else
         error "Backup failed"
     fi
+    
+    # The SQLite knowledge base may be mid-write, so copy it with the online backup API
+    if [ -f "${SHARED_KB_DIR}/knowledge.db" ]; then
+        local db_backup="${backup_dir}/knowledge_$(date +%Y%m%d_%H%M%S).db"
+        sqlite3 "${SHARED_KB_DIR}/knowledge.db" ".backup '${db_backup}'" && log "Knowledge base backup created: ${db_backup}"
+    fi
+}
+
+# Import file-backed knowledge into the SQLite knowledge base
+migrate_knowledge_base() {
+    log "Migrating knowledge base files to SQLite..."
+    (
+        set +e
+        export AGENT_NAME="migration" KB_BACKEND="sqlite"
+        source "${PROJECT_ROOT}/lib/databus.sh"
+        migrate_knowledge_to_sqlite
+    )
+    log "Migration complete: ${SHARED_KB_DIR}/knowledge.db"
+    info "Set \"knowledge_base_backend\": \"sqlite\" in config/system_config.json to use it"
 }
 
 # Run system tests
@@ -427,6 +553,31 @@ view_logs() {
     fi
 }
 
+# Show unhandled messages per channel, consumer and priority
+show_queues() {
+    echo -e "\n${CYAN}━━━ Data Bus Queues ━━━${NC}\n"
+    (
+        set +e
+        export AGENT_NAME="queues"
+        source "${PROJECT_ROOT}/lib/databus.sh"
+        
+        local index_file channel cursor_file consumer
+        for index_file in "${DATA_BUS_DIR}/seq"/*.idx; do
+            [ -f "${index_file}" ] || continue
+            channel=$(basename "${index_file}" .idx)
+            printf "  %-25s %6d published, backlog %d\n" "${channel}" \
+                $(( $(stat -c %s "${index_file}") / SEQ_RECORD_BYTES )) "$(channel_backlog "${channel}")"
+            for cursor_file in "${DATA_BUS_DIR}/cursors/${channel}"/*; do
+                [ -f "${cursor_file}" ] || continue
+                consumer=$(basename "${cursor_file}")
+                printf "    %-23s %s\n" "${consumer}" \
+                    "$(channel_depths "${channel}" "${consumer}" | jq -r '"high \(.high)  normal \(.normal)  low \(.low)"')"
+            done
+        done
+    )
+    echo ""
+}
+
 # Show system info
 show_info() {
     echo -e "\n${CYAN}━━━ System Information ━━━${NC}\n"
@@ -441,6 +592,8 @@ show_info() {
         jq -r '
             "  System: \(.system.name) v\(.system.version)",
             "  Poll Interval: \(.system.data_bus_poll_interval)s",
+            "  Bus Backend: \(.system.data_bus_backend // "file")",
+            "  Knowledge Base Backend: \(.system.knowledge_base_backend // "file")",
             "  Enabled Agents: \([.agents | to_entries[] | select(.value.enabled == true) | .key] | length)"
         ' "${CONFIG_DIR}/system_config.json"
         echo ""
@@ -467,6 +620,12 @@ case "${1}" in
             start_agent "${2}"
         fi
         ;;
+    scale)
+        scale_agent "${2}" "${3}"
+        ;;
+    helper-server)
+        start_helper_server
+        ;;
     stop)
         if [ -z "${2}" ]; then
             stop_all
@@ -495,12 +654,18 @@ case "${1}" in
     backup)
         backup_data
         ;;
+    migrate-kb)
+        migrate_knowledge_base
+        ;;
     test)
         run_tests
         ;;
     logs)
         view_logs "${2}"
         ;;
+    queues)
+        show_queues
+        ;;
     info)
         show_info
         ;;
@@ -522,22 +687,27 @@ EOF
         echo "  stop [agent]      - Stop all agents or a specific agent"
         echo "  restart           - Restart all agents"
         echo "  status            - Show status of all agents"
+        echo "  scale <agent> <n> - Run n replicas of training_planner or data_analysis"
+        echo "  helper-server     - Start only the persistent Python helper server"
         echo ""
         echo -e "${CYAN}Interaction Commands:${NC}"
         echo "  chat              - Start interactive chat mode"
         echo "  send \"message\"    - Send a single message"
         echo ""
         echo -e "${CYAN}Maintenance Commands:${NC}"
-        echo "  cleanup           - Clean old messages from data bus"
+        echo "  cleanup           - Expire, compact and prune data bus messages"
         echo "  backup            - Backup user data"
+        echo "  migrate-kb        - Import knowledge base files into SQLite"
         echo "  logs [agent]      - Show logs (all or specific agent)"
+        echo "  queues            - Show data bus queue depths per priority"
         echo "  test              - Run system tests"
         echo "  info              - Show system information"
         echo ""
         echo -e "${CYAN}Available Agents:${NC}"
         echo "  orchestrator, training_orchestrator, nutrition_orchestrator,"
         echo "  injury_orchestrator, user_interaction, data_analysis,"
-        echo "  training_planner, strength_coach, injury_prevention, nutritionist"
+        echo "  training_planner, strength_coach, injury_prevention, nutritionist,"
+        echo "  archive_compactor"
         echo ""
         exit 1
         ;;
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GarminCollector against the offline replay backend (garmin_replay.py)
+Usage: garmin_sync_benchmark.py [latency_ms] [backfill_days]     (default: 400, 60)
+
+The replay client answers every Garmin Connect call after <latency_ms>
+(jittered), from synthetic history. Times:
+  sequential   - the fetches one after another
+  concurrent   - generate_daily_summary, from an empty activity cache
+  incremental  - generate_daily_summary after one new activity
+  slow_call    - generate_daily_summary with sleep data hanging past the
+                 call timeout
+counting get_activities calls for each, and checks the summaries agree with
+each other (apart from updated_at) and with today's list and weekly totals
+computed the old way, from get_activities(0, 10) and get_activities(0, 50).
+
+Then times authenticate(): a full login (5 round trips), later syncs
+resuming the saved session, and a re-login once the saved tokens have
+expired, reporting the session counters and token file modes.
+
+Then backfills <backfill_days> days at 5 ms a call (backoff shortened to
+10 ms):
+  clean        - no errors
+  flaky        - 10% of calls fail with a 500 and are retried; twice, to
+                 check the replay (and so the retries) is deterministic
+  interrupted  - the same with retries off: rerun until it completes,
+                 resuming from the checkpoint each time
+  rate_limited - the server allows 10 calls in 0.2 s, the backfill asks
+                 for 200 a second: the 429s are retried
+checking each history matches the clean one, and that a replay of the clean
+history serves the same activities.
+
+Exits 1, naming them, if any of these checks fails.
+"""
+
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta, date
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "python"))
+
+import garmin_collector  # noqa: E402
+from garmin_collector import GarminCollector  # noqa: E402
+from garmin_replay import ReplayData, ReplayGarmin  # noqa: E402
+
+BACKFILL_LATENCY = 0.005
+
+def collector_for(client, call_timeout=garmin_collector.CALL_TIMEOUT):
+    # Already logged in: a collector around <client>
+    collector = GarminCollector(client_class=type(client))
+    collector.client = client
+    collector.call_timeout = call_timeout
+    return collector
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return round((time.perf_counter() - start) * 1000, 1), result
+
+def comparable(summary):
+    return {key: value for key, value in summary.items() if key != 'updated_at'}
+
+def legacy(collector, client):
+    """Today's activities and weekly totals as the collector used to get them"""
+    today = date.today().isoformat()
+    recent = client.data.activities
+    week = [a for a in recent[:50] if a['startTimeLocal'][:10] >= garmin_collector.week_start().isoformat()]
+    return {'todays_activities': [collector.extract_essential(a) for a in recent[:10]
+                                  if a['startTimeLocal'][:10] == today],
+            'this_week': collector.get_weekly_summary(week)}
+
+def calls(client, fn):
+    before = client.calls['get_activities']
+    elapsed, result = timed(fn)
+    return elapsed, client.calls['get_activities'] - before, result
+
+def history(directory):
+    return {path.relative_to(directory).as_posix(): json.loads(path.read_text())
+            for path in sorted(Path(directory).glob("*/*/*.json"))}
+
+def backfill(tmp, name, data, since, attempts=1, **options):
+    """Backfill <since> from a replay of <data> into <tmp>/<name>, rerunning
+    up to <attempts> times; elapsed ms, runs, calls and failures, history"""
+    garmin_collector.HISTORY = Path(tmp) / name
+    garmin_collector.BACKFILL_CHECKPOINT = garmin_collector.HISTORY / "backfill_checkpoint.json"
+    client = ReplayGarmin(data=data, latency=BACKFILL_LATENCY, **options)
+    collector = GarminCollector(client_class=lambda email, password: client)
+    collector.token_dir = Path(tmp) / f"{name}_tokens"
+    start = time.perf_counter()
+    for run in range(1, attempts + 1):
+        if collector.backfill(since, rate=200):
+            break
+    elapsed = round((time.perf_counter() - start) * 1000, 1)
+    return {'ms': elapsed, 'runs': run, 'calls': sum(client.calls.values()),
+            'failures': {str(status): count for status, count in sorted(client.failures.items())}}, \
+        history(garmin_collector.HISTORY)
+
+def failed_checks(results):
+    """Names of the correctness checks in <results> that came out false"""
+    backfill = results['backfill']
+    checks = {
+        'identical': results['identical'],
+        'written': results['written'],
+        'matches_legacy': results['matches_legacy'],
+        'incremental_picked_up': results['incremental_picked_up'],
+        'backfill.flaky_deterministic': backfill['flaky_deterministic'],
+        **{f"backfill.matches_clean.{name}": ok for name, ok in backfill['matches_clean'].items()},
+        'backfill.replays_history': backfill['replays_history'],
+    }
+    return [name for name, ok in checks.items() if not ok]
+
+def main():
+    latency = (float(sys.argv[1]) if len(sys.argv) > 1 else 400) / 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    results = {'latency_ms': latency * 1000, 'date': date.today().isoformat()}
+    data = ReplayData.synthetic(365)
+
+    with tempfile.TemporaryDirectory(prefix="garmin_sync_bench_") as tmp:
+        # Keep the real daily_summary.json, activity cache and history out of it
+        garmin_collector.GARMIN_DATA = Path(tmp)
+        garmin_collector.ACTIVITY_CACHE = Path(tmp) / "activities.json"
+        client = ReplayGarmin(data=data, latency=latency)
+        collector = collector_for(client)
+
+        def sequential():
+            return collector.build_summary({name: fetch() for name, fetch in collector.fetches().items()})
+
+        results['sequential_ms'], results['sequential_calls'], expected = calls(client, sequential)
+        results['concurrent_ms'], results['concurrent_calls'], summary = calls(client, collector.generate_daily_summary)
+        results['identical'] = comparable(summary) == comparable(expected)
+        results['written'] = json.loads((Path(tmp) / "daily_summary.json").read_text()) == summary
+        results['matches_legacy'] = {key: summary[key] for key in ('todays_activities', 'this_week')} == \
+            legacy(collector, client)
+
+        newest = dict(data.activities[0], activityId=999, startTimeLocal=datetime.now().isoformat(sep=' ')[:19])
+        data.activities.insert(0, newest)
+        results['incremental_ms'], results['incremental_calls'], summary = calls(client, collector.generate_daily_summary)
+        results['incremental_picked_up'] = '999' in [a['activity_id'] for a in summary['todays_activities']]
+        data.activities.remove(newest)
+
+        garmin_collector.ACTIVITY_CACHE = Path(tmp) / "stuck_activities.json"
+        stuck = collector_for(ReplayGarmin(data=data, latency=latency, latencies={'get_sleep_data': 60}),
+                              call_timeout=latency * 3)
+        results['slow_call_ms'], partial = timed(stuck.generate_daily_summary)
+        results['slow_call_sleep'] = partial['health_metrics']['sleep']
+
+        auth = GarminCollector(client_class=lambda email, password: ReplayGarmin(data=data, latency=latency))
+        auth.token_dir = Path(tmp) / "tokens"
+        results['login_ms'], _ = timed(auth.authenticate)
+        results['resume_ms'] = [timed(auth.authenticate)[0] for _ in range(3)]
+        oauth2 = auth.token_dir / "oauth2_token.json"
+        oauth2.write_text(json.dumps(dict(json.loads(oauth2.read_text()), expires_at=0)))
+        results['expired_ms'], _ = timed(auth.authenticate)
+        results['session_stats'] = json.loads((auth.token_dir / garmin_collector.SESSION_STATS).read_text())
+        results['token_modes'] = {path.name: oct(path.stat().st_mode & 0o777)
+                                  for path in [auth.token_dir, *sorted(auth.token_dir.iterdir())]}
+
+        since = date.today() - timedelta(days=days - 1)
+        garmin_collector.BACKFILL_BACKOFF = 0.01
+        runs = {}
+        runs['clean'], clean = backfill(tmp, 'clean', data, since)
+        runs['flaky'], flaky = backfill(tmp, 'flaky', data, since, error_rate=0.1)
+        repeat, flaky_again = backfill(tmp, 'flaky_again', data, since, error_rate=0.1)
+        garmin_collector.BACKFILL_RETRIES = 0
+        runs['interrupted'], interrupted = backfill(tmp, 'interrupted', data, since, attempts=100, error_rate=0.1)
+        garmin_collector.BACKFILL_RETRIES = 5
+        runs['rate_limited'], rate_limited = backfill(tmp, 'rate_limited', data, since, rate_limit=10,
+                                                      rate_window=0.2)
+        results['backfill'] = {
+            'days': days,
+            'activities': sum(len(day['activities']) for day in clean.values()),
+            **runs,
+            'flaky_deterministic': dict(repeat, ms=None) == dict(runs['flaky'], ms=None) and flaky_again == flaky,
+            'matches_clean': {name: other == clean for name, other in
+                              (('flaky', flaky), ('interrupted', interrupted), ('rate_limited', rate_limited))},
+        }
+        replayed = ReplayGarmin(data=ReplayData.from_history(Path(tmp) / 'clean'), latency=0)
+        served = replayed.get_activities(0, 10_000)
+        results['backfill']['replays_history'] = [a['activityId'] for a in served] == \
+            [a['activityId'] for a in data.activities if a['startTimeLocal'][:10] >= since.isoformat()]
+
+    results['speedup'] = round(results['sequential_ms'] / results['concurrent_ms'], 1)
+    print(json.dumps(results, indent=2))
+
+    failed = failed_checks(results)
+    if failed:
+        print(f"Failed checks: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,25 +3,45 @@
 GarminCollectorAgent - Lightweight daily sync for AI Running Coach
 Collects: today's activities, sleep, health metrics
 Generates: daily_summary.json for agents to consume
+
+Backfill pages through the whole activity, sleep and resting HR history
+since a date, at a limited request rate, into one file per day under
+garmin_data/history/YYYY/MM/. Progress is checkpointed after every page
+and day, so an interrupted backfill picks up where it stopped when rerun.
+
+The Garmin Connect client is pluggable (see GarminClient): GARMIN_BACKEND=live
+(the default) uses garminconnect with the .env credentials, GARMIN_BACKEND=replay
+the offline stand-in in garmin_replay.py, for benchmarks and tests.
+
+Usage: garmin_collector.py                                                   (daily sync)
+       garmin_collector.py backfill --since YYYY-MM-DD [--rate <requests/s>]
 """
 
 import os
 import sys
 import json
 import time
+import threading
+from typing import Protocol
 from datetime import datetime, timedelta, date
 from pathlib import Path
 import logging
 
-from garminconnect import Garmin, GarminConnectAuthenticationError
-from dotenv import load_dotenv
-
 # Setup paths
 PROJECT_ROOT = Path(__file__).parent.parent
 GARMIN_DATA = PROJECT_ROOT / "shared_knowledge_base" / "garmin_data"
 RECENT_CACHE = GARMIN_DATA / "recent_cache"
 AGGREGATES = GARMIN_DATA / "aggregates"
 LOG_DIR = PROJECT_ROOT / "logs"
+# This week's activities as last fetched, plus the high-water mark
+ACTIVITY_CACHE = RECENT_CACHE / "activities.json"
+# Saved Garmin Connect session (OAuth tokens), readable by the owner only;
+# override with GARMIN_TOKEN_DIR
+TOKEN_DIR = PROJECT_ROOT / ".garmin_tokens"
+SESSION_STATS = "session_stats.json"
+# Backfilled history, one JSON file per day, and the resume point
+HISTORY = GARMIN_DATA / "history"
+BACKFILL_CHECKPOINT = HISTORY / "backfill_checkpoint.json"
 
 # Ensure directories exist
 for directory in [GARMIN_DATA, RECENT_CACHE, AGGREGATES, LOG_DIR]:
@@ -38,13 +58,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for each Garmin Connect call, and for the whole sync
+# (login included); override with GARMIN_CALL_TIMEOUT / GARMIN_SYNC_DEADLINE
+CALL_TIMEOUT = 30
+SYNC_DEADLINE = 120
+
+# Activities per get_activities page. Paging stops at the first page reaching
+# back past the high-water mark (the newest start time seen last sync, less
+# LATE_UPLOAD_HOURS for workouts synced to the watch late) or this week's start.
+PAGE_SIZE = 10
+LATE_UPLOAD_HOURS = 24
+# Fields of each activity kept in the cache
+CACHED_FIELDS = ('activityId', 'activityType', 'startTimeLocal', 'distance', 'duration',
+                 'averageHR', 'maxHR', 'calories', 'elevationGain')
+
+# Backfill requests per second (override with --rate or GARMIN_BACKFILL_RATE),
+# activities per page, and retries per request, BACKFILL_BACKOFF seconds
+# doubling each time
+BACKFILL_RATE = 1.0
+BACKFILL_PAGE_SIZE = 100
+BACKFILL_RETRIES = 5
+BACKFILL_BACKOFF = 2.0
+
+# What a fetch stands in for when it fails or runs out of time; None
+# activities means the cached ones
+FETCH_DEFAULTS = {
+    "activities": None,
+    "sleep": None,
+    "resting_hr": None,
+    "weight_kg": None,
+}
+
+
+class GarminClient(Protocol):
+    """What the collector uses of a Garmin Connect client; garminconnect.Garmin
+    and garmin_replay.ReplayGarmin both provide it. Constructed with
+    (email, password); responses are Garmin Connect's raw JSON, and any
+    failure is an exception."""
+    
+    garth: object  # dump(directory) saves the session tokens
+    
+    def login(self, tokenstore=None): ...
+    def get_activities(self, start, limit): ...
+    def get_sleep_data(self, cdate): ...
+    def get_rhr_day(self, cdate): ...
+    def get_stats(self, cdate): ...
+
+
+def client_class_for(backend):
+    """The GarminClient class for GARMIN_BACKEND <backend> ("live" or "replay")"""
+    if backend == "live":
+        from garminconnect import Garmin
+        return Garmin
+    if backend == "replay":
+        from garmin_replay import ReplayGarmin
+        return ReplayGarmin
+    raise ValueError(f"Unknown GARMIN_BACKEND: {backend}")
+
+
+def week_start():
+    return (datetime.now() - timedelta(days=datetime.now().weekday())).date()
+
+
+def start_time(activity):
+    return datetime.fromisoformat(activity.get('startTimeLocal', '').replace('Z', ''))
+
+
+def write_json(path, data):
+    """Write through a temp file so readers never see half a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart"""
+    
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_call = 0
+        
+    def wait(self):
+        now = time.monotonic()
+        if self.next_call > now:
+            time.sleep(self.next_call - now)
+        self.next_call = max(now, self.next_call) + self.interval
+
 
 class GarminCollector:
     """Lightweight Garmin data collector"""
     
-    def __init__(self):
+    def __init__(self, client_class=None):
+        """<client_class> overrides GARMIN_BACKEND; only the live backend
+        needs credentials"""
         self.client = None
-        self.load_credentials()
+        self.backend = os.getenv("GARMIN_BACKEND", "live") if client_class is None else "custom"
+        self.client_class = client_class or client_class_for(self.backend)
+        if self.backend == "live":
+            self.load_credentials()
+        else:
+            self.email = os.getenv("GARMIN_EMAIL")
+            self.password = os.getenv("GARMIN_PASSWORD")
+        self.call_timeout = float(os.getenv("GARMIN_CALL_TIMEOUT", CALL_TIMEOUT))
+        self.sync_deadline = float(os.getenv("GARMIN_SYNC_DEADLINE", SYNC_DEADLINE))
+        self.token_dir = Path(os.getenv("GARMIN_TOKEN_DIR", TOKEN_DIR))
+        self.deadline = None
         
     def load_credentials(self):
         """Load credentials from .env"""
@@ -53,6 +172,7 @@ class GarminCollector:
             logger.error(".env file not found!")
             sys.exit(1)
             
+        from dotenv import load_dotenv
         load_dotenv(env_path)
         self.email = os.getenv("GARMIN_EMAIL")
         self.password = os.getenv("GARMIN_PASSWORD")
@@ -61,37 +181,127 @@ class GarminCollector:
             logger.error("GARMIN_EMAIL and GARMIN_PASSWORD must be set in .env")
             sys.exit(1)
             
+    def count_session(self, kind):
+        """Bump the "logins" or "logins_avoided" counter kept with the tokens"""
+        path = self.token_dir / SESSION_STATS
+        try:
+            stats = json.loads(path.read_text())
+        except (OSError, ValueError):
+            stats = {"logins": 0, "logins_avoided": 0}
+        stats[kind] = stats.get(kind, 0) + 1
+        try:
+            self.token_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            path.write_text(json.dumps(stats))
+        except OSError as e:
+            logger.warning(f"Could not save session stats: {e}")
+        return stats
+        
+    def resume_session(self):
+        """Log in from the saved tokens; False if there are none or they no
+        longer work (e.g. expired or revoked)"""
+        if not self.token_dir.is_dir():
+            return False
+        try:
+            client = self.client_class(self.email, self.password)
+            client.login(str(self.token_dir))
+        except Exception as e:
+            logger.info(f"Saved session not usable ({e}); logging in")
+            return False
+        self.client = client
+        stats = self.count_session("logins_avoided")
+        logger.info(f"✓ Reused saved session (logins avoided: {stats['logins_avoided']}, "
+                    f"logins: {stats['logins']})")
+        return True
+        
+    def save_session(self):
+        """Save the session tokens (refreshed ones too), owner-only"""
+        old_umask = os.umask(0o077)
+        try:
+            self.token_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            self.client.garth.dump(str(self.token_dir))
+            os.chmod(self.token_dir, 0o700)
+            for path in self.token_dir.iterdir():
+                os.chmod(path, 0o600)
+        except Exception as e:
+            logger.warning(f"Could not save session tokens: {e}")
+        finally:
+            os.umask(old_umask)
+            
     def authenticate(self):
-        """Authenticate with Garmin Connect"""
+        """Authenticate with Garmin Connect, reusing the saved session if it still works"""
+        if self.resume_session():
+            return True
         try:
             logger.info("Authenticating with Garmin Connect...")
-            self.client = Garmin(self.email, self.password)
+            self.client = self.client_class(self.email, self.password)
             self.client.login()
-            logger.info("✓ Authentication successful")
+            self.save_session()
+            stats = self.count_session("logins")
+            logger.info(f"✓ Authentication successful (logins: {stats['logins']}, "
+                        f"logins avoided: {stats['logins_avoided']})")
             return True
-        except GarminConnectAuthenticationError as e:
-            logger.error(f"Authentication failed: {e}")
-            return False
         except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            # garminconnect's GarminConnectAuthenticationError among them
+            logger.error(f"Authentication failed ({type(e).__name__}): {e}")
             return False
             
-    def get_todays_activities(self):
-        """Get today's activities"""
+    def load_activity_cache(self):
+        """This week's activities from the last sync, newest first, and the high-water mark"""
         try:
-            activities = self.client.get_activities(0, 10)  # Last 10 activities
-            today = date.today().isoformat()
+            cache = json.loads(ACTIVITY_CACHE.read_text())
+            return {"high_water": cache.get("high_water"), "activities": cache.get("activities", [])}
+        except (OSError, ValueError):
+            return {"high_water": None, "activities": []}
+            
+    def save_activity_cache(self, cache):
+        write_json(ACTIVITY_CACHE, cache)
+        
+    def fetch_activities(self):
+        """The cached activities brought up to date: get_activities pages, newest
+        first, only back to the high-water mark, merged in by activityId and
+        trimmed to this week. A failed page keeps what came before it but
+        leaves the mark where it was, so the next sync fetches the gap."""
+        cache = self.load_activity_cache()
+        since = datetime.combine(week_start(), datetime.min.time())
+        if cache["high_water"]:
+            since = max(since, datetime.fromisoformat(cache["high_water"]["start_time"])
+                        - timedelta(hours=LATE_UPLOAD_HOURS))
             
-            todays_activities = []
-            for activity in activities:
-                activity_date = activity.get('startTimeLocal', '')[:10]
-                if activity_date == today:
-                    todays_activities.append(self.extract_essential(activity))
-                    
-            return todays_activities
+        fetched, complete, pages = [], False, 0
+        try:
+            while True:
+                page = self.client.get_activities(len(fetched), PAGE_SIZE) or []
+                pages += 1
+                fetched.extend(page)
+                if len(page) < PAGE_SIZE or start_time(page[-1]) < since:
+                    complete = True
+                    break
         except Exception as e:
             logger.error(f"Error fetching activities: {e}")
-            return []
+            
+        merged = {activity['activityId']: activity for activity in cache["activities"]}
+        new = sum(1 for activity in fetched if activity.get('activityId') not in merged)
+        for activity in fetched:
+            merged[activity.get('activityId')] = {field: activity.get(field) for field in CACHED_FIELDS
+                                                   if field in activity}
+        this_week = week_start().isoformat()
+        activities = sorted((a for a in merged.values() if a.get('startTimeLocal', '')[:10] >= this_week),
+                            key=lambda a: (a.get('startTimeLocal', ''), str(a.get('activityId'))), reverse=True)
+        
+        high_water = cache["high_water"]
+        if complete and fetched:
+            newest = fetched[0]
+            high_water = {"activity_id": newest.get('activityId'),
+                          "start_time": start_time(newest).isoformat()}
+        logger.info(f"Activities: {new} new of {len(fetched)} fetched in {pages} page(s), "
+                    f"{len(activities)} this week")
+        return {"high_water": high_water, "activities": activities}
+        
+    def get_todays_activities(self, activities):
+        """Today's activities, from the fetched ones"""
+        today = date.today().isoformat()
+        return [self.extract_essential(activity) for activity in activities
+                if activity.get('startTimeLocal', '')[:10] == today]
             
     def extract_essential(self, activity):
         """Extract essential metrics from activity"""
@@ -115,98 +325,127 @@ class GarminCollector:
             "elevation_gain_m": activity.get('elevationGain')
         }
         
+    def sleep_summary(self, sleep):
+        """Essential fields of a night's sleep, or None without one"""
+        if not sleep:
+            return None
+        return {
+            "duration_hours": round(sleep.get('sleepTimeSeconds', 0) / 3600, 1),
+            "quality": sleep.get('sleepQuality', 'unknown'),
+            "deep_sleep_hours": round(sleep.get('deepSleepSeconds', 0) / 3600, 1),
+            "light_sleep_hours": round(sleep.get('lightSleepSeconds', 0) / 3600, 1),
+            "awake_hours": round(sleep.get('awakeTimeSeconds', 0) / 3600, 1)
+        }
+        
     def get_sleep_data(self):
         """Get last night's sleep"""
         try:
-            sleep = self.client.get_sleep_data(date.today().isoformat())
-            if sleep:
-                return {
-                    "duration_hours": round(sleep.get('sleepTimeSeconds', 0) / 3600, 1),
-                    "quality": sleep.get('sleepQuality', 'unknown'),
-                    "deep_sleep_hours": round(sleep.get('deepSleepSeconds', 0) / 3600, 1),
-                    "light_sleep_hours": round(sleep.get('lightSleepSeconds', 0) / 3600, 1),
-                    "awake_hours": round(sleep.get('awakeTimeSeconds', 0) / 3600, 1)
-                }
+            return self.sleep_summary(self.client.get_sleep_data(date.today().isoformat()))
         except Exception as e:
             logger.warning(f"Could not fetch sleep data: {e}")
             return None
             
-    def get_health_metrics(self):
-        """Get today's health metrics"""
-        health = {}
-        
+    def get_resting_hr(self):
+        """Get today's resting heart rate"""
         try:
-            # Resting heart rate
             rhr = self.client.get_rhr_day(date.today().isoformat())
             if rhr:
-                health['resting_hr'] = rhr.get('restingHeartRate')
+                return rhr.get('restingHeartRate')
         except Exception as e:
             logger.warning(f"Could not fetch RHR: {e}")
-            
+        return None
+        
+    def get_weight(self):
+        """Get today's weight from the user stats"""
         try:
-            # Get user stats for weight
             stats = self.client.get_stats(date.today().isoformat())
             if stats:
-                health['weight_kg'] = stats.get('weight')
+                return stats.get('weight')
         except Exception as e:
             logger.warning(f"Could not fetch weight: {e}")
-            
-        return health
+        return None
         
-    def get_weekly_summary(self):
-        """Calculate this week's summary"""
-        try:
-            activities = self.client.get_activities(0, 50)
-            week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).date()
+    def get_health_metrics(self):
+        """Get today's health metrics"""
+        return {"resting_hr": self.get_resting_hr(), "weight_kg": self.get_weight()}
+        
+    def get_weekly_summary(self, activities):
+        """Calculate this week's summary from the fetched activities (all this week's)"""
+        total_distance = sum(a.get('distance') or 0 for a in activities) / 1000
+        total_duration = sum(a.get('duration') or 0 for a in activities) / 3600
+        
+        return {
+            "total_distance_km": round(total_distance, 1),
+            "total_duration_hours": round(total_duration, 1),
+            "activities_completed": len(activities)
+        }
             
-            weekly_activities = []
-            for activity in activities:
-                activity_date = datetime.fromisoformat(
-                    activity.get('startTimeLocal', '').replace('Z', '')
-                ).date()
-                
-                if activity_date >= week_start:
-                    weekly_activities.append(activity)
-                    
-            total_distance = sum(a.get('distance', 0) for a in weekly_activities) / 1000
-            total_duration = sum(a.get('duration', 0) for a in weekly_activities) / 3600
+    def fetches(self):
+        """The independent Garmin Connect calls behind the daily summary"""
+        return {
+            "activities": self.fetch_activities,
+            "sleep": self.get_sleep_data,
+            "resting_hr": self.get_resting_hr,
+            "weight_kg": self.get_weight,
+        }
+        
+    def fetch_concurrently(self, fetches):
+        """Run fetches side by side, each on its own thread. A fetch that takes
+        longer than the call timeout, or runs past the sync deadline, is left
+        behind (its thread is a daemon) and its FETCH_DEFAULTS value used."""
+        results = {}
+        
+        def run(name, fetch):
+            results[name] = fetch()
             
-            return {
-                "total_distance_km": round(total_distance, 1),
-                "total_duration_hours": round(total_duration, 1),
-                "activities_completed": len(weekly_activities)
-            }
-        except Exception as e:
-            logger.error(f"Error calculating weekly summary: {e}")
-            return {"total_distance_km": 0, "total_duration_hours": 0, "activities_completed": 0}
+        started = time.monotonic()
+        threads = {}
+        for name, fetch in fetches.items():
+            threads[name] = threading.Thread(target=run, args=(name, fetch), name=f"garmin-{name}", daemon=True)
+            threads[name].start()
             
-    def generate_daily_summary(self):
-        """Generate the daily summary file that agents will read"""
-        logger.info("Generating daily summary...")
-        
-        # Get all data
-        todays_activities = self.get_todays_activities()
-        sleep = self.get_sleep_data()
-        health = self.get_health_metrics()
-        weekly = self.get_weekly_summary()
+        give_up = started + self.call_timeout
+        if self.deadline is not None:
+            give_up = min(give_up, self.deadline)
+        for name, thread in threads.items():
+            thread.join(max(0, give_up - time.monotonic()))
+            if name not in results:
+                logger.warning(f"Timed out fetching {name} after {time.monotonic() - started:.1f}s")
+                results[name] = FETCH_DEFAULTS[name]
+                
+        logger.info(f"Fetched {len(fetches)} endpoints in {time.monotonic() - started:.2f}s")
+        return {name: results[name] for name in fetches}
         
-        # Build summary
-        summary = {
+    def build_summary(self, data):
+        """The daily summary from fetched data"""
+        activities = data["activities"]["activities"]
+        return {
             "date": date.today().isoformat(),
             "updated_at": datetime.utcnow().isoformat() + "Z",
-            "todays_activities": todays_activities,
-            "this_week": weekly,
+            "todays_activities": self.get_todays_activities(activities),
+            "this_week": self.get_weekly_summary(activities),
             "health_metrics": {
-                "sleep": sleep,
-                "resting_hr": health.get('resting_hr'),
-                "weight_kg": health.get('weight_kg')
+                "sleep": data["sleep"],
+                "resting_hr": data["resting_hr"],
+                "weight_kg": data["weight_kg"]
             }
         }
         
+    def generate_daily_summary(self):
+        """Generate the daily summary file that agents will read"""
+        logger.info("Generating daily summary...")
+        
+        # Get all data, concurrently
+        data = self.fetch_concurrently(self.fetches())
+        if data["activities"] is None:
+            data["activities"] = self.load_activity_cache()
+        else:
+            self.save_activity_cache(data["activities"])
+        summary = self.build_summary(data)
+        
         # Save to file
         summary_file = GARMIN_DATA / "daily_summary.json"
-        with open(summary_file, 'w') as f:
-            json.dump(summary, f, indent=2)
+        write_json(summary_file, summary)
             
         logger.info(f"✓ Daily summary saved: {summary_file}")
         return summary
@@ -234,13 +473,26 @@ class GarminCollector:
     def sync(self):
         """Main sync function"""
         logger.info("Starting Garmin sync...")
+        self.deadline = time.monotonic() + self.sync_deadline
         
-        if not self.authenticate():
+        # The login counts against the deadline too: a hung one is left
+        # behind on its (daemon) thread like a hung fetch
+        authenticated = []
+        login = threading.Thread(target=lambda: authenticated.append(self.authenticate()),
+                                 name="garmin-login", daemon=True)
+        login.start()
+        login.join(max(0, self.deadline - time.monotonic()))
+        if not authenticated:
+            logger.error(f"Sync failed: login still running after {self.sync_deadline}s")
+            return False
+        if not authenticated[0]:
             return False
             
         try:
             summary = self.generate_daily_summary()
             self.publish_alert()
+            # The access token may have been refreshed during the sync
+            self.save_session()
             
             logger.info("✓ Sync complete!")
             logger.info(f"  Activities today: {len(summary['todays_activities'])}")
@@ -250,12 +502,140 @@ class GarminCollector:
         except Exception as e:
             logger.error(f"Sync failed: {e}")
             return False
+            
+    def throttled(self, limiter, call, *args):
+        """call(*args) at the limiter's pace, retrying failures with backoff"""
+        for attempt in range(BACKFILL_RETRIES + 1):
+            limiter.wait()
+            try:
+                return call(*args)
+            except Exception as e:
+                if attempt == BACKFILL_RETRIES:
+                    raise
+                delay = BACKFILL_BACKOFF * 2 ** attempt
+                logger.warning(f"{getattr(call, '__name__', 'request')} failed ({e}); retrying in {delay:.0f}s")
+                time.sleep(delay)
+                
+    def day_file(self, day):
+        return HISTORY / f"{day:%Y}" / f"{day:%m}" / f"{day.isoformat()}.json"
+        
+    def merge_day(self, day, activities=(), **fields):
+        """Fold activities (by activity_id) and other fields into a day's file"""
+        path = self.day_file(day)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            data = {"date": day.isoformat(), "activities": [], "sleep": None, "resting_hr": None}
+        merged = {a["activity_id"]: a for a in data["activities"]}
+        merged.update((a["activity_id"], a) for a in activities)
+        data["activities"] = sorted(merged.values(), key=lambda a: a.get("date") or "")
+        data.update(fields)
+        write_json(path, data)
+        
+    def load_checkpoint(self, since):
+        try:
+            checkpoint = json.loads(BACKFILL_CHECKPOINT.read_text())
+        except (OSError, ValueError):
+            checkpoint = None
+        if checkpoint and checkpoint.get("since") == since.isoformat():
+            logger.info(f"Resuming backfill: activity offset {checkpoint['offset']}, "
+                        f"next day {checkpoint['next_day']}")
+            return checkpoint
+        if checkpoint:
+            logger.info(f"Checkpoint is for --since {checkpoint.get('since')}; starting over")
+        return {"since": since.isoformat(), "offset": 0, "activities_done": False, "next_day": since.isoformat()}
+        
+    def backfill_activities(self, since, checkpoint, limiter):
+        """Page back through activities (newest first) to <since>"""
+        while not checkpoint["activities_done"]:
+            page = self.throttled(limiter, self.client.get_activities, checkpoint["offset"], BACKFILL_PAGE_SIZE) or []
+            by_day = {}
+            for activity in page:
+                day = start_time(activity).date()
+                if day >= since:
+                    by_day.setdefault(day, []).append(self.extract_essential(activity))
+            for day, activities in by_day.items():
+                self.merge_day(day, activities)
+                
+            checkpoint["offset"] += len(page)
+            checkpoint["activities_done"] = len(page) < BACKFILL_PAGE_SIZE or start_time(page[-1]).date() < since
+            write_json(BACKFILL_CHECKPOINT, checkpoint)
+            logger.info(f"Backfill: {checkpoint['offset']} activities paged"
+                        + (f", back to {page[-1].get('startTimeLocal', '')[:10]}" if page else ""))
+            
+    def backfill_days(self, checkpoint, limiter):
+        """Sleep and resting HR for each day from the checkpoint's next day to today"""
+        day = date.fromisoformat(checkpoint["next_day"])
+        while day <= date.today():
+            sleep = self.throttled(limiter, self.client.get_sleep_data, day.isoformat())
+            rhr = self.throttled(limiter, self.client.get_rhr_day, day.isoformat())
+            self.merge_day(day, sleep=self.sleep_summary(sleep),
+                           resting_hr=rhr.get('restingHeartRate') if rhr else None)
+            
+            day += timedelta(days=1)
+            checkpoint["next_day"] = day.isoformat()
+            write_json(BACKFILL_CHECKPOINT, checkpoint)
+            if day.day == 1:
+                logger.info(f"Backfill: sleep and resting HR done through {day - timedelta(days=1)}")
+                
+    def backfill(self, since, rate=BACKFILL_RATE):
+        """Fetch the history since <since> into HISTORY, resuming a checkpointed run"""
+        logger.info(f"Starting Garmin backfill since {since} at {rate} request(s)/s...")
+        if not self.authenticate():
+            return False
+            
+        checkpoint = self.load_checkpoint(since)
+        limiter = RateLimiter(rate)
+        started = time.monotonic()
+        try:
+            self.backfill_activities(since, checkpoint, limiter)
+            self.backfill_days(checkpoint, limiter)
+        except Exception as e:
+            logger.error(f"Backfill stopped: {e}; rerun the same command to resume")
+            return False
+        finally:
+            self.save_session()
+            
+        BACKFILL_CHECKPOINT.unlink(missing_ok=True)
+        logger.info(f"✓ Backfill complete: {checkpoint['offset']} activities paged, "
+                    f"days {since} to {date.today()}, in {time.monotonic() - started:.0f}s")
+        return True
+
+
+def backfill_args(args):
+    """(since, rate) from ["backfill", "--since", <date>, "--rate", <rate>];
+    ValueError if they don't parse"""
+    if args[0] != "backfill" or len(args) % 2 == 0:
+        raise ValueError("expected backfill and option values")
+    options = dict(zip(args[1::2], args[2::2]))
+    if "--since" not in options or set(options) - {"--since", "--rate"}:
+        raise ValueError("unknown or missing options")
+    since = date.fromisoformat(options["--since"])
+    rate = float(options.get("--rate", os.getenv("GARMIN_BACKFILL_RATE", BACKFILL_RATE)))
+    if not rate > 0:
+        raise ValueError("rate must be positive")
+    return since, rate
 
 
 def main():
     """Main entry point"""
-    collector = GarminCollector()
-    success = collector.sync()
+    args = sys.argv[1:]
+    if args:
+        try:
+            since, rate = backfill_args(args)
+        except ValueError:
+            print("Usage: garmin_collector.py [backfill --since YYYY-MM-DD [--rate <requests/s>]]", file=sys.stderr)
+            sys.exit(2)
+        
+    try:
+        collector = GarminCollector()
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(2)
+    if args:
+        success = collector.backfill(since, rate)
+    else:
+        success = collector.sync()
     sys.exit(0 if success else 1)
 
 
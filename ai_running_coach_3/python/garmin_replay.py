@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Garmin Replay - offline stand-in for garminconnect.Garmin
+Serves activities, sleep, resting HR and stats from a backfilled history
+(garmin_data/history, see garmin_collector.py backfill) or from synthetic
+data, with configurable latency, errors and rate limits, so syncs and
+backfills can be benchmarked with no network.
+
+Implements the GarminClient interface garmin_collector.py uses. Every call
+waits its latency, then may fail: past rate_limit calls in rate_window
+seconds with a 429, and data calls (not logins) with a 500 at error_rate. Jitter and errors are drawn
+from the seed, the endpoint, its arguments and the attempt number, so a run
+replays the same way whatever order threads make their calls in.
+
+Select it with GARMIN_BACKEND=replay; the GARMIN_REPLAY_* variables below
+configure it.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from pathlib import Path
+from collections import Counter, deque
+from datetime import timedelta, date
+
+# Defaults; override with GARMIN_REPLAY_<NAME> (e.g. GARMIN_REPLAY_LATENCY=0.3)
+DEFAULTS = {
+    "history": "",          # backfilled history directory; synthetic data if empty
+    "days": 365,            # synthetic history length, ending today
+    "latency": 0.2,         # seconds per call
+    "jitter": 0.2,          # +/- fraction of the latency
+    "login_round_trips": 5,
+    "token_lifetime": 3600,
+    "error_rate": 0.0,
+    "rate_limit": 0,        # calls per rate_window; 0 for none
+    "rate_window": 60.0,
+    "seed": 42,
+}
+
+
+class ReplayError(Exception):
+    """An HTTP error from the replayed service"""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+class ReplayData:
+    """Raw-shaped Garmin Connect responses: activities newest first, and
+    sleep / RHR / stats by ISO date"""
+
+    def __init__(self, activities=None, sleep=None, rhr=None, stats=None):
+        self.activities = activities or []
+        self.sleep = sleep or {}
+        self.rhr = rhr or {}
+        self.stats = stats or {}
+
+    @classmethod
+    def synthetic(cls, days, seed=DEFAULTS["seed"], end=None):
+        """<days> of history ending <end> (today): a run most mornings"""
+        rng = random.Random(seed)
+        end = end or date.today()
+        data = cls()
+        for offset in range(days - 1, -1, -1):
+            day = end - timedelta(days=offset)
+            key = day.isoformat()
+            if rng.random() < 0.8:
+                distance = rng.uniform(5000, 16000)
+                data.activities.insert(0, {
+                    "activityId": 10_000_000 + (day - date(2000, 1, 1)).days,
+                    "activityType": {"typeKey": rng.choice(["running", "running", "trail_running"])},
+                    "startTimeLocal": f"{key} 07:{rng.randint(0, 59):02d}:00",
+                    "distance": round(distance, 1),
+                    "duration": round(distance * rng.uniform(0.27, 0.36), 1),
+                    "averageHR": rng.randint(135, 165),
+                    "maxHR": rng.randint(166, 185),
+                    "calories": round(distance * 0.065),
+                    "elevationGain": round(rng.uniform(10, 250), 1),
+                })
+            sleep_seconds = rng.randint(5 * 3600, 9 * 3600)
+            data.sleep[key] = {
+                "sleepTimeSeconds": sleep_seconds,
+                "sleepQuality": rng.choice(["poor", "fair", "good", "excellent"]),
+                "deepSleepSeconds": sleep_seconds // 5,
+                "lightSleepSeconds": sleep_seconds * 3 // 5,
+                "awakeTimeSeconds": rng.randint(600, 3600),
+            }
+            data.rhr[key] = {"restingHeartRate": rng.randint(44, 56)}
+            data.stats[key] = {"weight": round(rng.uniform(67, 70), 1)}
+        return data
+
+    @classmethod
+    def from_history(cls, directory):
+        """Responses rebuilt from backfilled day files (the collector's
+        rounding included)"""
+        data = cls()
+        for path in sorted(Path(directory).glob("*/*/*.json"), reverse=True):
+            day = json.loads(path.read_text())
+            key = day["date"]
+            for activity in sorted(day.get("activities", []), key=lambda a: a.get("date") or "", reverse=True):
+                data.activities.append({
+                    "activityId": int(activity["activity_id"]),
+                    "activityType": {"typeKey": activity.get("type", "unknown")},
+                    "startTimeLocal": activity.get("date"),
+                    "distance": (activity.get("distance_km") or 0) * 1000,
+                    "duration": (activity.get("duration_minutes") or 0) * 60,
+                    "averageHR": activity.get("avg_hr"),
+                    "maxHR": activity.get("max_hr"),
+                    "calories": activity.get("calories"),
+                    "elevationGain": activity.get("elevation_gain_m"),
+                })
+            sleep = day.get("sleep")
+            if sleep:
+                data.sleep[key] = {
+                    "sleepTimeSeconds": round(sleep["duration_hours"] * 3600),
+                    "sleepQuality": sleep.get("quality", "unknown"),
+                    "deepSleepSeconds": round(sleep["deep_sleep_hours"] * 3600),
+                    "lightSleepSeconds": round(sleep["light_sleep_hours"] * 3600),
+                    "awakeTimeSeconds": round(sleep["awake_hours"] * 3600),
+                }
+            if day.get("resting_hr") is not None:
+                data.rhr[key] = {"restingHeartRate": day["resting_hr"]}
+        return data
+
+
+def options_from_env(**overrides):
+    """DEFAULTS, then GARMIN_REPLAY_* variables, then <overrides>"""
+    options = {}
+    for name, default in DEFAULTS.items():
+        value = os.getenv(f"GARMIN_REPLAY_{name.upper()}")
+        options[name] = default if value is None else type(default)(value)
+    options.update(overrides)
+    return options
+
+
+class ReplayGarth:
+    """The token holder, with garth's dump()"""
+
+    def __init__(self):
+        self.tokens = None
+
+    def dump(self, directory):
+        for name, token in self.tokens.items():
+            (Path(directory) / f"{name}_token.json").write_text(json.dumps(token))
+
+
+class ReplayGarmin:
+    """garminconnect.Garmin as far as the collector uses it, replayed locally"""
+
+    def __init__(self, email=None, password=None, data=None, latencies=None, **options):
+        """<data> defaults to the history or synthetic days the options name;
+        <latencies> overrides the latency of some endpoints, e.g.
+        {"get_sleep_data": 60} for one that hangs"""
+        self.options = options_from_env(**options)
+        self.latencies = latencies or {}
+        if data is None:
+            history = self.options["history"]
+            data = ReplayData.from_history(history) if history else ReplayData.synthetic(
+                self.options["days"], self.options["seed"])
+        self.data = data
+        self.garth = ReplayGarth()
+        self.calls = Counter()
+        self.failures = Counter()
+        self._attempts = Counter()
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint, *args, flaky=True):
+        """Wait out the call's latency and raise its error, if it gets one"""
+        options = self.options
+        with self._lock:
+            key = (endpoint,) + args
+            self._attempts[key] += 1
+            self.calls[endpoint] += 1
+            rng = random.Random(f"{options['seed']}:{key}:{self._attempts[key]}")
+
+            now = time.monotonic()
+            limited = False
+            if options["rate_limit"]:
+                while self._recent and self._recent[0] <= now - options["rate_window"]:
+                    self._recent.popleft()
+                limited = len(self._recent) >= options["rate_limit"]
+                if not limited:
+                    self._recent.append(now)
+
+        latency = self.latencies.get(endpoint, options["latency"])
+        time.sleep(latency * (1 + options["jitter"] * rng.uniform(-1, 1)))
+        if limited:
+            self.failures[429] += 1
+            raise ReplayError(429, "Too Many Requests")
+        if flaky and rng.random() < options["error_rate"]:
+            self.failures[500] += 1
+            raise ReplayError(500, "Server Error")
+
+    def login(self, tokenstore=None):
+        if tokenstore is None:
+            for step in range(self.options["login_round_trips"]):
+                self._call("login", step, flaky=False)
+            self.garth.tokens = {
+                "oauth1": {"oauth_token": "replay"},
+                "oauth2": {"access_token": "replay", "expires_at": time.time() + self.options["token_lifetime"]},
+            }
+            return
+        self._call("profile", flaky=False)
+        self.garth.tokens = {name: json.loads((Path(tokenstore) / f"{name}_token.json").read_text())
+                             for name in ("oauth1", "oauth2")}
+        if self.garth.tokens["oauth2"]["expires_at"] < time.time():
+            raise ReplayError(401, "Unauthorized")
+
+    def get_activities(self, start=0, limit=20):
+        self._call("get_activities", start, limit)
+        return [dict(activity) for activity in self.data.activities[start:start + limit]]
+
+    def get_sleep_data(self, cdate):
+        self._call("get_sleep_data", cdate)
+        return self.data.sleep.get(cdate)
+
+    def get_rhr_day(self, cdate):
+        self._call("get_rhr_day", cdate)
+        return self.data.rhr.get(cdate)
+
+    def get_stats(self, cdate):
+        self._call("get_stats", cdate)
+        return self.data.stats.get(cdate)